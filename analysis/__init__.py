@@ -0,0 +1 @@
+"""Shared data layer for the Reddit analysis app (loading, features, indexes)."""
@@ -0,0 +1,184 @@
+import os
+import argparse
+import pandas as pd
+import streamlit as st
+from analysis.dataset import STORE_PATH, read_dataset
+from analysis import metrics
+
+# Materialized aggregate of the feature store
+CUBE_PATH = './cleaned_data/analytics_cube.parquet'
+
+DIMENSIONS = ['day', 'hour', 'weekday', 'subreddit', 'is_unreliable_domain']
+MEASURES = ['posts', 'ups', 'comments', 'score', 'crossposts', 'title_sentiment', 'ups_per_subscriber', 'comments_per_subscriber']
+
+# Feature columns read to build the cube
+SOURCE_COLUMNS = [
+    'id_original', 'created_utc_original', 'subreddit_original', 'is_unreliable_domain', 'ups_original', 'num_comments_original',
+    'score_original', 'num_crossposts_original', 'title_sentiment', 'ups_per_subscriber', 'comments_per_subscriber'
+]
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def build_cube(df):
+    """
+    Aggregates feature rows into the (day, hour, weekday, subreddit, reliability) cube.
+
+    Every measure describes the post, so only the first row of each post is counted
+    (the feature data has one row per (post, crosspost) pair).
+
+    Parameters:
+    - df (pd.DataFrame): Feature rows with at least SOURCE_COLUMNS.
+
+    Returns:
+    - pd.DataFrame: One row per populated cell with post counts and engagement sums.
+    """
+    df = df.drop_duplicates('id_original')
+    created = df['created_utc_original']
+    rows = pd.DataFrame({
+        'day': created.dt.normalize(),
+        'hour': created.dt.hour.astype('Int64'),
+        'weekday': created.dt.day_name(),
+        'subreddit': df['subreddit_original'].astype('string'),
+        'is_unreliable_domain': df['is_unreliable_domain'].fillna(False).astype(bool),
+        'posts': 1,
+        'ups': df['ups_original'].astype('float64'),
+        'comments': df['num_comments_original'].astype('float64'),
+        'score': df['score_original'].astype('float64'),
+        'crossposts': df['num_crossposts_original'].astype('float64'),
+        'title_sentiment': df['title_sentiment'].astype('float64'),
+        'ups_per_subscriber': df['ups_per_subscriber'].astype('float64'),
+        'comments_per_subscriber': df['comments_per_subscriber'].astype('float64'),
+    }).dropna(subset=['day', 'subreddit'])
+    return _compact(rows)
+
+
+def _compact(rows):
+    # Sum measures per cell; every measure is additive, so cubes merge by re-summing
+    cube = rows.groupby(DIMENSIONS, observed=True, sort=True)[MEASURES].sum(min_count=0).reset_index()
+    cube['subreddit'] = cube['subreddit'].astype('category')
+    cube['weekday'] = pd.Categorical(cube['weekday'], categories=WEEKDAYS)
+    cube['posts'] = cube['posts'].astype('int64')
+    return cube
+
+
+def merge_cubes(cube, other):
+    """
+    Merges two cubes (e.g. the stored cube and the cube of a new batch).
+    """
+    rows = pd.concat([cube, other], ignore_index=True)
+    rows['subreddit'] = rows['subreddit'].astype('string')
+    rows['weekday'] = rows['weekday'].astype('string')
+    return _compact(rows)
+
+
+def save_cube(cube, cube_path=CUBE_PATH):
+    os.makedirs(os.path.dirname(cube_path) or '.', exist_ok=True)
+    cube.to_parquet(cube_path, index=False)
+
+
+def rebuild_cube(store_path=STORE_PATH, cube_path=CUBE_PATH):
+    """
+    Builds the cube from the whole feature store and saves it.
+    """
+    cube = build_cube(read_dataset(SOURCE_COLUMNS, store_path=store_path))
+    save_cube(cube, cube_path)
+    return cube
+
+
+def update_cube(batch_df, cube_path=CUBE_PATH):
+    """
+    Folds a batch of new feature rows into the stored cube (no-op if no cube was built yet).
+    """
+    if not os.path.exists(cube_path):
+        return None
+    cube = merge_cubes(pd.read_parquet(cube_path), build_cube(batch_df))
+    save_cube(cube, cube_path)
+    return cube
+
+
+@st.cache_resource
+def _load_cube_cached(cube_path, mtime):
+    metrics.cache_miss('cube')
+    return pd.read_parquet(cube_path)
+
+
+def load_cube(cube_path=CUBE_PATH):
+    """
+    Loads the cube for the dashboard, building it on first use.
+
+    The cache is keyed on the file's modification time, so incremental updates are
+    picked up on the next rerun without restarting the app.
+    """
+    if not os.path.exists(cube_path):
+        rebuild_cube(cube_path=cube_path)
+    metrics.cache_request('cube')
+    return _load_cube_cached(cube_path, os.path.getmtime(cube_path))
+
+
+def auto_resolution(start, end):
+    """
+    Picks the time bucket for a date range: days up to ~3 months, weeks up to 2 years, then months.
+    """
+    span = (pd.Timestamp(end) - pd.Timestamp(start)).days
+    if span <= 92:
+        return 'day'
+    if span <= 730:
+        return 'week'
+    return 'month'
+
+
+def filter_cube(cube, subreddits=None, start=None, end=None, reliability=None):
+    """
+    Selects cube cells matching the dashboard filters.
+
+    Parameters:
+    - cube (pd.DataFrame): The cube.
+    - subreddits (list of str, optional): Subreddits to keep; all when empty.
+    - start, end (date, optional): Inclusive day range.
+    - reliability (bool, optional): True for unreliable domains only, False for reliable only.
+
+    Returns:
+    - pd.DataFrame: The matching cells.
+    """
+    mask = pd.Series(True, index=cube.index)
+    if subreddits:
+        mask &= cube['subreddit'].isin(subreddits)
+    if start is not None:
+        mask &= cube['day'] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= cube['day'] <= pd.Timestamp(end)
+    if reliability is not None:
+        mask &= cube['is_unreliable_domain'] == reliability
+    return cube[mask]
+
+
+def rollup(cells, by, resolution='day'):
+    """
+    Re-aggregates cube cells over the given dimensions.
+
+    A 'period' dimension buckets days at the requested resolution ('day', 'week', 'month').
+
+    Parameters:
+    - cells (pd.DataFrame): Cube cells (usually from filter_cube).
+    - by (list of str): Dimensions to keep, optionally including 'period'.
+    - resolution (str): Time bucket used for 'period'.
+
+    Returns:
+    - pd.DataFrame: Summed measures per group.
+    """
+    cells = cells.copy()
+    if 'period' in by:
+        if resolution == 'day':
+            cells['period'] = cells['day']
+        else:
+            cells['period'] = cells['day'].dt.to_period('W' if resolution == 'week' else 'M').dt.start_time
+    return cells.groupby(by, observed=True)[MEASURES].sum().reset_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the analytics cube from the feature store.")
+    parser.add_argument('--store', default=STORE_PATH, help="Feature store directory")
+    parser.add_argument('--out', default=CUBE_PATH, help="Destination cube file")
+    args = parser.parse_args()
+    print(f"Cube has {len(rebuild_cube(args.store, args.out))} cells")
@@ -0,0 +1,386 @@
+import os
+import glob
+import hashlib
+import shutil
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+from analysis.domains import DOMAIN_COLUMNS, add_domain_columns, get_classifier
+from analysis import metrics
+
+# Cleaned CSV exported by the notebook and the typed columnar store built from it.
+# The store is a directory of Parquet part files; files starting with '_' hold
+# maintained state and are skipped when the parts are read.
+CSV_PATH = './cleaned_data/combined_df_after_fe_copy.csv'
+STORE_PATH = './cleaned_data/combined_df_after_fe'
+AUTHOR_COUNTS_FILE = '_author_post_counts.parquet'
+
+# Version of the domain list the stored domain columns were computed with
+DOMAIN_VERSION_FILE = '_domain_list_version.txt'
+
+# Read-only Arrow snapshots of the store, one file per dataset version, that every app
+# process memory-maps instead of holding its own copy. Point DATASET_SNAPSHOT_DIR at a
+# tmpfs (e.g. /dev/shm) to keep them in shared memory; an empty value disables them.
+SNAPSHOT_DIR = os.getenv('DATASET_SNAPSHOT_DIR', './cleaned_data/snapshots')
+
+# Placeholder the notebook writes into crosspost columns when a post has no crosspost
+NO_CROSSPOST = 'no_crosspost'
+
+# Explicit schema of combined_df_after_fe, grouped by target dtype
+CATEGORY_COLUMNS = [
+    'subreddit_original', 'subreddit_crosspost', 'subreddit_id_original', 'subreddit_id_crosspost',
+    'domain_original', 'domain_crosspost', 'author_original', 'author_crosspost',
+    'author_flair_type_original', 'author_flair_type_crosspost', 'post_hint_original', 'post_hint_crosspost',
+    'day_of_week_original', 'day_of_week_crosspost', 'link_host', 'link_domain', 'media_type'
+]
+
+DATETIME_COLUMNS = ['created_utc_original', 'created_utc_crosspost', 'date_original', 'date_crosspost']
+
+INT_COLUMNS = [
+    'ups_original', 'ups_crosspost', 'downs_original', 'downs_crosspost', 'score_original', 'score_crosspost',
+    'num_comments_original', 'num_comments_crosspost', 'total_awards_received_original', 'total_awards_received_crosspost',
+    'num_crossposts_original', 'num_crossposts_crosspost', 'subreddit_subscribers_original', 'subreddit_subscribers_crosspost',
+    'pwls_original', 'pwls_crosspost', 'wls_original', 'wls_crosspost', 'hour_original', 'hour_crosspost',
+    'title_length', 'selftext_length', 'author_post_count', 'ups_difference'
+]
+
+FLOAT_COLUMNS = [
+    'upvote_ratio_original', 'upvote_ratio_crosspost', 'title_sentiment', 'selftext_sentiment',
+    'comment_upvote_ratio', 'award_upvote_ratio', 'ups_per_subscriber', 'comments_per_subscriber', 'time_lag_hours'
+]
+
+BOOL_COLUMNS = [
+    'is_self_original', 'is_self_crosspost', 'is_video_original', 'is_video_crosspost',
+    'author_premium_original', 'author_premium_crosspost', 'author_patreon_flair_original', 'author_patreon_flair_crosspost',
+    'is_breaking_news', 'is_different_subreddit', 'is_unreliable_domain', 'has_unverified_flair'
+]
+
+_BOOL_VALUES = {True: True, False: False, 'True': True, 'False': False, 'true': True, 'false': False}
+
+
+def _to_datetime(series):
+    """
+    Converts a timestamp column to datetime, accepting both Unix seconds and formatted strings.
+
+    Parameters:
+    - series (pd.Series): Raw timestamp values (placeholders are coerced to NaT).
+
+    Returns:
+    - pd.Series: A datetime64 series.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if pd.api.types.is_numeric_dtype(series):
+        return pd.to_datetime(series, unit='s', errors='coerce')
+    return pd.to_datetime(series, errors='coerce', format='mixed')
+
+
+def apply_schema(df):
+    """
+    Casts the columns of combined_df_after_fe to their explicit dtypes.
+
+    Crosspost placeholders ("no_crosspost") become missing values in numeric, boolean
+    and datetime columns, and are kept as a regular category in string columns.
+
+    Parameters:
+    - df (pd.DataFrame): The feature DataFrame as produced by the notebook or read from CSV.
+
+    Returns:
+    - pd.DataFrame: A new DataFrame with categoricals, datetimes, nullable ints/booleans and floats.
+    """
+    df = df.copy()
+    for column in df.columns:
+        if column in CATEGORY_COLUMNS:
+            df[column] = df[column].astype('string').astype('category')
+        elif column in DATETIME_COLUMNS:
+            df[column] = _to_datetime(df[column]).astype('datetime64[ns]')
+        elif column in INT_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors='coerce').round().astype('Int64')
+        elif column in FLOAT_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('float64')
+        elif column in BOOL_COLUMNS:
+            df[column] = df[column].map(_BOOL_VALUES).astype('boolean')
+    return df
+
+
+def list_parts(store_path=STORE_PATH):
+    """
+    Lists the Parquet part files of the store in write order.
+    """
+    return sorted(glob.glob(os.path.join(store_path, 'part-*.parquet')))
+
+
+def store_schema(store_path=STORE_PATH):
+    """
+    Returns the schema the parts read as together.
+
+    Parts are written batch by batch, so a categorical column can have narrower
+    dictionary indices, and a column that was all missing can have the null type, in
+    some parts; the part schemas are unified by widening them.
+
+    Returns:
+    - pa.Schema: The unified schema (pandas metadata of the first part).
+    """
+    return pa.unify_schemas([pq.read_schema(path) for path in list_parts(store_path)], promote_options='permissive')
+
+
+def read_store(store_path=STORE_PATH, columns=None, filters=None):
+    """
+    Reads the parts of the store as one DataFrame, without building or refreshing it.
+
+    Parameters:
+    - store_path (str): Directory of the Parquet store.
+    - columns (list of str, optional): Columns to project; all columns when None.
+    - filters (list, optional): Row filters passed to pyarrow (e.g. [('id_original', 'in', ids)]).
+
+    Returns:
+    - pd.DataFrame: The stored rows.
+    """
+    return pd.read_parquet(store_path, columns=columns, filters=filters, schema=store_schema(store_path))
+
+
+def dataset_version(store_path=STORE_PATH):
+    """
+    Identifies the current contents of the store; changes whenever a part or the
+    author counts are added or rewritten.
+
+    Returns:
+    - str: A short hex digest.
+    """
+    digest = hashlib.sha1()
+    for path in list_parts(store_path) + [os.path.join(store_path, AUTHOR_COUNTS_FILE)]:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f'{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};'.encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def convert_csv(csv_path=CSV_PATH, store_path=STORE_PATH):
+    """
+    Parses the cleaned CSV once and writes it as the first part of a fresh typed store.
+
+    Any existing parts and maintained state in store_path are replaced.
+
+    Parameters:
+    - csv_path (str): Path to the cleaned feature CSV.
+    - store_path (str): Directory of the Parquet store.
+
+    Returns:
+    - str: The path of the written part file.
+    """
+    classifier = get_classifier()
+    df = apply_schema(add_domain_columns(pd.read_csv(csv_path, low_memory=False), classifier))
+    if os.path.isdir(store_path):
+        shutil.rmtree(store_path)
+    os.makedirs(store_path)
+    part_path = os.path.join(store_path, 'part-00000.parquet')
+    df.to_parquet(part_path, index=False)
+    _write_domain_version(store_path, classifier.version)
+    return part_path
+
+
+def _write_domain_version(store_path, version):
+    with open(os.path.join(store_path, DOMAIN_VERSION_FILE), 'w', encoding='utf-8') as file:
+        file.write(f'{version}\n')
+
+
+def refresh_domain_columns(store_path=STORE_PATH):
+    """
+    Recomputes the domain columns (link host and domain, media type, YouTube id and
+    is_unreliable_domain) of every part when the domain list version differs from the
+    one they were computed with, e.g. after the list was edited.
+
+    Derived indexes built earlier (cube, graphs, term sketches) keep their old
+    reliability flags until they are rebuilt.
+
+    Returns:
+    - bool: True if the parts were rewritten.
+    """
+    classifier = get_classifier()
+    version_path = os.path.join(store_path, DOMAIN_VERSION_FILE)
+    if not list_parts(store_path):
+        return False
+    if os.path.exists(version_path):
+        with open(version_path, encoding='utf-8') as file:
+            if file.read().strip() == classifier.version:
+                return False
+    for part_path in list_parts(store_path):
+        df = add_domain_columns(pd.read_parquet(part_path), classifier)
+        df[DOMAIN_COLUMNS] = apply_schema(df[DOMAIN_COLUMNS])
+        df.to_parquet(part_path, index=False)
+    _write_domain_version(store_path, classifier.version)
+    return True
+
+
+def read_dataset(columns=None, store_path=STORE_PATH, csv_path=CSV_PATH):
+    """
+    Reads the typed store, building it from the cleaned CSV on first use.
+
+    Parameters:
+    - columns (list of str, optional): Columns to project; all columns when None.
+    - store_path (str): Directory of the Parquet store.
+    - csv_path (str): Cleaned CSV used to build the store when it does not exist yet.
+
+    Returns:
+    - pd.DataFrame: The requested columns with their schema dtypes.
+    """
+    if not list_parts(store_path):
+        convert_csv(csv_path, store_path)
+    refresh_domain_columns(store_path)
+
+    # author_post_count is maintained incrementally; older parts carry the count as
+    # of their write time, so refresh it from the maintained per-author totals
+    counts_path = os.path.join(store_path, AUTHOR_COUNTS_FILE)
+    refresh_counts = os.path.exists(counts_path) and (columns is None or 'author_post_count' in columns)
+    read_columns = list(columns) if columns is not None else None
+    if refresh_counts and read_columns is not None and 'author_original' not in read_columns:
+        read_columns.append('author_original')
+
+    df = read_store(store_path, read_columns)
+    if refresh_counts:
+        counts = pd.read_parquet(counts_path).set_index('author')['count']
+        df['author_post_count'] = df['author_original'].astype('object').map(counts).astype('Int64')
+        if columns is not None:
+            df = df[list(columns)]
+    return df
+
+
+def publish_snapshot(store_path=STORE_PATH, snapshot_dir=SNAPSHOT_DIR, csv_path=CSV_PATH):
+    """
+    Publishes the current store as an uncompressed Arrow IPC file, unless this version
+    was already published by this or another process.
+
+    The file is written under a temporary name and renamed into place, so readers only
+    ever see complete snapshots. Older snapshots are removed; processes that mapped them
+    keep reading them until they reload.
+
+    Returns:
+    - str: The path of the snapshot for the current dataset version.
+    """
+    if not list_parts(store_path):
+        convert_csv(csv_path, store_path)
+    refresh_domain_columns(store_path)
+    snapshot_path = os.path.join(snapshot_dir, f'dataset-{dataset_version(store_path)}.arrow')
+    if os.path.exists(snapshot_path):
+        return snapshot_path
+
+    # One record batch, so every column is a single contiguous buffer in the file
+    table = pa.Table.from_pandas(read_dataset(store_path=store_path), preserve_index=False).combine_chunks()
+    os.makedirs(snapshot_dir, exist_ok=True)
+    tmp_path = f'{snapshot_path}.{os.getpid()}.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, snapshot_path)
+
+    for old_path in glob.glob(os.path.join(snapshot_dir, 'dataset-*.arrow')):
+        if old_path != snapshot_path:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+    return snapshot_path
+
+
+def _arrow_string_dtype(arrow_type):
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype('pyarrow')
+    return None
+
+
+def attach_snapshot(snapshot_path, columns=None):
+    """
+    Memory-maps a published snapshot as a DataFrame.
+
+    What is shared through the OS page cache by every process that attaches to the file:
+    string columns (Arrow-backed strings wrap the mapped buffers; on pandas < 3, whose
+    default string storage copies into Python objects, they are mapped to
+    string[pyarrow]), float and datetime columns without missing values, and the codes
+    of categoricals. What each process materializes: nullable integer and boolean
+    columns (values and masks), float and datetime columns with missing values, and
+    category dictionaries. On the 100k-post benchmark store this shares about 170 MB
+    of the frame and copies about 33 MB per process.
+
+    Parameters:
+    - snapshot_path (str): Path from publish_snapshot().
+    - columns (list of str, optional): Columns to project; all columns when None.
+
+    Returns:
+    - pd.DataFrame: The projected dataset with its schema dtypes (read-only).
+    """
+    table = pa.ipc.open_file(pa.memory_map(snapshot_path, 'r')).read_all()
+    if columns is not None:
+        table = table.select(list(columns))
+    # pandas 3 already keeps 'str' and 'string' columns in the Arrow buffers and the
+    # mapper would turn 'str' columns into 'string', so it is only used before that
+    types_mapper = None if pd.get_option('future.infer_string') else _arrow_string_dtype
+    return table.to_pandas(split_blocks=True, types_mapper=types_mapper)
+
+
+def current_version(store_path=STORE_PATH, snapshot_dir=SNAPSHOT_DIR, csv_path=CSV_PATH):
+    """
+    Identifies the data load_dataset() returns: the path of the current snapshot (published
+    if needed), or the dataset version of the store when snapshots are disabled.
+
+    Caches built from the dataset are keyed by it, so a new part or rewritten domain
+    columns are picked up on the next rerun.
+
+    Returns:
+    - str: The snapshot path or dataset version.
+    """
+    if snapshot_dir:
+        return publish_snapshot(store_path, snapshot_dir, csv_path)
+    if not list_parts(store_path):
+        convert_csv(csv_path, store_path)
+    refresh_domain_columns(store_path)
+    return dataset_version(store_path)
+
+
+# Two column projections are loaded by the pages; keeping two versions of each lets a
+# rerun that started before an update finish while the next one loads the new version
+@st.cache_resource(max_entries=4)
+def _load_cached(columns, version):
+    metrics.cache_miss('dataset')
+    if SNAPSHOT_DIR:
+        return attach_snapshot(version, columns)
+    return read_dataset(columns)
+
+
+def load_dataset(columns=None):
+    """
+    Loads the dataset for the Streamlit pages.
+
+    All pages share one cached frame per column projection and dataset version, backed
+    by the memory-mapped snapshot of that version (published on first use), so sessions
+    and app processes on the same machine share the bulk of the data (see
+    attach_snapshot() for what each process still copies). The returned frame is shared
+    between reruns and sessions and must be treated as read-only; sessions should keep
+    row positions or views into it rather than copies.
+
+    Parameters:
+    - columns (list of str, optional): Columns to project; all columns when None.
+
+    Returns:
+    - pd.DataFrame: The projected, typed dataset.
+    """
+    metrics.cache_request('dataset')
+    return _load_cached(tuple(columns) if columns is not None else None, current_version())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the cleaned feature CSV into the typed Parquet store.")
+    parser.add_argument('--csv', default=CSV_PATH, help="Path to the cleaned feature CSV")
+    parser.add_argument('--out', default=STORE_PATH, help="Destination store directory")
+    parser.add_argument('--refresh-domains', action='store_true',
+                        help="Only recompute the domain columns of an existing store if the domain list changed")
+    parser.add_argument('--publish', action='store_true',
+                        help="Publish the memory-mapped snapshot of an existing store for the app processes")
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR, help="Snapshot directory (with --publish)")
+    args = parser.parse_args()
+    if args.publish:
+        print("Published", publish_snapshot(args.out, args.snapshot_dir, args.csv))
+    elif args.refresh_domains:
+        print("Rewrote parts" if refresh_domain_columns(args.out) else "Domain columns are up to date")
+    else:
+        print("Wrote", convert_csv(args.csv, args.out))
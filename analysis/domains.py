@@ -0,0 +1,189 @@
+import os
+import re
+import argparse
+import numpy as np
+import pandas as pd
+
+# Versioned list of unreliable domains, shipped with the code
+DOMAIN_LIST_PATH = os.path.join(os.path.dirname(__file__), 'unreliable_domains.txt')
+
+# Columns derived from the post's link, stored with the features so pages never parse URLs
+DOMAIN_COLUMNS = ['link_host', 'link_domain', 'media_type', 'youtube_id', 'is_unreliable_domain']
+
+# Host prefixes that point to the same site (mobile, AMP and numbered www hosts)
+HOST_PREFIXES = r'^(?:www\d*|m|mobile|amp)\.'
+
+# Short-link and alternate hosts -> the site they belong to
+SHORT_LINKS = {
+    'youtu.be': 'youtube.com', 'youtube-nocookie.com': 'youtube.com', 'redd.it': 'reddit.com',
+    'nyti.ms': 'nytimes.com', 'wapo.st': 'washingtonpost.com', 'cnn.it': 'cnn.com', 'fxn.ws': 'foxnews.com',
+    'reut.rs': 'reuters.com', 'politi.co': 'politico.com', 'hill.cm': 'thehill.com', 'huff.to': 'huffpost.com',
+    'huffingtonpost.com': 'huffpost.com', 'bbc.in': 'bbc.co.uk', 'bloom.bg': 'bloomberg.com', 'n.pr': 'npr.org',
+    'amzn.to': 'amazon.com', 'wp.me': 'wordpress.com', 'x.com': 'twitter.com', 't.co': 'twitter.com',
+}
+
+# Second-level suffixes under which the registrable domain has three labels (a
+# condensed public suffix list covering the hosts seen in the data)
+MULTI_LABEL_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'com.au', 'net.au', 'org.au', 'gov.au', 'co.nz', 'co.jp', 'co.in',
+    'co.za', 'com.br', 'com.mx', 'com.ar', 'com.tr', 'com.cn', 'com.sg', 'com.hk', 'co.il', 'co.kr',
+}
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'svg', 'webp'}
+VIDEO_EXTENSIONS = {'mp4', 'webm', 'mov'}
+
+_URL_PATTERN = r'^(?:[a-z][a-z0-9+.-]*:)?//(?:[^@/?#]*@)?(?P<host>[^/?#:]*)(?::\d*)?(?P<path>[^?#]*)(?:\?(?P<query>[^#]*))?'
+
+
+def normalize_hosts(hosts):
+    """
+    Lowercases hosts and strips www/mobile/AMP prefixes and trailing dots.
+    """
+    hosts = hosts.astype('string').str.strip().str.lower().str.rstrip('.')
+    return hosts.str.replace(HOST_PREFIXES, '', regex=True).replace('', pd.NA)
+
+
+def registrable_domains(hosts):
+    """
+    Reduces normalized hosts to their registrable domain ("news.bbc.co.uk" -> "bbc.co.uk"),
+    with short-link hosts mapped to their site.
+    """
+    labels = hosts.str.split('.')
+    last_two = labels.str[-2:].str.join('.')
+    last_three = labels.str[-3:].str.join('.')
+    domains = last_two.where(~last_two.isin(MULTI_LABEL_SUFFIXES) | (labels.str.len() < 3), last_three)
+    return domains.replace(SHORT_LINKS)
+
+
+def parse_urls(urls):
+    """
+    Parses link URLs in one vectorized pass over the distinct values.
+
+    Parameters:
+    - urls (pd.Series): Raw URLs (missing values allowed; a missing scheme is accepted).
+
+    Returns:
+    - pd.DataFrame: Same index as urls with link_host (normalized host), link_domain
+      (registrable domain), media_type ('image', 'video', 'youtube' or 'link') and
+      youtube_id; all missing where there is no URL.
+    """
+    codes, uniques = pd.factorize(urls.astype('string'))
+    unique = pd.Series(uniques, dtype='string').str.strip()
+    unique = unique.where(unique.str.contains('//', regex=False), '//' + unique)
+    parts = unique.str.extract(_URL_PATTERN, flags=re.IGNORECASE)
+
+    host = normalize_hosts(parts['host'])
+    domain = registrable_domains(host)
+    path = parts['path'].fillna('')
+    extension = path.str.lower().str.extract(r'\.([a-z0-9]+)/?$', expand=False)
+
+    # YouTube ids: watch?v=..., /shorts/, /embed/, /live/ and youtu.be/<id>
+    youtube = domain == 'youtube.com'
+    youtube_id = parts['query'].str.extract(r'(?:^|&)v=([\w-]{11})', expand=False)
+    youtube_id = youtube_id.fillna(path.str.extract(r'^/(?:shorts/|embed/|live/|v/)?([\w-]{11})(?:/|$)', expand=False))
+    youtube_id = youtube_id.where(youtube)
+
+    media_type = pd.Series('link', index=unique.index, dtype='string')
+    media_type = media_type.mask(extension.isin(IMAGE_EXTENSIONS), 'image')
+    media_type = media_type.mask(extension.isin(VIDEO_EXTENSIONS), 'video')
+    media_type = media_type.mask(youtube_id.notna(), 'youtube')
+    media_type = media_type.where(host.notna())
+
+    parsed = pd.DataFrame({'link_host': host, 'link_domain': domain, 'media_type': media_type, 'youtube_id': youtube_id})
+    result = parsed.reindex(codes)
+    result.index = urls.index
+    return result
+
+
+class DomainClassifier:
+    """
+    Matches hosts against a domain list through a reversed-label suffix index.
+
+    Entries are stored with their labels reversed ("breitbart.com" -> "com.breitbart"),
+    so a host matches when one of its reversed label prefixes is in the index. Hosts are
+    checked one label depth at a time, vectorized over the distinct hosts.
+    """
+
+    def __init__(self, domains, version=None):
+        self.version = version
+        self.index = {'.'.join(reversed(domain.split('.'))) for domain in domains}
+        self.depth = max((key.count('.') + 1 for key in self.index), default=0)
+
+    @classmethod
+    def from_file(cls, path=DOMAIN_LIST_PATH):
+        """
+        Loads a list file: one domain per line, '#' comments, and a '# version: ...' line.
+        """
+        version, domains = None, []
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if line.startswith('#'):
+                    if line[1:].strip().lower().startswith('version:'):
+                        version = line.split(':', 1)[1].strip()
+                elif line:
+                    domains.append(normalize_hosts(pd.Series([line])).iloc[0])
+        return cls(domains, version)
+
+    def matches(self, hosts):
+        """
+        Returns a boolean Series: whether each host is a listed domain or one of its subdomains.
+        """
+        codes, uniques = pd.factorize(hosts.astype('string'))
+        labels = pd.Series(uniques, dtype='string').str.split('.')
+        reversed_labels = labels.str[::-1]
+        matched = np.zeros(len(uniques), dtype=bool)
+        for depth in range(1, self.depth + 1):
+            matched |= reversed_labels.str[:depth].str.join('.').isin(self.index).to_numpy()
+        return pd.Series(np.append(matched, False)[codes], index=hosts.index)
+
+
+_classifiers = {}
+
+
+def get_classifier(path=DOMAIN_LIST_PATH):
+    """
+    Returns the classifier for a list file, reloaded when the file changes.
+    """
+    key = (path, os.path.getmtime(path))
+    if key not in _classifiers:
+        _classifiers[key] = DomainClassifier.from_file(path)
+    return _classifiers[key]
+
+
+def add_domain_columns(df, classifier=None):
+    """
+    Computes DOMAIN_COLUMNS for feature rows.
+
+    The link is url_overridden_by_dest_original (the external destination; missing for
+    self posts). Reliability is matched on the link host and its registrable domain, or on
+    domain_original for posts without an external link.
+
+    Parameters:
+    - df (pd.DataFrame): Rows with the link and domain_original columns.
+    - classifier (DomainClassifier, optional): Defaults to the shipped list.
+
+    Returns:
+    - pd.DataFrame: The rows with the domain columns (re)computed.
+    """
+    classifier = classifier or get_classifier()
+    parsed = parse_urls(df['url_overridden_by_dest_original'])
+    for column in parsed.columns:
+        df[column] = parsed[column]
+
+    host = parsed['link_host'].fillna(normalize_hosts(df['domain_original']))
+    domain = parsed['link_domain'].fillna(registrable_domains(host))
+    df['is_unreliable_domain'] = classifier.matches(host) | classifier.matches(domain)
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse URLs and classify their domains.")
+    parser.add_argument('urls', nargs='+', help="URLs to parse")
+    parser.add_argument('--list', default=DOMAIN_LIST_PATH, help="Domain list file")
+    args = parser.parse_args()
+    classifier = DomainClassifier.from_file(args.list)
+    parsed = parse_urls(pd.Series(args.urls))
+    parsed['unreliable'] = classifier.matches(parsed['link_host']) | classifier.matches(parsed['link_domain'])
+    print(f"Domain list version {classifier.version} ({len(classifier.index)} domains)")
+    print(parsed.to_string(index=False))
@@ -0,0 +1,334 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+import streamlit as st
+from analysis.dataset import STORE_PATH, read_dataset
+from analysis.search import tokenize
+from analysis import metrics
+
+# Persisted index: MinHash signatures, post metadata with cluster labels, and the LSH band table
+DUPLICATES_DIR = './cleaned_data/near_duplicates'
+
+SOURCE_COLUMNS = [
+    'id_original', 'created_utc_original', 'author_original', 'subreddit_original', 'title_original', 'url_original'
+]
+
+# 128 hash functions split into 32 bands of 4 rows: pairs above ~0.5 Jaccard collide in
+# at least one band with high probability, and candidates are then checked on the signature
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+THRESHOLD = 0.5
+
+# Posts of one cluster published within this many hours count as coordinated
+WINDOW_HOURS = 24
+
+# Largest prime below 2^32, so signature values fit in uint32
+PRIME = np.uint64(4294967291)
+
+# Documents hashed per chunk (bounds the (NUM_PERM, shingles) working array)
+CHUNK_DOCS = 5000
+
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, 2 ** 31, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2 ** 31, size=NUM_PERM, dtype=np.uint64)
+
+
+def normalize_urls(urls):
+    """
+    Normalizes link URLs so the same article shared with different tracking parameters,
+    schemes or hosts prefixes compares equal. Links to Reddit itself become missing.
+
+    Parameters:
+    - urls (pd.Series): Raw URLs.
+
+    Returns:
+    - pd.Series: Normalized URLs (string dtype).
+    """
+    urls = urls.astype('string').str.strip().str.lower()
+    urls = urls.str.replace(r'^[a-z]+://', '', regex=True).str.replace(r'^(www\.|m\.|amp\.)', '', regex=True)
+    urls = urls.str.replace(r'[?#].*$', '', regex=True).str.rstrip('/')
+    internal = urls.str.match(r'^(old\.|np\.)?reddit\.com/').fillna(False) | (urls == '').fillna(False)
+    return urls.mask(internal)
+
+
+def shingles(titles, urls):
+    """
+    Builds the shingle set of each post: word bigrams of the title (single words for
+    one-word titles) plus the normalized URL as one extra shingle.
+
+    Returns:
+    - list of list of str: Shingles per post (empty when there is nothing to compare).
+    """
+    result = []
+    for title, url in zip(titles, urls):
+        tokens = tokenize(title) if isinstance(title, str) else []
+        grams = [f'{a} {b}' for a, b in zip(tokens, tokens[1:])] or tokens
+        if isinstance(url, str):
+            grams.append('url:' + url)
+        result.append(sorted(set(grams)))
+    return result
+
+
+def minhash_signatures(shingle_lists):
+    """
+    Computes MinHash signatures, vectorized over all shingles of a chunk of documents.
+
+    Parameters:
+    - shingle_lists (list of list of str): Non-empty shingle lists.
+
+    Returns:
+    - np.ndarray: (documents, NUM_PERM) uint32 signatures.
+    """
+    signatures = np.empty((len(shingle_lists), NUM_PERM), dtype=np.uint32)
+    for start in range(0, len(shingle_lists), CHUNK_DOCS):
+        chunk = shingle_lists[start:start + CHUNK_DOCS]
+        lengths = np.fromiter((len(grams) for grams in chunk), dtype=np.int64, count=len(chunk))
+        flat = pd.Series([gram for grams in chunk for gram in grams], dtype='object')
+        hashes = pd.util.hash_array(flat.to_numpy()) % PRIME
+        permuted = (_A[:, None] * hashes[None, :] + _B[:, None]) % PRIME
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        signatures[start:start + len(chunk)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return signatures
+
+
+def band_keys(signatures):
+    """
+    Hashes each band of ROWS signature values into one uint64 bucket key.
+
+    Returns:
+    - np.ndarray: (documents, BANDS) uint64 keys.
+    """
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    keys = np.zeros(bands.shape[:2], dtype=np.uint64)
+    for row in range(ROWS):
+        keys = (keys ^ bands[:, :, row]) * np.uint64(0x9E3779B97F4A7C15)
+    return keys
+
+
+def bucket_ids(bands, keys):
+    """
+    Combines band numbers and band keys into one uint64 id per (band, key) bucket.
+
+    Ids of different buckets can collide with negligible probability; a collision only
+    adds a candidate, which is then rejected on its signature agreement.
+    """
+    return keys ^ ((bands.astype(np.uint64) + np.uint64(1)) * np.uint64(0xBF58476D1CE4E5B9))
+
+
+def _union(labels, src, dst):
+    # Connected components over label ids: hook roots onto the smaller root, then
+    # compress paths, until every edge joins two nodes with the same root
+    parent = np.arange(len(labels))
+    while True:
+        root_src, root_dst = parent[src], parent[dst]
+        if (root_src == root_dst).all():
+            break
+        low = np.minimum(root_src, root_dst)
+        np.minimum.at(parent, root_src, low)
+        np.minimum.at(parent, root_dst, low)
+        while True:
+            grandparent = parent[parent]
+            if (grandparent == parent).all():
+                break
+            parent = grandparent
+    return parent[labels]
+
+
+class DuplicateIndex:
+    """
+    MinHash LSH index of posts with incremental insertion.
+
+    Every (band, key) bucket keeps a representative post (the first inserted) in a
+    table sorted by bucket id. A new post finds its BANDS buckets with one binary search
+    each and is compared only with their representatives, linked to those whose
+    signature agreement (the Jaccard estimate) reaches THRESHOLD, so the lookups and
+    comparisons of an insert do not grow with the number of indexed posts. Adding the
+    new buckets, relabelling and saving still copy arrays proportional to the index
+    size. Clusters are the connected components of these links; a post's label is the
+    first row of its cluster.
+    """
+
+    def __init__(self, posts=None, signatures=None, bands=None):
+        self.posts = posts if posts is not None else pd.DataFrame({
+            'id': pd.Series(dtype='string'), 'created_utc': pd.Series(dtype='datetime64[ns]'),
+            'author': pd.Series(dtype='string'), 'subreddit': pd.Series(dtype='string'),
+            'title': pd.Series(dtype='string'), 'url': pd.Series(dtype='string'), 'label': pd.Series(dtype='int64')
+        })
+        self.signatures = signatures if signatures is not None else np.empty((0, NUM_PERM), dtype=np.uint32)
+        self.bands = bands if bands is not None else pd.DataFrame({
+            'bucket': pd.Series(dtype='uint64'), 'row': pd.Series(dtype='int64')
+        })
+
+    def __len__(self):
+        return len(self.posts)
+
+    def insert(self, df):
+        """
+        Adds the posts of a batch of feature rows (ids already indexed are skipped).
+
+        Parameters:
+        - df (pd.DataFrame): Feature rows with SOURCE_COLUMNS.
+
+        Returns:
+        - int: Number of posts added.
+        """
+        batch = df.drop_duplicates('id_original')
+        # Compared as objects: isin on Arrow-backed strings loops in Python over the values
+        batch = batch[~batch['id_original'].astype('object').isin(self.posts['id'].astype('object'))]
+        urls = normalize_urls(batch['url_original'])
+        grams = shingles(batch['title_original'].astype('object'), urls.astype('object'))
+        keep = np.array([len(g) > 0 for g in grams], dtype=bool)
+        if not keep.any():
+            return 0
+        batch, urls = batch[keep], urls[keep]
+        signatures = minhash_signatures([g for g, k in zip(grams, keep) if k])
+
+        offset = len(self.posts)
+        rows = np.arange(offset, offset + len(batch))
+        new_posts = pd.DataFrame({
+            'id': batch['id_original'].astype('string').to_numpy(),
+            'created_utc': pd.to_datetime(batch['created_utc_original']).to_numpy(dtype='datetime64[ns]'),
+            'author': batch['author_original'].astype('string').to_numpy(),
+            'subreddit': batch['subreddit_original'].astype('string').to_numpy(),
+            'title': batch['title_original'].astype('string').to_numpy(),
+            'url': urls.to_numpy(),
+            'label': rows,
+        })
+        self.posts = pd.concat([self.posts, new_posts], ignore_index=True) if offset else new_posts
+        self.signatures = np.concatenate([self.signatures, signatures])
+
+        # Bucket lookups: buckets already in the table keep their representative
+        buckets = bucket_ids(np.tile(np.arange(BANDS), len(rows)), band_keys(signatures).ravel())
+        members = np.repeat(rows, BANDS)
+        stored, stored_rows = self.bands['bucket'].to_numpy(), self.bands['row'].to_numpy()
+        found = np.searchsorted(stored, buckets).clip(max=max(len(stored) - 1, 0))
+        known = (stored[found] == buckets) if len(stored) else np.zeros(len(buckets), dtype=bool)
+        reps = np.where(known, stored_rows[found] if len(stored) else members, members)
+
+        # New buckets: the smallest row of the batch that falls into one represents it
+        new = np.flatnonzero(~known)
+        new = new[np.lexsort((members[new], buckets[new]))]
+        first = np.concatenate([[True], buckets[new][1:] != buckets[new][:-1]])
+        reps[new] = members[new][first][np.cumsum(first) - 1]
+        new_buckets, new_rows = buckets[new][first], members[new][first]
+        at = np.searchsorted(stored, new_buckets)
+        self.bands = pd.DataFrame({
+            'bucket': np.insert(stored, at, new_buckets), 'row': np.insert(stored_rows, at, new_rows)
+        })
+
+        linked = reps != members
+        links = np.unique(np.stack([members[linked], reps[linked]], axis=1), axis=0)
+        src, dst = links[:, 0], links[:, 1]
+        agreement = (self.signatures[src] == self.signatures[dst]).mean(axis=1)
+        src, dst = src[agreement >= THRESHOLD], dst[agreement >= THRESHOLD]
+        if len(src):
+            labels = self.posts['label'].to_numpy()
+            self.posts['label'] = _union(labels, labels[src], labels[dst])
+        return len(rows)
+
+    def clusters(self, min_size=2):
+        """
+        Summarizes the clusters of near-duplicate posts.
+
+        Returns:
+        - pd.DataFrame: One row per cluster, largest first, with its size, distinct authors
+          and subreddits (counts and the most frequent names), first and last post time,
+          time spread in hours, an example title and URL, and whether it looks coordinated
+          (several authors or subreddits within WINDOW_HOURS).
+        """
+        sizes = self.posts['label'].map(self.posts['label'].value_counts())
+        posts = self.posts[sizes >= min_size]
+        if posts.empty:
+            return pd.DataFrame(columns=[
+                'cluster', 'posts', 'authors', 'subreddits', 'first', 'last', 'spread_hours', 'top_authors',
+                'top_subreddits', 'title', 'url', 'coordinated'
+            ])
+        top_names = lambda names: ', '.join(names.value_counts().index[:5])
+        table = posts.groupby('label', sort=False).agg(
+            posts=('id', 'size'), authors=('author', 'nunique'), subreddits=('subreddit', 'nunique'),
+            first=('created_utc', 'min'), last=('created_utc', 'max'), top_authors=('author', top_names),
+            top_subreddits=('subreddit', top_names), title=('title', 'first'), url=('url', 'first')
+        ).rename_axis('cluster').reset_index()
+        table['spread_hours'] = (table['last'] - table['first']).dt.total_seconds() / 3600
+        table['coordinated'] = ((table['authors'] > 1) | (table['subreddits'] > 1)) & (table['spread_hours'] <= WINDOW_HOURS)
+        return table.sort_values(['posts', 'first'], ascending=[False, True], ignore_index=True)
+
+    def members(self, cluster):
+        """
+        Returns the posts of one cluster, oldest first.
+        """
+        return self.posts[self.posts['label'] == cluster].sort_values('created_utc').drop(columns='label')
+
+    def save(self, duplicates_dir):
+        os.makedirs(duplicates_dir, exist_ok=True)
+        np.save(os.path.join(duplicates_dir, 'signatures.npy'), self.signatures)
+        self.bands.to_parquet(os.path.join(duplicates_dir, 'bands.parquet'), index=False)
+        self.posts.to_parquet(os.path.join(duplicates_dir, 'posts.parquet'), index=False)
+
+    @classmethod
+    def load(cls, duplicates_dir):
+        bands = pd.read_parquet(os.path.join(duplicates_dir, 'bands.parquet'))
+        if 'bucket' not in bands:
+            # Indexes saved before bucket ids stored (band, key, row) in any order
+            bands = pd.DataFrame({
+                'bucket': bucket_ids(bands['band'].to_numpy(), bands['key'].to_numpy()), 'row': bands['row'].to_numpy()
+            }).sort_values('bucket', kind='stable', ignore_index=True)
+        return cls(
+            posts=pd.read_parquet(os.path.join(duplicates_dir, 'posts.parquet')),
+            signatures=np.load(os.path.join(duplicates_dir, 'signatures.npy')),
+            bands=bands
+        )
+
+
+def build_duplicate_index(store_path=STORE_PATH, duplicates_dir=DUPLICATES_DIR):
+    """
+    Builds the index from the whole feature store.
+    """
+    index = DuplicateIndex()
+    index.insert(read_dataset(SOURCE_COLUMNS, store_path=store_path))
+    index.save(duplicates_dir)
+    return index
+
+
+def update_duplicate_index(batch_df, duplicates_dir=DUPLICATES_DIR):
+    """
+    Inserts the posts of newly appended rows into the persisted index (no-op if it was
+    not built yet).
+    """
+    if not os.path.exists(os.path.join(duplicates_dir, 'posts.parquet')):
+        return None
+    index = DuplicateIndex.load(duplicates_dir)
+    if index.insert(batch_df):
+        index.save(duplicates_dir)
+    return index
+
+
+@st.cache_resource
+def _load_duplicate_index_cached(duplicates_dir, mtime):
+    metrics.cache_miss('near_duplicates')
+    return DuplicateIndex.load(duplicates_dir)
+
+
+def load_duplicate_index(duplicates_dir=DUPLICATES_DIR):
+    """
+    Loads the index for the app, building it on first use; reloaded after updates.
+    """
+    posts_path = os.path.join(duplicates_dir, 'posts.parquet')
+    if not os.path.exists(posts_path):
+        build_duplicate_index(duplicates_dir=duplicates_dir)
+    metrics.cache_request('near_duplicates')
+    return _load_duplicate_index_cached(duplicates_dir, os.path.getmtime(posts_path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the near-duplicate index and print the largest clusters.")
+    parser.add_argument('--store', default=STORE_PATH, help="Feature store directory")
+    parser.add_argument('--output', default=DUPLICATES_DIR, help="Output directory")
+    parser.add_argument('--top', type=int, default=10, help="Number of clusters to print")
+    args = parser.parse_args()
+    index = build_duplicate_index(args.store, args.output)
+    clusters = index.clusters()
+    print(f"{len(index)} posts, {len(clusters)} clusters, {int(clusters['coordinated'].sum())} coordinated")
+    print(clusters.head(args.top)[['posts', 'authors', 'subreddits', 'spread_hours', 'title']].to_string(index=False))
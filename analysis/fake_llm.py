@@ -0,0 +1,84 @@
+import json
+import time
+import random
+import hashlib
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from analysis.llm_executor import TokenBucket
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """
+    POST /generate with {"prompt": ...}: streams a deterministic answer as JSON lines
+    after a simulated first-token latency, or answers 429 when over the rate limit.
+    """
+
+    protocol_version = 'HTTP/1.0'
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        prompt = json.loads(body or b'{}').get('prompt', '')
+        server.requests += 1
+
+        if server.bucket.try_acquire() > 0 or random.random() < server.error_rate:
+            server.rejected += 1
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.end_headers()
+            return
+
+        time.sleep(server.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8]
+        answer = f"Simulated answer {digest} for a prompt of {len(prompt)} characters."
+        for word in answer.split(' '):
+            self.wfile.write((json.dumps({'text': word + ' '}) + '\n').encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(server.token_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=8765, latency=0.5, token_delay=0.05, requests_per_minute=10, burst=2,
+                error_rate=0.0):
+    """
+    Creates (without starting) a fake LLM server.
+
+    Parameters:
+    - host, port: Address to bind; port 0 picks a free port.
+    - latency (float): Seconds before the first chunk.
+    - token_delay (float): Seconds between chunks.
+    - requests_per_minute (float), burst (int): Server-side rate limit; excess requests get 429.
+    - error_rate (float): Probability of an extra random 429.
+
+    Returns:
+    - ThreadingHTTPServer: Call serve_forever() (e.g. on a thread) and shutdown() when done.
+    """
+    server = ThreadingHTTPServer((host, port), FakeLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.token_delay = token_delay
+    server.error_rate = error_rate
+    server.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+    server.requests = 0
+    server.rejected = 0
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local fake LLM endpoint for LLM_PROVIDER=http.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds before the first chunk")
+    parser.add_argument('--token-delay', type=float, default=0.05, help="Seconds between chunks")
+    parser.add_argument('--rpm', type=float, default=10, help="Requests per minute before answering 429")
+    parser.add_argument('--burst', type=int, default=2, help="Requests allowed back to back")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Probability of a random 429")
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, args.latency, args.token_delay, args.rpm, args.burst, args.error_rate)
+    print(f"Fake LLM listening on http://{args.host}:{server.server_port}/generate")
+    server.serve_forever()
@@ -0,0 +1,332 @@
+import os
+import re
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from analysis.dataset import STORE_PATH, AUTHOR_COUNTS_FILE, NO_CROSSPOST, apply_schema, list_parts, read_store, refresh_domain_columns
+from analysis.dataset import store_schema
+from analysis.domains import add_domain_columns
+from analysis.ingest import OUTPUT_DIR, CROSSPOST_COLUMNS_TO_KEEP
+from analysis.sentiment import add_sentiment
+from analysis.cube import CUBE_PATH, update_cube
+from analysis.search import update_index
+from analysis.retrieval import update_index as update_retrieval_index
+from analysis.graph import update_graphs
+from analysis.terms import update_term_sketches
+from analysis.duplicates import update_duplicate_index
+
+# Maintained state of the incremental pipeline, stored next to the parts
+POST_IDS_FILE = '_post_ids.parquet'
+PENDING_CROSSPOSTS_FILE = '_pending_crossposts.parquet'
+
+
+def merge_crossposts(posts_df, crossposts_df):
+    """
+    Joins posts with their crossposts the same way the notebook builds combined_df.
+
+    Parameters:
+    - posts_df (pd.DataFrame): Filtered posts (ingest output).
+    - crossposts_df (pd.DataFrame): Filtered crossposts carrying a parent_id.
+
+    Returns:
+    - pd.DataFrame: One row per (post, crosspost) pair, text crosspost columns filled with "no_crosspost".
+    """
+    combined_df = posts_df.merge(
+        crossposts_df,
+        left_on='id',
+        right_on='parent_id',
+        how='left',
+        suffixes=('_original', '_crosspost')
+    )
+
+    # Fill missing crosspost text with the placeholder; numeric columns stay missing
+    for column in combined_df.columns:
+        if '_crosspost' in column and not pd.api.types.is_numeric_dtype(combined_df[column]) \
+                and not pd.api.types.is_bool_dtype(combined_df[column]):
+            combined_df[column] = combined_df[column].astype('object').fillna(NO_CROSSPOST)
+    return combined_df
+
+
+def add_features(combined_df, author_counts):
+    """
+    Computes the engineered columns of combined_df_after_fe for a batch of rows.
+
+    Every feature is row-local except author_post_count, which is looked up in the
+    maintained per-author totals instead of being counted over the batch.
+
+    Parameters:
+    - combined_df (pd.DataFrame): Merged posts and crossposts.
+    - author_counts (pd.Series): Rows per author, already including this batch.
+
+    Returns:
+    - pd.DataFrame: The batch with feature columns added.
+    """
+    df = combined_df
+
+    # Timestamps and time components
+    for suffix in ['original', 'crosspost']:
+        created = pd.to_numeric(df[f'created_utc_{suffix}'], errors='coerce')
+        df[f'created_utc_{suffix}'] = pd.to_datetime(created, unit='s', errors='coerce')
+        df[f'hour_{suffix}'] = df[f'created_utc_{suffix}'].dt.hour
+        df[f'day_of_week_{suffix}'] = df[f'created_utc_{suffix}'].dt.day_name()
+        df[f'date_{suffix}'] = df[f'created_utc_{suffix}'].dt.normalize()
+
+    # Text features
+    df['title_length'] = df['title_original'].str.len()
+    df['selftext_length'] = df['selftext_original'].str.len()
+    df['is_breaking_news'] = df['title_original'].str.contains('breaking', case=False, na=False)
+    df = add_sentiment(df)
+
+    # Engagement ratios (avoid division by zero)
+    ups = pd.to_numeric(df['ups_original'], errors='coerce')
+    df['comment_upvote_ratio'] = df['num_comments_original'] / ups.replace(0, 1)
+    df['award_upvote_ratio'] = df['total_awards_received_original'] / ups.replace(0, 1)
+    df['ups_per_subscriber'] = ups / df['subreddit_subscribers_original'].replace(0, 1)
+    df['comments_per_subscriber'] = df['num_comments_original'] / df['subreddit_subscribers_original'].replace(0, 1)
+
+    # Crosspost comparisons
+    df['time_lag_hours'] = (df['created_utc_crosspost'] - df['created_utc_original']).dt.total_seconds() / 3600
+    df['is_different_subreddit'] = df['subreddit_original'] != df['subreddit_crosspost']
+    df['ups_difference'] = pd.to_numeric(df['ups_crosspost'], errors='coerce') - ups
+
+    # Link and source features (parsed once here, stored as columns)
+    df = add_domain_columns(df)
+
+    # Author features
+    df['author_post_count'] = df['author_original'].map(author_counts)
+    df['has_unverified_flair'] = df['author_flair_type_original'].str.contains('unverified', case=False, na=False)
+
+    df['title_sentiment'] = df['title_sentiment'].fillna(0)
+    df['selftext_sentiment'] = df['selftext_sentiment'].fillna(0)
+    return df
+
+
+def load_state(store_path=STORE_PATH):
+    """
+    Loads the maintained state of the incremental pipeline.
+
+    When the store was built from the notebook CSV and has no state yet, the state
+    is bootstrapped once from the id and author columns of the existing parts.
+
+    Returns:
+    - dict: 'post_ids' (set), 'author_counts' (pd.Series) and 'pending_crossposts' (pd.DataFrame or None).
+    """
+    ids_path = os.path.join(store_path, POST_IDS_FILE)
+    counts_path = os.path.join(store_path, AUTHOR_COUNTS_FILE)
+    pending_path = os.path.join(store_path, PENDING_CROSSPOSTS_FILE)
+
+    if os.path.exists(ids_path):
+        post_ids = set(pd.read_parquet(ids_path)['id'])
+        author_counts = pd.read_parquet(counts_path).set_index('author')['count']
+    elif list_parts(store_path):
+        existing = read_store(store_path, ['id_original', 'author_original'])
+        post_ids = set(existing['id_original'].astype('object'))
+        author_counts = existing['author_original'].astype('object').value_counts()
+    else:
+        post_ids = set()
+        author_counts = pd.Series(dtype='int64')
+
+    pending = pd.read_parquet(pending_path) if os.path.exists(pending_path) else None
+    return {'post_ids': post_ids, 'author_counts': author_counts, 'pending_crossposts': pending}
+
+
+def save_state(state, store_path=STORE_PATH):
+    """
+    Persists the maintained state next to the store parts.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    pd.DataFrame({'id': sorted(state['post_ids'])}).to_parquet(os.path.join(store_path, POST_IDS_FILE), index=False)
+    counts = state['author_counts'].rename_axis('author').rename('count').reset_index()
+    counts.to_parquet(os.path.join(store_path, AUTHOR_COUNTS_FILE), index=False)
+
+    pending_path = os.path.join(store_path, PENDING_CROSSPOSTS_FILE)
+    if state['pending_crossposts'] is not None and not state['pending_crossposts'].empty:
+        state['pending_crossposts'].to_parquet(pending_path, index=False)
+    elif os.path.exists(pending_path):
+        os.remove(pending_path)
+
+
+def _align_to_store(df, store_path):
+    # Match the column order and dtypes of the existing parts so the store reads as one table
+    if not list_parts(store_path):
+        return df
+    template = store_schema(store_path).empty_table().to_pandas()
+    df = df.reindex(columns=template.columns)
+    for column, dtype in template.dtypes.items():
+        # Categories differ per part and are unified on read, so only plain dtypes are cast
+        if isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if df[column].dtype != dtype:
+            try:
+                df[column] = df[column].astype(dtype)
+            except (TypeError, ValueError) as exc:
+                raise ValueError(
+                    f"Column {column} of the batch ({df[column].dtype}) cannot be stored as {dtype} like the existing parts"
+                ) from exc
+    return df
+
+
+def _stored_posts(store_path, post_ids, columns):
+    # Ingest-format rows of posts that are already in the store, rebuilt from their first
+    # stored row, so crossposts arriving after their parent can be joined to it
+    stored = read_store(store_path, filters=[('id_original', 'in', sorted(post_ids))])
+    stored = stored.drop_duplicates('id_original').reset_index(drop=True)
+    posts = pd.DataFrame(index=stored.index)
+    for column in columns:
+        # Columns that clash with a crosspost column were stored with the _original suffix
+        source = f'{column}_original' if f'{column}_original' in stored else column
+        if source in stored:
+            posts[column] = stored[source].astype('object') if isinstance(stored[source].dtype, pd.CategoricalDtype) \
+                else stored[source]
+    # Timestamps back to Unix seconds, as ingested
+    posts['created_utc'] = stored['created_utc_original'].astype('datetime64[s]').astype('int64')
+    return posts
+
+
+def _find_placeholders(store_path, post_ids):
+    # Locates the no_crosspost rows of stored posts that just got their first crosspost
+    # (a full rebuild would not have them). Returns part path -> mask of those rows, and
+    # the number of them per author.
+    masks, authors = {}, []
+    for part_path in list_parts(store_path):
+        keys = pd.read_parquet(part_path, columns=['id_original', 'id_crosspost', 'author_original'])
+        placeholder = (keys['id_original'].astype('object').isin(post_ids)
+                       & (keys['id_crosspost'].astype('object').fillna(NO_CROSSPOST) == NO_CROSSPOST)).to_numpy()
+        if placeholder.any():
+            masks[part_path] = placeholder
+            authors.append(keys.loc[placeholder, 'author_original'].astype('object'))
+    counts = pd.concat(authors).value_counts() if authors else pd.Series(dtype='int64')
+    return masks, counts
+
+
+def _drop_rows(masks):
+    # Rewrites each part without the masked rows (schema and metadata unchanged)
+    for part_path, mask in masks.items():
+        tmp_path = f'{part_path}.{os.getpid()}.tmp'
+        pq.write_table(pq.read_table(part_path).filter(pa.array(~mask)), tmp_path)
+        os.replace(tmp_path, part_path)
+
+
+def _next_part_path(store_path):
+    parts = list_parts(store_path)
+    index = 0
+    if parts:
+        index = int(re.search(r'part-(\d+)', os.path.basename(parts[-1])).group(1)) + 1
+    return os.path.join(store_path, f'part-{index:05d}.parquet')
+
+
+def append_batch(posts_df, crossposts_df, store_path=STORE_PATH, cube_path=CUBE_PATH):
+    """
+    Applies feature engineering to new posts only and appends them to the store.
+
+    Posts whose id is already in the store are skipped. Crossposts are joined to
+    their parent in this batch, or to the stored parent: a row for the pair is
+    appended, and the parent's no_crosspost row is removed from its part if this is
+    its first crosspost, so the store matches a full rebuild. Crossposts whose parent
+    has not arrived yet are kept as pending state and joined when it does.
+    author_post_count is updated from the maintained per-author totals, and
+    read_dataset() refreshes it for older parts.
+    The analytics cube, the search index, the chatbot retrieval index, the crosspost
+    graphs, the title term sketches and the near-duplicate index, if built, are updated
+    with the new rows.
+
+    Parameters:
+    - posts_df (pd.DataFrame): New posts in ingest format.
+    - crossposts_df (pd.DataFrame): New crossposts in ingest format.
+    - store_path (str): Directory of the Parquet store.
+    - cube_path (str): Analytics cube to update.
+
+    Returns:
+    - int: Number of feature rows appended.
+    """
+    state = load_state(store_path)
+    refresh_domain_columns(store_path)
+
+    posts_df = posts_df.drop(columns=['date'], errors='ignore')
+    posts_df = posts_df[~posts_df['id'].isin(state['post_ids'])].drop_duplicates('id', keep='last')
+
+    crossposts_df = crossposts_df.reindex(columns=CROSSPOST_COLUMNS_TO_KEEP)
+    if state['pending_crossposts'] is not None:
+        crossposts_df = pd.concat([state['pending_crossposts'], crossposts_df], ignore_index=True)
+    crossposts_df = crossposts_df.drop_duplicates(['parent_id', 'id'], keep='last')
+    joinable = crossposts_df['parent_id'].isin(posts_df['id'])
+    late = ~joinable & crossposts_df['parent_id'].isin(state['post_ids'])
+    state['pending_crossposts'] = crossposts_df[~joinable & ~late]
+
+    if posts_df.empty and not late.any():
+        save_state(state, store_path)
+        return 0
+
+    combined_df = merge_crossposts(posts_df, crossposts_df[joinable])
+    if late.any():
+        parents = _stored_posts(store_path, set(crossposts_df.loc[late, 'parent_id']), posts_df.columns)
+        late_df = merge_crossposts(parents, crossposts_df[late])
+        combined_df = pd.concat([combined_df, late_df], ignore_index=True) if not posts_df.empty else late_df
+
+    # Drop rows missing critical time or subreddit data, impute engagement metrics
+    combined_df = combined_df.dropna(subset=['created_utc_original', 'subreddit_original'])
+    for column in ['ups_original', 'num_comments_original', 'num_crossposts_original']:
+        combined_df[column] = combined_df[column].fillna(0)
+    combined_df['author_original'] = combined_df['author_original'].fillna('unknown')
+
+    # Update per-author totals with this batch before looking them up; the placeholder
+    # rows replaced by late crossposts no longer count
+    placeholders, replaced = {}, pd.Series(dtype='int64')
+    if late.any():
+        placeholders, replaced = _find_placeholders(store_path, set(crossposts_df.loc[late, 'parent_id']))
+    state['author_counts'] = state['author_counts'].add(
+        combined_df['author_original'].astype('object').value_counts(), fill_value=0
+    ).sub(replaced, fill_value=0).astype('int64')
+
+    combined_df = add_features(combined_df, state['author_counts'])
+    combined_df = _align_to_store(apply_schema(combined_df), store_path)
+
+    os.makedirs(store_path, exist_ok=True)
+    combined_df.to_parquet(_next_part_path(store_path), index=False)
+    _drop_rows(placeholders)
+
+    # Post-level aggregates only take the new posts; the rows of late crossposts repeat
+    # a stored post (the indexes below skip ids they already hold)
+    new_posts_df = combined_df[combined_df['id_original'].isin(posts_df['id'])]
+    update_cube(new_posts_df, cube_path)
+    update_index(combined_df)
+    update_retrieval_index(combined_df)
+    update_graphs(combined_df)
+    update_term_sketches(new_posts_df)
+    update_duplicate_index(combined_df)
+
+    state['post_ids'].update(posts_df['id'])
+    save_state(state, store_path)
+    return len(combined_df)
+
+
+def append_from_ingest(ingest_dir=OUTPUT_DIR, store_path=STORE_PATH, since=None):
+    """
+    Appends the ingested partitions (optionally only days >= since) to the store.
+
+    Parameters:
+    - ingest_dir (str): Output directory of analysis.ingest.
+    - store_path (str): Directory of the Parquet store.
+    - since (str, optional): First partition day to read (YYYY-MM-DD).
+
+    Returns:
+    - int: Number of feature rows appended.
+    """
+    filters = [('date', '>=', since)] if since else None
+    posts_df = pd.read_parquet(os.path.join(ingest_dir, 'posts'), filters=filters)
+    crosspost_dir = os.path.join(ingest_dir, 'crossposts')
+    if os.path.isdir(crosspost_dir):
+        crossposts_df = pd.read_parquet(crosspost_dir, filters=filters)
+    else:
+        crossposts_df = pd.DataFrame(columns=CROSSPOST_COLUMNS_TO_KEEP)
+    return append_batch(posts_df, crossposts_df, store_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append newly ingested posts to the feature store.")
+    parser.add_argument('--ingested', default=OUTPUT_DIR, help="Output directory of analysis.ingest")
+    parser.add_argument('--store', default=STORE_PATH, help="Feature store directory")
+    parser.add_argument('--since', default=None, help="Only read ingested partitions from this day (YYYY-MM-DD)")
+    args = parser.parse_args()
+    print(f"Appended {append_from_ingest(args.ingested, args.store, args.since)} rows")
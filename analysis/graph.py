@@ -0,0 +1,310 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+import streamlit as st
+from analysis.dataset import STORE_PATH, NO_CROSSPOST, read_dataset
+from analysis import metrics
+
+# Persisted graphs: one edge list and one node table per graph kind
+GRAPH_DIR = './cleaned_data/crosspost_graph'
+
+# Graph kind -> (source column, target column); edges point from the post to its crosspost
+KINDS = {
+    'author': ('author_original', 'author_crosspost'),
+    'subreddit': ('subreddit_original', 'subreddit_crosspost'),
+}
+
+SOURCE_COLUMNS = [
+    'id_crosspost', 'author_original', 'author_crosspost', 'subreddit_original', 'subreddit_crosspost',
+    'is_unreliable_domain', 'title_original'
+]
+
+DAMPING = 0.85
+
+
+def crosspost_edges(df, kind):
+    """
+    Extracts the weighted crosspost edges of one graph kind.
+
+    Parameters:
+    - df (pd.DataFrame): Feature rows with SOURCE_COLUMNS.
+    - kind (str): 'author' or 'subreddit'.
+
+    Returns:
+    - pd.DataFrame: One row per (source, target) with the number of crossposts, how many
+      came from unreliable domains, and one example title.
+    """
+    source, target = KINDS[kind]
+    has_crosspost = df['id_crosspost'].astype('object').fillna(NO_CROSSPOST) != NO_CROSSPOST
+    rows = pd.DataFrame({
+        'source': df.loc[has_crosspost, source].astype('string'),
+        'target': df.loc[has_crosspost, target].astype('string'),
+        'unreliable': df.loc[has_crosspost, 'is_unreliable_domain'].fillna(False).astype(bool),
+        'title': df.loc[has_crosspost, 'title_original'].astype('string'),
+    }).dropna(subset=['source', 'target'])
+    rows = rows[(rows['source'] != NO_CROSSPOST) & (rows['target'] != NO_CROSSPOST)]
+    return rows.groupby(['source', 'target'], sort=False).agg(
+        weight=('unreliable', 'size'), unreliable=('unreliable', 'sum'), title=('title', 'first')
+    ).reset_index()
+
+
+class CrosspostGraph:
+    """
+    Directed, weighted crosspost graph stored as array-backed CSR adjacency.
+
+    Node i's out-edges are indices[indptr[i]:indptr[i+1]] with the matching weights.
+    Degree, PageRank and weakly connected components are computed with vectorized
+    array operations and kept as node columns. With compute=False, the given PageRank
+    and components (e.g. the stored node table) are used as they are.
+    """
+
+    def __init__(self, edges, pagerank=None, components=None, compute=True):
+        # Node ids are positions in self.names; previous PageRank/components (by name)
+        # warm-start the computation
+        self.names = pd.Index(pd.unique(pd.concat([edges['source'], edges['target']], ignore_index=True)))
+        src = self.names.get_indexer(edges['source']).astype(np.int64)
+        dst = self.names.get_indexer(edges['target']).astype(np.int64)
+        order = np.lexsort((dst, src))
+        self.edges = edges.iloc[order].reset_index(drop=True)
+        self.src, self.dst = src[order], dst[order]
+        self.weights = self.edges['weight'].to_numpy(dtype=np.float64)
+        n = len(self.names)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.src, minlength=n), out=self.indptr[1:])
+        self.indices = self.dst
+        # Reverse (in-edge) adjacency for undirected neighborhoods
+        self.in_order = np.argsort(self.dst, kind='stable')
+        self.in_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.dst, minlength=n), out=self.in_indptr[1:])
+
+        self.out_degree = np.bincount(self.src, minlength=n)
+        self.in_degree = np.bincount(self.dst, minlength=n)
+        self.crossposts = np.bincount(self.src, weights=self.weights, minlength=n) \
+            + np.bincount(self.dst, weights=self.weights, minlength=n)
+        self.pagerank = self._warm_start(pagerank, 1.0 / max(n, 1))
+        self.component = self._warm_start(components, -1).astype(np.int64)
+        if compute:
+            self.pagerank = self._pagerank(self.pagerank)
+            self.component = self._components(self.component)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _warm_start(self, previous, default):
+        values = np.full(len(self.names), default, dtype=np.float64)
+        if previous is not None:
+            known = self.names.get_indexer(previous.index)
+            values[known[known >= 0]] = previous.to_numpy()[known >= 0]
+        return values
+
+    def _pagerank(self, rank, tol=1e-10, max_iter=200):
+        # Power iteration on the weighted transition matrix; dangling mass is spread uniformly
+        n = len(self.names)
+        if n == 0:
+            return rank
+        rank = rank / rank.sum()
+        out_weight = np.bincount(self.src, weights=self.weights, minlength=n)
+        share = self.weights / out_weight[self.src]
+        dangling = out_weight == 0
+        for _ in range(max_iter):
+            new = np.bincount(self.dst, weights=rank[self.src] * share, minlength=n)
+            new = DAMPING * (new + rank[dangling].sum() / n) + (1 - DAMPING) / n
+            converged = np.abs(new - rank).sum() < tol
+            rank = new
+            if converged:
+                break
+        return rank
+
+    def _components(self, labels):
+        # Min-label propagation over undirected edges; previous labels seed the search,
+        # so appends only have to merge existing components
+        n = len(self.names)
+        fresh = labels < 0
+        labels[fresh] = n + np.flatnonzero(fresh)
+        while True:
+            new = labels.copy()
+            np.minimum.at(new, self.dst, labels[self.src])
+            np.minimum.at(new, self.src, labels[self.dst])
+            if np.array_equal(new, labels):
+                break
+            labels = new
+        # Renumber components by size, largest first
+        _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+        rank = np.empty_like(counts)
+        rank[np.argsort(-counts, kind='stable')] = np.arange(len(counts))
+        return rank[inverse]
+
+    def nodes(self):
+        """
+        Returns the node table (name, degrees, crossposts, PageRank, component).
+        """
+        return pd.DataFrame({
+            'name': self.names.astype('object'),
+            'out_degree': self.out_degree,
+            'in_degree': self.in_degree,
+            'degree': self.out_degree + self.in_degree,
+            'crossposts': self.crossposts.astype(np.int64),
+            'pagerank': self.pagerank,
+            'component': self.component,
+        })
+
+    def neighbors(self, node):
+        """
+        Returns the out- and in-neighbors of a node id.
+        """
+        out = self.indices[self.indptr[node]:self.indptr[node + 1]]
+        return np.union1d(out, self.src[self.in_order[self.in_indptr[node]:self.in_indptr[node + 1]]])
+
+    def ego(self, center, radius=1, max_nodes=100):
+        """
+        Samples an ego network: breadth-first from a node, keeping the highest-PageRank
+        neighbors at each hop until max_nodes is reached.
+
+        Returns:
+        - np.ndarray: Node ids, center first.
+        """
+        selected = [center]
+        seen = {center}
+        frontier = np.array([center])
+        for _ in range(radius):
+            candidates = np.setdiff1d(
+                np.concatenate([self.neighbors(node) for node in frontier]) if len(frontier) else np.zeros(0, dtype=np.int64),
+                np.fromiter(seen, dtype=np.int64)
+            )
+            budget = max_nodes - len(selected)
+            if budget <= 0 or len(candidates) == 0:
+                break
+            candidates = candidates[np.argsort(-self.pagerank[candidates], kind='stable')][:budget]
+            selected.extend(candidates.tolist())
+            seen.update(candidates.tolist())
+            frontier = candidates
+        return np.array(selected, dtype=np.int64)
+
+    def top_nodes(self, k=100):
+        """
+        Returns the k node ids with the highest PageRank.
+        """
+        return np.argsort(-self.pagerank, kind='stable')[:k]
+
+    def subgraph_edges(self, node_ids):
+        """
+        Returns the edges among the given nodes, with source/target as node ids.
+        """
+        keep = np.isin(self.src, node_ids) & np.isin(self.dst, node_ids)
+        edges = self.edges[keep].copy()
+        edges['source_id'], edges['target_id'] = self.src[keep], self.dst[keep]
+        return edges
+
+    def save(self, graph_dir, kind):
+        os.makedirs(graph_dir, exist_ok=True)
+        self.edges.to_parquet(os.path.join(graph_dir, f'{kind}_edges.parquet'), index=False)
+        self.nodes().to_parquet(os.path.join(graph_dir, f'{kind}_nodes.parquet'), index=False)
+
+    @classmethod
+    def load(cls, graph_dir, kind):
+        edges = pd.read_parquet(os.path.join(graph_dir, f'{kind}_edges.parquet'))
+        nodes = pd.read_parquet(os.path.join(graph_dir, f'{kind}_nodes.parquet')).set_index('name')
+        return cls(edges, pagerank=nodes['pagerank'], components=nodes['component'], compute=False)
+
+
+def merge_edges(edges, new_edges):
+    """
+    Adds new edge weights to an edge list (titles keep their first example).
+    """
+    combined = pd.concat([edges, new_edges], ignore_index=True)
+    return combined.groupby(['source', 'target'], sort=False).agg(
+        weight=('weight', 'sum'), unreliable=('unreliable', 'sum'), title=('title', 'first')
+    ).reset_index()
+
+
+def build_graphs(store_path=STORE_PATH, graph_dir=GRAPH_DIR):
+    """
+    Builds every graph kind from the whole feature store.
+    """
+    df = read_dataset(SOURCE_COLUMNS, store_path=store_path)
+    graphs = {}
+    for kind in KINDS:
+        graphs[kind] = CrosspostGraph(crosspost_edges(df, kind))
+        graphs[kind].save(graph_dir, kind)
+    return graphs
+
+
+def update_graphs(batch_df, graph_dir=GRAPH_DIR):
+    """
+    Adds the crossposts of newly appended rows to the persisted graphs (no-op if they
+    were not built yet). PageRank and components are recomputed once, warm-started from
+    the stored values.
+    """
+    for kind in KINDS:
+        edges_path = os.path.join(graph_dir, f'{kind}_edges.parquet')
+        if not os.path.exists(edges_path):
+            continue
+        new_edges = crosspost_edges(batch_df, kind)
+        if new_edges.empty:
+            continue
+        graph = CrosspostGraph.load(graph_dir, kind)
+        nodes = graph.nodes().set_index('name')
+        graph = CrosspostGraph(merge_edges(graph.edges, new_edges), pagerank=nodes['pagerank'], components=nodes['component'])
+        graph.save(graph_dir, kind)
+
+
+@st.cache_resource
+def _load_graph_cached(graph_dir, kind, mtime):
+    metrics.cache_miss('crosspost_graph')
+    return CrosspostGraph.load(graph_dir, kind)
+
+
+def load_graph(kind, graph_dir=GRAPH_DIR):
+    """
+    Loads a graph for the app, building the graphs on first use; reloaded after updates.
+    """
+    nodes_path = os.path.join(graph_dir, f'{kind}_nodes.parquet')
+    if not os.path.exists(nodes_path):
+        build_graphs(graph_dir=graph_dir)
+    metrics.cache_request('crosspost_graph')
+    return _load_graph_cached(graph_dir, kind, os.path.getmtime(nodes_path))
+
+
+def spring_layout(n, edges_src, edges_dst, iterations=100, seed=42):
+    """
+    Fruchterman-Reingold layout of a small graph, vectorized over all node pairs.
+
+    Parameters:
+    - n (int): Number of nodes (ids 0..n-1).
+    - edges_src, edges_dst (np.ndarray): Edge endpoints.
+
+    Returns:
+    - np.ndarray: (n, 2) positions in [-1, 1].
+    """
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(-1, 1, size=(n, 2))
+    if n <= 1:
+        return pos * 0
+    k = np.sqrt(4.0 / n)
+    temperature = 0.1
+    for _ in range(iterations):
+        delta = pos[:, None, :] - pos[None, :, :]
+        distance = np.maximum(np.linalg.norm(delta, axis=-1), 1e-3)
+        displacement = (delta * (k * k / distance ** 2)[:, :, None]).sum(axis=1)
+        edge_delta = pos[edges_src] - pos[edges_dst]
+        edge_distance = np.maximum(np.linalg.norm(edge_delta, axis=-1), 1e-3)
+        pull = edge_delta * (edge_distance / k)[:, None]
+        np.add.at(displacement, edges_src, -pull)
+        np.add.at(displacement, edges_dst, pull)
+        length = np.maximum(np.linalg.norm(displacement, axis=-1), 1e-3)
+        pos += displacement / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature *= 0.97
+    pos -= pos.mean(axis=0)
+    return pos / max(np.abs(pos).max(), 1e-9)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the crosspost graphs and print their most central nodes.")
+    parser.add_argument('--store', default=STORE_PATH, help="Feature store directory")
+    parser.add_argument('--graphs', default=GRAPH_DIR, help="Output directory")
+    args = parser.parse_args()
+    for kind, graph in build_graphs(args.store, args.graphs).items():
+        nodes = graph.nodes()
+        print(f"{kind}: {len(graph)} nodes, {len(graph.edges)} edges, {nodes['component'].nunique()} components")
+        print(nodes.nlargest(5, 'pagerank').to_string(index=False))
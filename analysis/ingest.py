@@ -0,0 +1,267 @@
+import os
+import re
+import json
+import argparse
+import pandas as pd
+
+# Raw Reddit dump and the partitioned output of the cleaning stage
+RAW_PATH = './data/output.json'
+OUTPUT_DIR = './cleaned_data/raw'
+
+# Whitespace and commas between the elements of a JSON array
+_SEPARATORS = re.compile(r'[\s,]*')
+
+# Main posts are flattened with '_' separators, crossposts with pandas' default '.'
+POST_PREFIXES_TO_EXCLUDE = [
+    'media_metadata', 'media_metadata_', 'secure_media_oembed_thumbnail_height', 'secure_media_oembed_thumbnail_width', 'secure_media_oembed_width', 'secure_media_oembed_height', 'secure_media_embed_width', 'secure_media_embed_height', 'secure_media_embed_scrolling',
+    'author_flair_background_color', 'link_flair_text_color', 'link_flair_css_class', 'thumbnail_width', 'author_flair_css_class', 'thumbnail_height', 'author_flair_text_color', 'link_flair_template_id', 'link_flair_background_color',
+    'author_flair_template_id', 'media_oembed_thumbnail_width', 'media_oembed_height', 'media_oembed_width', 'media_oembed_thumbnail_height'
+]
+
+CROSSPOST_PREFIXES_TO_EXCLUDE = [
+    'media_metadata_', 'media_metadata', 'secure_media.oembed.thumbnail_height', 'secure_media.oembed.thumbnail_width', 'secure_media.oembed.width', 'secure_media.oembed.height', 'secure_media_embed.width', 'secure_media_embed.height', 'secure_media_embed.scrolling',
+    'author_flair_background_color', 'link_flair_text_color', 'link_flair_css_class', 'thumbnail_width', 'author_flair_css_class', 'thumbnail_height', 'author_flair_text_color', 'link_flair_template_id', 'link_flair_background_color',
+    'author_flair_template_id', 'media_embed.width', 'media_embed.scrolling', 'media_embed.height', 'media.oembed.thumbnail_width', 'media.oembed.height', 'media.oembed.width'
+]
+
+POST_COLUMNS_TO_KEEP = [
+    # Core Post Information
+    'subreddit', 'title', 'selftext', 'author', 'created_utc', 'id', 'permalink',
+    'subreddit_id', 'subreddit_subscribers',
+
+    # Engagement Metrics
+    'ups', 'downs', 'score', 'upvote_ratio', 'num_comments', 'total_awards_received',
+    'num_crossposts',
+
+    # Content Type Indicators
+    'is_self', 'is_video', 'domain', 'url',
+
+    # Author Information
+    'author_fullname', 'author_flair_type', 'author_premium', 'author_patreon_flair',
+    'author_flair_richtext',
+
+    # Crossposting Links
+    'crosspost_parent', 'crosspost_parent_list',
+
+    # Conditional Keep (Low to Moderate Missing)
+    'url_overridden_by_dest', 'post_hint', 'preview_images', 'preview_enabled',
+    'pwls', 'wls'
+]
+
+CROSSPOST_COLUMNS_TO_KEEP = [
+    # Core Post Information
+    'subreddit', 'title', 'selftext', 'author', 'created_utc', 'id', 'permalink', 'parent_id',
+    'subreddit_id', 'subreddit_subscribers',
+
+    # Engagement Metrics
+    'ups', 'downs', 'score', 'upvote_ratio', 'num_comments', 'total_awards_received',
+    'num_crossposts',
+
+    # Content Type Indicators
+    'is_self', 'is_video', 'domain', 'url',
+
+    # Author Information
+    'author_fullname', 'author_flair_type', 'author_premium', 'author_patreon_flair',
+    'author_flair_richtext',
+
+    # Conditional Keep
+    'url_overridden_by_dest', 'post_hint', 'preview.enabled', 'preview.images',
+    'pwls', 'wls'
+]
+
+# Fixed dtypes so every chunk (and every partition file) shares one schema;
+# columns not listed here are stored as strings
+INGEST_DTYPES = {
+    'created_utc': 'float64', 'upvote_ratio': 'float64',
+    'subreddit_subscribers': 'Int64', 'ups': 'Int64', 'downs': 'Int64', 'score': 'Int64', 'num_comments': 'Int64',
+    'total_awards_received': 'Int64', 'num_crossposts': 'Int64', 'pwls': 'Int64', 'wls': 'Int64',
+    'is_self': 'boolean', 'is_video': 'boolean', 'author_premium': 'boolean', 'author_patreon_flair': 'boolean',
+    'preview_enabled': 'boolean', 'preview.enabled': 'boolean'
+}
+
+
+def filter_columns(df, prefixes_to_exclude):
+    """
+    Filters out columns from the DataFrame that start with any of the specified prefixes.
+
+    Parameters:
+    - df (pd.DataFrame): The DataFrame to filter.
+    - prefixes_to_exclude (list of str): List of prefixes to exclude.
+
+    Returns:
+    - pd.DataFrame: A new DataFrame with the undesired columns removed.
+    """
+    columns_to_keep = [col for col in df.columns if not any(col.startswith(prefix) for prefix in prefixes_to_exclude)]
+    return df[columns_to_keep]
+
+
+def _iter_json_array(f, read_size):
+    # Decode one array element at a time from a buffered window of the file. The read
+    # position moves through the window, which is only compacted when it is refilled.
+    decoder = json.JSONDecoder()
+    buf = f.read(read_size).lstrip()
+    if not buf.startswith('['):
+        raise ValueError("Expected a JSON array or JSON Lines input.")
+    pos = 1
+    eof = False
+    while True:
+        pos = _SEPARATORS.match(buf, pos).end()
+        if buf.startswith(']', pos):
+            return
+        try:
+            item, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = f.read(read_size)
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        yield item
+
+
+def iter_records(path, read_size=1 << 20):
+    """
+    Streams raw Reddit records from a JSON array or a JSON Lines file.
+
+    Parameters:
+    - path (str): Path to the dump (``[{...}, ...]`` or one object per line).
+    - read_size (int): Characters read per refill of the JSON array buffer.
+
+    Yields:
+    - dict: The post payload (the ``data`` field of each listing item).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == '[':
+            items = _iter_json_array(f, read_size)
+        else:
+            items = (json.loads(line) for line in f if line.strip())
+        for item in items:
+            yield item.get('data', item)
+
+
+def iter_chunks(records, chunk_size):
+    """
+    Groups an iterable of records into lists of at most chunk_size items.
+    """
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _finalize(df, columns_to_keep):
+    # Align the chunk to the fixed column list and dtypes
+    df = df.reindex(columns=columns_to_keep)
+    for column in df.columns:
+        dtype = INGEST_DTYPES.get(column)
+        if dtype is None:
+            # Nested values (lists/dicts) are kept as JSON text
+            df[column] = df[column].map(
+                lambda x: json.dumps(x) if isinstance(x, (list, dict)) else (None if pd.isna(x) else str(x))
+            ).astype('string')
+        elif dtype == 'boolean':
+            df[column] = df[column].astype('boolean')
+        else:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(dtype)
+    return df
+
+
+def flatten_chunk(records):
+    """
+    Flattens one chunk of posts and extracts its crossposts in the same pass.
+
+    Parameters:
+    - records (list of dict): Post payloads.
+
+    Returns:
+    - tuple(pd.DataFrame, pd.DataFrame): The filtered posts and crossposts of the chunk.
+    """
+    crossposts = []
+    for record in records:
+        for cp in record.get('crosspost_parent_list') or []:
+            crossposts.append(dict(cp, parent_id=record.get('id')))
+
+    posts_df = filter_columns(pd.json_normalize(records, sep='_'), POST_PREFIXES_TO_EXCLUDE)
+    posts_df = _finalize(posts_df, POST_COLUMNS_TO_KEEP)
+
+    crossposts_df = filter_columns(pd.json_normalize(crossposts), CROSSPOST_PREFIXES_TO_EXCLUDE)
+    crossposts_df = _finalize(crossposts_df, CROSSPOST_COLUMNS_TO_KEEP)
+    return posts_df, crossposts_df
+
+
+def _write_partitions(df, out_dir, part_name):
+    # Write one Parquet file per UTC day of created_utc (hive-style date=YYYY-MM-DD)
+    if df.empty:
+        return []
+    days = pd.to_datetime(df['created_utc'], unit='s', errors='coerce').dt.strftime('%Y-%m-%d').fillna('unknown')
+    written = []
+    for day, part in df.groupby(days.to_numpy(), sort=False):
+        day_dir = os.path.join(out_dir, f'date={day}')
+        os.makedirs(day_dir, exist_ok=True)
+        path = os.path.join(day_dir, f'{part_name}.parquet')
+        part.to_parquet(path, index=False)
+        written.append(path)
+    return written
+
+
+def ingest(path=RAW_PATH, out_dir=OUTPUT_DIR, chunk_size=5000):
+    """
+    Streams a raw dump into day-partitioned Parquet files of posts and crossposts.
+
+    Memory is bounded by chunk_size: each chunk is flattened, filtered and written
+    before the next one is read. Part files are named after the input file, so
+    re-ingesting a dump overwrites its own parts and a new scrape adds new ones.
+
+    Parameters:
+    - path (str): Raw JSON or JSON Lines dump.
+    - out_dir (str): Output root; posts go to ``posts/`` and crossposts to ``crossposts/``.
+    - chunk_size (int): Number of posts processed per chunk.
+
+    Returns:
+    - dict: Counts of posts, crossposts and written files.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    stats = {'posts': 0, 'crossposts': 0, 'files': 0}
+    for i, chunk in enumerate(iter_chunks(iter_records(path), chunk_size)):
+        posts_df, crossposts_df = flatten_chunk(chunk)
+        part_name = f'{stem}-{i:05d}'
+        stats['files'] += len(_write_partitions(posts_df, os.path.join(out_dir, 'posts'), part_name))
+        stats['files'] += len(_write_partitions(crossposts_df, os.path.join(out_dir, 'crossposts'), part_name))
+        stats['posts'] += len(posts_df)
+        stats['crossposts'] += len(crossposts_df)
+    return stats
+
+
+def read_partitions(out_dir=OUTPUT_DIR, kind='posts', columns=None):
+    """
+    Reads the ingested posts or crossposts back as one DataFrame.
+
+    Parameters:
+    - out_dir (str): Output root passed to ingest().
+    - kind (str): 'posts' or 'crossposts'.
+    - columns (list of str, optional): Columns to project.
+
+    Returns:
+    - pd.DataFrame: The concatenated partitions, including the 'date' partition column.
+    """
+    return pd.read_parquet(os.path.join(out_dir, kind), columns=columns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a raw Reddit dump into day-partitioned Parquet files.")
+    parser.add_argument('input', nargs='?', default=RAW_PATH, help="Raw JSON array or JSON Lines dump")
+    parser.add_argument('--out', default=OUTPUT_DIR, help="Output directory")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="Posts processed per chunk")
+    args = parser.parse_args()
+    stats = ingest(args.input, args.out, args.chunk_size)
+    print(f"Ingested {stats['posts']} posts and {stats['crossposts']} crossposts into {stats['files']} files")
@@ -0,0 +1,356 @@
+import os
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import argparse
+import urllib.error
+import urllib.request
+import numpy as np
+import streamlit as st
+from analysis.search import tokenize
+from analysis.retrieval import HashingEmbedder
+
+# Persistent answer cache: (dataset scope, normalized question) -> answer
+CACHE_PATH = './cleaned_data/llm_cache.sqlite'
+TTL_SECONDS = 7 * 24 * 3600
+MAX_ENTRIES = 5000
+
+# Minimum cosine similarity for serving a paraphrased question from the cache. Off unless
+# LLM_CACHE_SIMILARITY is set (e.g. 0.9); only exact (normalized) questions are reused otherwise.
+SIMILARITY_THRESHOLD = float(os.environ['LLM_CACHE_SIMILARITY']) if os.getenv('LLM_CACHE_SIMILARITY') else None
+
+# 'gemini' (needs GEMINI_API_KEY), 'stub' (offline, deterministic answers) or
+# 'http' (a streaming HTTP endpoint such as `python -m analysis.fake_llm`)
+LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'gemini')
+LLM_URL = os.getenv('LLM_URL', 'http://127.0.0.1:8765/generate')
+GEMINI_MODEL = 'gemini-2.0-flash'
+
+# Cheap offline embedder used only to compare questions: content words and their
+# ordered bigrams, so "did X crosspost to Y" and "did Y crosspost to X" differ
+_question_embedder = HashingEmbedder(dim=1024, bigrams=True)
+STOPWORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'do', 'does', 'did', 'of', 'in', 'on', 'for', 'to',
+    'by', 'with', 'about', 'what', 'which', 'who', 'how', 'me', 'show', 'tell', 'give', 'list', 'please', 'and'
+}
+
+
+def normalize_question(question):
+    """
+    Lowercases a question, collapses whitespace and drops surrounding punctuation.
+    """
+    return re.sub(r'\s+', ' ', question.lower()).strip(' ?!.,;:')
+
+
+def _question_vector(question):
+    words = [word for word in tokenize(question) if word not in STOPWORDS]
+    return _question_embedder.embed([' '.join(words)])[0].astype(np.float32)
+
+
+def question_entities(question):
+    """
+    Returns the literal terms a paraphrase must keep: numbers and dates, r/ and u/ names,
+    domains, and capitalized words other than the first (names), lowercased.
+    """
+    entities = set(re.findall(r'\d+(?:[.:/-]\d+)*', question))
+    entities |= {match.lower() for match in re.findall(r'\b[ru]/[\w-]+', question)}
+    entities |= {match.lower() for match in re.findall(r'\b[a-zA-Z][\w-]*(?:\.[a-zA-Z][\w-]*)+\b', question)}
+    words = re.findall(r"[A-Za-z][\w'-]*", question)
+    entities |= {word.lower() for word in words[1:] if word[0].isupper() and word != 'I'}
+    return entities
+
+
+def cache_key(question, scope):
+    """
+    Returns the cache key of a question asked against a dataset scope.
+    """
+    return hashlib.sha1(f'{scope}\0{normalize_question(question)}'.encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    """
+    SQLite-backed answer cache with a time-to-live and least-recently-used eviction.
+
+    Entries are keyed by dataset scope and normalized question. With a similarity
+    threshold (opt-in), a miss falls back to the most similar cached question of the
+    same scope whose numbers and names (question_entities()) are exactly the same.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES, similarity=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, scope TEXT NOT NULL, question TEXT NOT NULL, '
+            'answer TEXT NOT NULL, embedding BLOB NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope)')
+        return conn
+
+    def get(self, question, scope):
+        """
+        Returns the cached answer to a question, or None.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT key, answer FROM answers WHERE key = ? AND created >= ?',
+                (cache_key(question, scope), now - self.ttl)
+            ).fetchone()
+            if row is None and self.similarity is not None:
+                row = self._similar(conn, question, scope, now)
+            if row is None:
+                return None
+            conn.execute('UPDATE answers SET last_used = ? WHERE key = ?', (now, row[0]))
+            conn.commit()
+            return row[1]
+        finally:
+            conn.close()
+
+    def _similar(self, conn, question, scope, now):
+        rows = conn.execute(
+            'SELECT key, answer, embedding, question FROM answers WHERE scope = ? AND created >= ?',
+            (scope, now - self.ttl)
+        ).fetchall()
+        # Entries embedded by an older question embedder have another size and are skipped
+        vector = _question_vector(question)
+        entities = question_entities(question)
+        rows = [
+            row for row in rows
+            if len(row[2]) == vector.nbytes and question_entities(row[3]) == entities
+        ]
+        if not rows:
+            return None
+        embeddings = np.stack([np.frombuffer(embedding, dtype=np.float32) for _, _, embedding, _ in rows])
+        similarities = embeddings @ vector
+        best = int(np.argmax(similarities))
+        return rows[best][:2] if similarities[best] >= self.similarity else None
+
+    def put(self, question, scope, answer):
+        """
+        Stores an answer, then drops expired entries and the least recently used ones beyond max_entries.
+        """
+        now = time.time()
+        embedding = _question_vector(question).tobytes()
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO answers (key, scope, question, answer, embedding, created, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (cache_key(question, scope), scope, question, answer, embedding, now, now)
+            )
+            conn.execute('DELETE FROM answers WHERE created < ?', (now - self.ttl,))
+            conn.execute(
+                'DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def __len__(self):
+        conn = self._connect()
+        try:
+            return conn.execute('SELECT COUNT(*) FROM answers').fetchone()[0]
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM answers')
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class RateLimitError(Exception):
+    """
+    Raised when the model endpoint rejects a request for exceeding its rate limit (HTTP 429).
+    """
+
+
+def is_rate_limit(exc):
+    """
+    Returns True if an exception from any provider signals a rate limit.
+    """
+    if isinstance(exc, RateLimitError):
+        return True
+    if getattr(exc, 'code', None) == 429 or getattr(exc, 'status_code', None) == 429:
+        return True
+    return 'ResourceExhausted' in type(exc).__name__ or '429' in str(exc)
+
+
+class StubAgent:
+    """
+    Offline stand-in for the pandas dataframe agent with the same invoke() interface.
+
+    Answers deterministically from the prompt and the rows in scope, optionally after
+    a fixed delay to mimic model latency.
+    """
+
+    def __init__(self, df, delay=0.0):
+        self.df = df
+        self.delay = delay
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8]
+        return {'output': f"Stub answer {digest} ({len(self.df)} rows in scope, {len(prompt)} prompt characters)."}
+
+    def stream_text(self, prompt):
+        for word in self.invoke(prompt)['output'].split(' '):
+            yield word + ' '
+
+
+class HTTPAgent:
+    """
+    Client for a streaming text endpoint: POSTs {"prompt": ...} and reads one JSON
+    object per line ({"text": chunk}). A 429 response raises RateLimitError.
+    """
+
+    def __init__(self, df, url=LLM_URL, timeout=60):
+        self.df = df
+        self.url = url
+        self.timeout = timeout
+
+    def stream_text(self, prompt):
+        request = urllib.request.Request(
+            self.url, data=json.dumps({'prompt': prompt}).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as exc:
+            if exc.code == 429:
+                raise RateLimitError(f"429 from {self.url}") from exc
+            raise
+        with response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)['text']
+
+    def invoke(self, prompt):
+        return {'output': ''.join(self.stream_text(prompt))}
+
+
+def _chunk_text(content):
+    # Chat model chunks carry a string, or a list of parts for multimodal models
+    if isinstance(content, str):
+        return content
+    return ''.join(part.get('text', '') if isinstance(part, dict) else str(part) for part in content or [])
+
+
+def _stream_events(agent, prompt):
+    # Drives the agent's astream_events() on a private event loop in the calling
+    # (worker) thread and yields the text of every model token as it arrives
+    loop = asyncio.new_event_loop()
+    events = agent.astream_events(prompt, version='v2')
+    streamed = False
+    try:
+        while True:
+            try:
+                event = loop.run_until_complete(events.__anext__())
+            except StopAsyncIteration:
+                return
+            if event['event'] == 'on_chat_model_stream':
+                text = _chunk_text(event['data']['chunk'].content)
+                if text:
+                    streamed = True
+                    yield text
+            elif event['event'] == 'on_chain_end' and not event.get('parent_ids') and not streamed:
+                # The model did not stream: fall back to the agent's final output
+                output = event['data'].get('output')
+                yield output['output'] if isinstance(output, dict) else str(output)
+    finally:
+        loop.run_until_complete(events.aclose())
+        loop.close()
+
+
+def stream_answer(agent, prompt):
+    """
+    Yields the answer to a prompt in chunks as the agent produces them.
+
+    Agents with stream_text() stream tokens; LangChain agents stream the tokens of
+    their chat model through astream_events() (the function-calling steps produce no
+    text, so only the final answer is shown), falling back to the final output when the
+    model does not stream; anything else is invoked once.
+    """
+    if hasattr(agent, 'stream_text'):
+        yield from agent.stream_text(prompt)
+    elif hasattr(agent, 'astream_events'):
+        yield from _stream_events(agent, prompt)
+    else:
+        yield agent.invoke(prompt)['output']
+
+
+def api_key_missing(provider=None):
+    """
+    Returns True if the configured provider needs an API key that is not set.
+    """
+    return (provider or LLM_PROVIDER) not in ('stub', 'http') and not os.getenv('GEMINI_API_KEY')
+
+
+def build_agent(df, provider=None):
+    """
+    Builds a pandas dataframe agent over df for the configured provider. The Gemini agent
+    runs generated Python, so it gets its own deep copy of df and can never modify the
+    frame shared by every session.
+
+    Parameters:
+    - df (pd.DataFrame): The rows the agent may query.
+    - provider (str, optional): 'gemini', 'stub' or 'http'; defaults to LLM_PROVIDER.
+
+    Returns:
+    - object: An agent whose invoke(prompt) returns a dict with an 'output' answer.
+    """
+    provider = provider or LLM_PROVIDER
+    if provider == 'stub':
+        return StubAgent(df)
+    if provider == 'http':
+        return HTTPAgent(df)
+    if api_key_missing(provider):
+        raise ValueError("Please set the GEMINI_API_KEY environment variable.")
+    from langchain.agents import AgentType
+    from langchain_experimental.agents import create_pandas_dataframe_agent
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL, temperature=0, google_api_key=os.getenv('GEMINI_API_KEY'))
+    return create_pandas_dataframe_agent(
+        llm,
+        df.copy(deep=True),
+        verbose=True,
+        agent_type=AgentType.OPENAI_FUNCTIONS,
+        allow_dangerous_code=True
+    )
+
+
+@st.cache_resource(max_entries=64)
+def get_agent(scope, _df, provider=None):
+    """
+    Returns the agent of a dataset scope, built once per process and reused across turns.
+
+    The scope (e.g. dataset version plus post id) identifies the rows; _df is not hashed.
+    """
+    return build_agent(_df, provider)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the LLM answer cache.")
+    parser.add_argument('--cache', default=CACHE_PATH, help="SQLite cache file")
+    parser.add_argument('--clear', action='store_true', help="Delete all cached answers")
+    args = parser.parse_args()
+    cache = AnswerCache(args.cache)
+    if args.clear:
+        cache.clear()
+    print(f"{len(cache)} cached answers in {args.cache}")
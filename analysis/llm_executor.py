@@ -0,0 +1,336 @@
+import os
+import time
+import queue
+import random
+import asyncio
+import threading
+from collections import deque
+import streamlit as st
+from analysis.llm import AnswerCache, SIMILARITY_THRESHOLD, is_rate_limit, stream_answer
+from analysis import metrics
+
+# Shared limits for all sessions of the app process (Gemini free tier: 15 requests/minute)
+REQUESTS_PER_MINUTE = float(os.getenv('LLM_REQUESTS_PER_MINUTE', 15))
+BURST = int(os.getenv('LLM_BURST', 3))
+WORKERS = int(os.getenv('LLM_WORKERS', 2))
+MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', 20))
+
+# Retries on rate limits: full-jitter exponential backoff
+MAX_ATTEMPTS = 4
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+
+
+class QueueFullError(Exception):
+    """
+    Raised when the request queue is full; the caller should ask the user to retry later.
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at `rate` tokens per second up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """
+        Takes a token if one is available.
+
+        Returns:
+        - float: 0 if a token was taken, otherwise the seconds until one will be.
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self):
+        """
+        Returns a token that was taken for a request that was then dropped.
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def drain(self):
+        """
+        Empties the bucket, e.g. after the server reported a rate limit.
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = 0.0
+
+
+def backoff_delay(attempt, base=BASE_DELAY, cap=MAX_DELAY):
+    """
+    Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^(attempt-1))].
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+_DONE = object()
+
+
+class Job:
+    """
+    Handle of a submitted request; chunks are read with iter_text() from any thread.
+
+    A consumer that stops reading (e.g. its rerun was abandoned) calls cancel(): a
+    queued job is then dropped without taking a rate-limit token, and a running one
+    stops reading the model's stream and is not retried.
+    """
+
+    def __init__(self, stream_fn):
+        self.stream_fn = stream_fn
+        self.chunks = queue.Queue()
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.cancelled = threading.Event()
+        self.emitted = False
+        self.attempts = 0
+        self.error = None
+        # Monotonic timestamps for latency metrics
+        self.submitted_at = time.monotonic()
+        self.started_at = self.first_chunk_at = self.finished_at = None
+
+    def iter_text(self):
+        """
+        Yields chunks as they arrive; re-raises the job's error at the end, if any.
+        """
+        while True:
+            chunk = self.chunks.get()
+            if chunk is _DONE:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield chunk
+
+    def cancel(self):
+        """
+        Tells the executor that nobody reads this job's output any more.
+        """
+        self.cancelled.set()
+
+
+class LLMExecutor:
+    """
+    Runs LLM requests on a background asyncio loop shared by all sessions.
+
+    Requests wait in a bounded FIFO queue (submit() raises QueueFullError when it is
+    full), are started by a fixed number of workers once the token bucket allows,
+    and are retried with jittered backoff on rate limits as long as no output has
+    been streamed yet. Cancelled jobs are skipped or stopped (see Job).
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, burst=BURST, workers=WORKERS, max_queue=MAX_QUEUE,
+                 max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.waiting = deque()
+        self.lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name='llm-executor', daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._start(workers), self.loop).result()
+
+    async def _start(self, workers):
+        self.queue = asyncio.Queue()
+        self.workers = [self.loop.create_task(self._worker()) for _ in range(workers)]
+
+    async def _cancel_workers(self):
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+
+    def close(self):
+        """
+        Stops the workers and the loop thread; requests still waiting are dropped.
+        """
+        asyncio.run_coroutine_threadsafe(self._cancel_workers(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def submit(self, stream_fn):
+        """
+        Queues a request.
+
+        Parameters:
+        - stream_fn (callable): Returns an iterator of text chunks; called on a worker thread.
+
+        Returns:
+        - Job: The request's handle.
+        """
+        with self.lock:
+            # Cancelled jobs stay in the deque until a worker skips them but hold no slot
+            pending = sum(not waiting.cancelled.is_set() for waiting in self.waiting)
+            if pending >= self.max_queue:
+                raise QueueFullError(f"{pending} requests are already waiting")
+            job = Job(stream_fn)
+            self.waiting.append(job)
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, job)
+        return job
+
+    def position(self, job):
+        """
+        Returns the job's 1-based place in the queue, or 0 once it has started.
+        """
+        with self.lock:
+            if job not in self.waiting:
+                return 0
+            ahead = list(self.waiting)[:self.waiting.index(job)]
+            return sum(not waiting.cancelled.is_set() for waiting in ahead) + 1
+
+    def _drop(self, job):
+        with self.lock:
+            if job in self.waiting:
+                self.waiting.remove(job)
+        job.finished_at = time.monotonic()
+        job.done.set()
+        job.chunks.put(_DONE)
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            if job.cancelled.is_set():
+                self._drop(job)
+                continue
+            await self.bucket.acquire()
+            if job.cancelled.is_set():
+                # Abandoned while waiting for its token: give the token to the next request
+                self.bucket.release()
+                self._drop(job)
+                continue
+            with self.lock:
+                self.waiting.remove(job)
+            job.started_at = time.monotonic()
+            job.started.set()
+            await self._run(job)
+
+    def _pump(self, job):
+        if job.cancelled.is_set():
+            return
+        stream = job.stream_fn()
+        try:
+            for chunk in stream:
+                if job.cancelled.is_set():
+                    return
+                if not job.emitted:
+                    job.first_chunk_at = time.monotonic()
+                job.emitted = True
+                job.chunks.put(chunk)
+        finally:
+            # Closing the generator closes the agent's connection or event stream
+            if hasattr(stream, 'close'):
+                stream.close()
+
+    async def _run(self, job):
+        while True:
+            job.attempts += 1
+            try:
+                await asyncio.to_thread(self._pump, job)
+                break
+            except Exception as exc:
+                retry = not job.emitted and not job.cancelled.is_set() and job.attempts < self.max_attempts
+                if is_rate_limit(exc) and retry:
+                    # Slow every worker down, then retry this request after a jittered pause
+                    self.bucket.drain()
+                    await asyncio.sleep(backoff_delay(job.attempts, self.base_delay, self.max_delay))
+                    if job.cancelled.is_set():
+                        break
+                    await self.bucket.acquire()
+                    continue
+                job.error = exc
+                break
+        job.finished_at = time.monotonic()
+        job.done.set()
+        job.chunks.put(_DONE)
+
+
+@st.cache_resource
+def get_executor():
+    """
+    Returns the process-wide executor, so every session shares one rate limit and queue.
+    """
+    return LLMExecutor()
+
+
+def render_answer(agent, prompt, question, scope, cache=None):
+    """
+    Answers a question inside the current chat message, streaming the model output.
+
+    A cached answer is shown directly; otherwise the request is queued on the shared
+    executor, the queue position is shown while it waits, and chunks are written as
+    they arrive. The finished answer is added to the cache.
+
+    Parameters:
+    - agent (object): Agent from get_agent().
+    - prompt (str): The full prompt sent on a cache miss.
+    - question (str): The user's question, used as the cache key.
+    - scope (str): Dataset version and row scope the answer depends on.
+    - cache (AnswerCache, optional): Defaults to the persistent cache (with the similarity
+      lookup only when LLM_CACHE_SIMILARITY is set).
+
+    Returns:
+    - str: The answer, or None if the queue was full.
+    """
+    cache = cache or AnswerCache(similarity=SIMILARITY_THRESHOLD)
+    metrics.cache_request('llm_answers')
+    answer = cache.get(question, scope)
+    if answer is None:
+        metrics.cache_miss('llm_answers')
+    else:
+        st.markdown(answer)
+        st.caption("Answered from cache")
+        return answer
+
+    executor = get_executor()
+    try:
+        job = executor.submit(lambda: stream_answer(agent, prompt))
+    except QueueFullError:
+        metrics.record_llm('rejected', prompt)
+        st.warning("The assistant is handling too many questions right now. Please try again in a moment.")
+        return None
+
+    status = st.empty()
+    try:
+        while not job.started.wait(timeout=0.25):
+            status.caption(f"⏳ Waiting for the model (position {executor.position(job)} in queue)...")
+        status.empty()
+        answer = st.write_stream(job.iter_text())
+    except Exception as exc:
+        metrics.record_llm('rate_limited' if is_rate_limit(exc) else 'error', prompt, job=job)
+        if not is_rate_limit(exc):
+            raise
+        st.error("The model is rate limited right now. Please try again in a minute.")
+        return None
+    finally:
+        # A rerun or closed session stops this script mid-answer: release the request
+        if not job.done.is_set():
+            job.cancel()
+            metrics.record_llm('cancelled', prompt, job=job)
+    if job.attempts > 1:
+        st.caption(f"Retried {job.attempts - 1} time(s) after rate limits")
+    metrics.record_llm('ok', prompt, answer, job=job)
+    cache.put(question, scope, answer)
+    return answer
@@ -0,0 +1,353 @@
+import os
+import math
+import time
+import threading
+import contextlib
+import contextvars
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import streamlit as st
+
+# Instrumentation is off unless APP_METRICS is set; when off every hook is a no-op
+ENABLED = os.getenv('APP_METRICS', '').lower() not in ('', '0', 'false', 'no')
+
+# Port of the Prometheus text exporter (GET /metrics), started with the app when set
+EXPORTER_PORT = os.getenv('APP_METRICS_PORT')
+
+# Show the admin panel in the sidebar for every session (otherwise only with ?admin=1)
+ADMIN = os.getenv('APP_METRICS_ADMIN', '').lower() not in ('', '0', 'false', 'no')
+
+# Histogram buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Recent observations kept per series for the admin panel's percentiles
+SAMPLES = 500
+
+# Metric name -> (type, help)
+METRICS = {
+    'app_rerun_seconds': ('histogram', 'Wall time of app reruns by page.'),
+    'app_stage_seconds': ('histogram', 'Wall time of rerun stages (import, load, filter, render, llm) by page.'),
+    'app_cache_requests_total': ('counter', 'Lookups of shared caches.'),
+    'app_cache_misses_total': ('counter', 'Lookups of shared caches that had to compute or read the value.'),
+    'app_llm_requests_total': ('counter', 'LLM requests by outcome (ok, error, rate_limited, rejected, cancelled).'),
+    'app_llm_queue_seconds': ('histogram', 'Time LLM requests waited in the shared queue.'),
+    'app_llm_first_token_seconds': ('histogram', 'Time from the start of an LLM request to its first chunk.'),
+    'app_llm_latency_seconds': ('histogram', 'Time from the start of an LLM request to its last chunk.'),
+    'app_llm_retries_total': ('counter', 'LLM request retries after rate limits.'),
+    'app_llm_tokens_total': ('counter', 'Estimated LLM tokens by kind (prompt, response).'),
+    'app_errors_total': ('counter', 'Exceptions raised in rerun stages by page, stage and type.'),
+}
+
+# Streamlit control-flow exceptions (st.stop, st.rerun) are not errors
+CONTROL_FLOW = {'StopException', 'RerunException'}
+
+
+class Registry:
+    """
+    Thread-safe in-process store of counters and histograms, rendered in the
+    Prometheus text format. Series are keyed by metric name and sorted label pairs.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.samples = {}
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+                self.samples[key] = deque(maxlen=SAMPLES)
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+            self.samples[key].append(value)
+
+    def render(self):
+        """
+        Returns all series in the Prometheus text exposition format.
+        """
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: (list(buckets), total, count) for key, (buckets, total, count) in self.histograms.items()}
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            series = counters if kind == 'counter' else histograms
+            keys = sorted(key for key in series if key[0] == name)
+            if not keys:
+                continue
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key in keys:
+                labels = key[1]
+                if kind == 'counter':
+                    lines.append(f'{name}{_labels(labels)} {_number(series[key])}')
+                    continue
+                buckets, total, count = series[key]
+                for bound, cumulative in zip(BUCKETS, buckets):
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", _number(bound)),))} {cumulative}')
+                lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+                lines.append(f'{name}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def counter_table(self, name):
+        """
+        Returns the series of a counter as a DataFrame (one column per label, plus value).
+        """
+        import pandas as pd
+        with self.lock:
+            rows = [dict(labels, value=value) for (key, labels), value in self.counters.items() if key == name]
+        return pd.DataFrame(rows)
+
+    def histogram_table(self, name):
+        """
+        Summarizes the series of a histogram: count, mean and, over recent observations, p50 and p95.
+        """
+        import pandas as pd
+        with self.lock:
+            rows = []
+            for (key, labels), (_, total, count) in self.histograms.items():
+                if key != name:
+                    continue
+                recent = sorted(self.samples[(key, labels)])
+                rows.append(dict(
+                    labels, count=count, mean=total / count, p50=recent[len(recent) // 2],
+                    p95=recent[min(len(recent) - 1, math.ceil(0.95 * len(recent)) - 1)]
+                ))
+        return pd.DataFrame(rows)
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.samples.clear()
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+
+# Page and per-stage timings of the rerun running in the current script thread
+_current = contextvars.ContextVar('metrics_rerun', default=None)
+
+_NULL = contextlib.nullcontext()
+
+
+class RerunRecord:
+    """
+    Timings of one rerun: the page, total seconds and seconds per stage.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.seconds = None
+        self.stages = {}
+
+
+@contextlib.contextmanager
+def _rerun(page):
+    record = RerunRecord(page)
+    token = _current.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - start
+        _current.reset(token)
+        REGISTRY.observe('app_rerun_seconds', {'page': page}, record.seconds)
+        if ENABLED:
+            st.session_state['_metrics_last_rerun'] = record
+
+
+def rerun(page):
+    """
+    Context manager timing a whole rerun of a page; stages inside it are attributed to the page.
+    """
+    return _rerun(page) if ENABLED else _NULL
+
+
+@contextlib.contextmanager
+def _stage(name):
+    record = _current.get()
+    page = record.page if record is not None else ''
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as exc:
+        if type(exc).__name__ not in CONTROL_FLOW:
+            REGISTRY.inc('app_errors_total', {'page': page, 'stage': name, 'type': type(exc).__name__})
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        REGISTRY.observe('app_stage_seconds', {'page': page, 'stage': name}, seconds)
+        if record is not None:
+            record.stages[name] = record.stages.get(name, 0.0) + seconds
+
+
+def stage(name):
+    """
+    Context manager timing one stage of the current rerun ('import', 'load', 'filter', 'render' or
+    'llm'); exceptions raised inside it are counted as errors.
+    """
+    return _stage(name) if ENABLED else _NULL
+
+
+def cache_request(cache):
+    """
+    Counts a lookup of a shared cache (call in the public loader).
+    """
+    if ENABLED:
+        REGISTRY.inc('app_cache_requests_total', {'cache': cache})
+
+
+def cache_miss(cache):
+    """
+    Counts a miss of a shared cache (call inside the cached function body).
+    """
+    if ENABLED:
+        REGISTRY.inc('app_cache_misses_total', {'cache': cache})
+
+
+def estimate_tokens(text):
+    """
+    Approximates the token count of a text (about four characters per token).
+    """
+    return math.ceil(len(text or '') / 4)
+
+
+def record_llm(outcome, prompt, response=None, job=None):
+    """
+    Records one LLM request: its outcome, estimated tokens and, from the executor job's
+    timestamps, queue wait, first-chunk latency, total latency and retries.
+    """
+    if not ENABLED:
+        return
+    REGISTRY.inc('app_llm_requests_total', {'outcome': outcome})
+    REGISTRY.inc('app_llm_tokens_total', {'kind': 'prompt'}, estimate_tokens(prompt))
+    if response:
+        REGISTRY.inc('app_llm_tokens_total', {'kind': 'response'}, estimate_tokens(response))
+    if job is None or job.started_at is None:
+        return
+    REGISTRY.observe('app_llm_queue_seconds', {}, job.started_at - job.submitted_at)
+    if job.first_chunk_at is not None:
+        REGISTRY.observe('app_llm_first_token_seconds', {}, job.first_chunk_at - job.started_at)
+    if job.finished_at is not None:
+        REGISTRY.observe('app_llm_latency_seconds', {}, job.finished_at - job.started_at)
+    if job.attempts > 1:
+        REGISTRY.inc('app_llm_retries_total', {}, job.attempts - 1)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    GET /metrics: the registry in the Prometheus text format.
+    """
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@st.cache_resource
+def start_exporter(port=None):
+    """
+    Starts the Prometheus exporter on a background thread once per process
+    (no-op when metrics are disabled or no port is configured).
+
+    Returns:
+    - ThreadingHTTPServer: The server, or None.
+    """
+    port = port or EXPORTER_PORT
+    if not ENABLED or not port:
+        return None
+    server = ThreadingHTTPServer(('0.0.0.0', int(port)), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-exporter', daemon=True).start()
+    return server
+
+
+def admin_panel():
+    """
+    Renders the performance panel in the sidebar for admins (APP_METRICS_ADMIN or ?admin=1).
+    """
+    if not ENABLED or not (ADMIN or st.query_params.get('admin') == '1'):
+        return
+    # pandas is only needed for the panel, which keeps it off the app's cold start path
+    import pandas as pd
+    with st.sidebar.expander("⚙️ Performance", expanded=False):
+        record = st.session_state.get('_metrics_last_rerun')
+        if record is not None:
+            st.metric(f"Last rerun ({record.page})", f"{record.seconds * 1000:.0f} ms")
+            if record.stages:
+                stages = pd.Series(record.stages).mul(1000).round(1)
+                stages['other'] = round(max(0.0, record.seconds * 1000 - stages.sum()), 1)
+                st.dataframe(stages.rename('ms').rename_axis('stage').reset_index(), hide_index=True)
+
+        st.write("**Stages (ms)**")
+        stages = REGISTRY.histogram_table('app_stage_seconds')
+        if not stages.empty:
+            stages[['mean', 'p50', 'p95']] = stages[['mean', 'p50', 'p95']].mul(1000).round(1)
+            st.dataframe(stages.sort_values(['page', 'stage']), hide_index=True)
+
+        st.write("**Caches**")
+        requests = REGISTRY.counter_table('app_cache_requests_total')
+        if not requests.empty:
+            misses = REGISTRY.counter_table('app_cache_misses_total')
+            caches = requests.rename(columns={'value': 'requests'})
+            caches['misses'] = caches['cache'].map(misses.set_index('cache')['value'] if not misses.empty else {}).fillna(0)
+            caches['hit_rate'] = (1 - caches['misses'] / caches['requests']).clip(lower=0).round(3)
+            st.dataframe(caches, hide_index=True)
+
+        st.write("**LLM**")
+        llm = REGISTRY.counter_table('app_llm_requests_total')
+        if not llm.empty:
+            st.dataframe(llm.rename(columns={'value': 'requests'}), hide_index=True)
+            latency = pd.concat([
+                REGISTRY.histogram_table(name).assign(metric=name.removeprefix('app_llm_'))
+                for name in ('app_llm_queue_seconds', 'app_llm_first_token_seconds', 'app_llm_latency_seconds')
+            ])
+            if not latency.empty:
+                st.dataframe(latency[['metric', 'count', 'mean', 'p50', 'p95']].round(3), hide_index=True)
+            tokens = REGISTRY.counter_table('app_llm_tokens_total')
+            if not tokens.empty:
+                st.dataframe(tokens.rename(columns={'value': 'tokens'}), hide_index=True)
+
+        errors = REGISTRY.counter_table('app_errors_total')
+        st.write(f"**Errors:** {int(errors['value'].sum()) if not errors.empty else 0}")
+        if not errors.empty:
+            st.dataframe(errors, hide_index=True)
+
+        st.download_button("Download metrics", REGISTRY.render(), file_name="metrics.prom", mime="text/plain")
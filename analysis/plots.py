@@ -0,0 +1,101 @@
+import os
+import glob
+import json
+import argparse
+import plotly.graph_objects as go
+import streamlit as st
+
+PLOTS_DIR = 'plots'
+
+
+def extract_figure_spec(html):
+    """
+    Extracts the figure JSON from a Plotly ``write_html`` export.
+
+    Parameters:
+    - html (str): Contents of the exported HTML file.
+
+    Returns:
+    - dict: The figure spec ({'data': [...], 'layout': {...}}), or None if the file is not a Plotly export.
+    """
+    start = html.find('Plotly.newPlot(')
+    if start == -1:
+        return None
+    decoder = json.JSONDecoder()
+    pos = start + len('Plotly.newPlot(')
+    args = []
+    # Arguments are: div id, data, layout, config
+    while len(args) < 3:
+        while html[pos] in ' \t\r\n,':
+            pos += 1
+        value, pos = decoder.raw_decode(html, pos)
+        args.append(value)
+    return {'data': args[1], 'layout': args[2]}
+
+
+def convert_exports(plots_dir=PLOTS_DIR):
+    """
+    Converts every Plotly HTML export under plots_dir into a JSON spec next to it.
+
+    Each export embeds its own copy of plotly.js; the JSON spec only holds the
+    figure, and the page renders it with the plotly bundle Streamlit ships once.
+
+    Returns:
+    - list of str: Paths of the written specs.
+    """
+    written = []
+    for html_path in glob.glob(os.path.join(plots_dir, '**', '*.html'), recursive=True):
+        with open(html_path, 'r', encoding="utf-8") as f:
+            spec = extract_figure_spec(f.read())
+        if spec is None:
+            continue
+        spec_path = os.path.splitext(html_path)[0] + '.json'
+        with open(spec_path, 'w', encoding="utf-8") as f:
+            json.dump(spec, f)
+        written.append(spec_path)
+    return written
+
+
+@st.cache_resource
+def load_figure(name, plots_dir=PLOTS_DIR):
+    """
+    Loads a figure by name (e.g. 'engagement_analysis/upvote_distribution') once per process.
+
+    The JSON spec is preferred; a Plotly HTML export with the same name is converted
+    on first use. The returned figure is shared and must not be mutated.
+
+    Returns:
+    - go.Figure: The figure, or None if neither a spec nor a Plotly export exists.
+    """
+    spec_path = os.path.join(plots_dir, name + '.json')
+    html_path = os.path.join(plots_dir, name + '.html')
+    if os.path.exists(spec_path):
+        with open(spec_path, 'r', encoding="utf-8") as f:
+            spec = json.load(f)
+    elif os.path.exists(html_path):
+        with open(html_path, 'r', encoding="utf-8") as f:
+            spec = extract_figure_spec(f.read())
+        if spec is None:
+            return None
+    else:
+        return None
+    return go.Figure(spec)
+
+
+def show_figure(name):
+    """
+    Renders a stored figure, or a notice when it has not been exported yet.
+    """
+    fig = load_figure(name)
+    if fig is None:
+        st.info(f"The `{name}` plot has not been generated yet. Export it from the notebook into `{PLOTS_DIR}/`.")
+    else:
+        st.plotly_chart(fig, use_container_width=True, key=name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert Plotly HTML exports into JSON figure specs.")
+    parser.add_argument('--plots', default=PLOTS_DIR, help="Directory holding the exported plots")
+    args = parser.parse_args()
+    for path in convert_exports(args.plots):
+        print("Wrote", path)
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from analysis.dataset import NO_CROSSPOST, current_version, load_dataset
+
+# Sort option -> column, each precomputed as an ordering of row positions
+SORT_COLUMNS = {
+    'Date': 'created_utc_original',
+    'Score': 'score_original',
+    'Comments': 'num_comments_original'
+}
+
+
+class PostLookup:
+    """
+    Post id -> row positions of the post, with its crosspost rows grouped under it.
+
+    Rows are grouped CSR-style: the rows of the i-th id are
+    rows[offsets[i]:offsets[i+1]], the first one being the post's own row.
+    """
+
+    def __init__(self, df):
+        codes, ids = pd.factorize(df['id_original'].astype('object'), use_na_sentinel=True)
+        valid = np.flatnonzero(codes >= 0)
+        self.ids = pd.Index(ids)
+        self.rows = valid[np.argsort(codes[valid], kind='stable')]
+        self.offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes[valid], minlength=len(ids)), out=self.offsets[1:])
+        self.first = self.rows[self.offsets[:-1]]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def first_rows(self, post_ids=None):
+        """
+        Returns the row position of each post's own row: of every post, or of the given
+        ids in their order (unknown ids are skipped).
+        """
+        if post_ids is None:
+            return self.first
+        codes = self.ids.get_indexer(pd.Index(post_ids, dtype='object'))
+        return self.first[codes[codes >= 0]]
+
+    def positions(self, post_id):
+        """
+        Returns the row positions of a post (empty if the id is unknown).
+        """
+        try:
+            i = self.ids.get_loc(post_id)
+        except KeyError:
+            return self.rows[:0]
+        return self.rows[self.offsets[i]:self.offsets[i + 1]]
+
+
+def build_orderings(df, lookup):
+    """
+    Precomputes one descending ordering of the posts per sort option.
+
+    The feature data has one row per (post, crosspost) pair; only the first row of
+    each post is listed. Posts missing the sort value come last.
+
+    Parameters:
+    - df (pd.DataFrame): Dataset rows.
+    - lookup (PostLookup): Lookup built over df.
+
+    Returns:
+    - dict: Sort option -> tuple(np.ndarray, int): row positions with the highest value
+      first and missing values last, and the number of posts that have a value.
+    """
+    first_rows = lookup.first_rows()
+    orderings = {}
+    for name, column in SORT_COLUMNS.items():
+        values = df[column].iloc[first_rows]
+        missing = values.isna().to_numpy()
+        if pd.api.types.is_datetime64_any_dtype(values):
+            keys = values.to_numpy(dtype='datetime64[ns]').view('int64').astype('float64')
+        else:
+            keys = pd.to_numeric(values, errors='coerce').astype('float64').to_numpy()
+        keys = np.where(missing, -np.inf, keys)
+        orderings[name] = (first_rows[np.argsort(-keys, kind='stable')], int((~missing).sum()))
+    return orderings
+
+
+@st.cache_resource(max_entries=2)
+def _load_posts_cached(version):
+    df = load_dataset()
+    lookup = PostLookup(df)
+    return df, lookup, build_orderings(df, lookup)
+
+
+def load_posts():
+    """
+    Loads the dataset, its post lookup and the post list orderings once per process and
+    dataset version; the Posts list, search results, post details and chatbots share them.
+
+    Returns:
+    - tuple(pd.DataFrame, PostLookup, dict): The rows, the lookup over them and the
+      orderings from build_orderings().
+    """
+    return _load_posts_cached(current_version())
+
+
+def rows_for_ids(df, lookup, ids):
+    """
+    Returns the own rows of the given post ids, in the given order (unknown ids are skipped).
+    """
+    return df.iloc[lookup.first_rows(ids)]
+
+
+def get_post(df, lookup, post_id):
+    """
+    Fetches a post and its crossposts without scanning the dataset.
+
+    Parameters:
+    - df (pd.DataFrame): Dataset rows.
+    - lookup (PostLookup): Lookup built over df.
+    - post_id (str): The post's id_original.
+
+    Returns:
+    - tuple(pd.DataFrame, pd.DataFrame): All rows of the post (None if not found) and
+      the rows that carry an actual crosspost.
+    """
+    positions = lookup.positions(post_id)
+    if len(positions) == 0:
+        return None, None
+    rows = df.iloc[positions]
+    crossposts = rows[rows['id_crosspost'].astype('object').fillna(NO_CROSSPOST) != NO_CROSSPOST]
+    return rows, crossposts
+
+
+def page_rows(df, ordering, page, page_size, descending=True):
+    """
+    Materializes only the rows of one page.
+
+    Parameters:
+    - df (pd.DataFrame): Dataset rows.
+    - ordering (tuple): Precomputed ordering and count of posts with a value, from build_orderings().
+    - page (int): Zero-based page number.
+    - page_size (int): Rows per page.
+    - descending (bool): False to list the posts with a value from the lowest; posts
+      without one stay last.
+
+    Returns:
+    - pd.DataFrame: The rows of the page, in order.
+    """
+    order, valid = ordering
+    ranks = np.arange(page * page_size, min((page + 1) * page_size, len(order)))
+    if not descending:
+        ranks = np.where(ranks < valid, valid - 1 - ranks, ranks)
+    return df.iloc[order[ranks]]
@@ -0,0 +1,244 @@
+import os
+import json
+import zlib
+import argparse
+import numpy as np
+import pandas as pd
+import streamlit as st
+from analysis.dataset import STORE_PATH, read_dataset
+from analysis.search import tokenize
+from analysis import metrics
+
+# Persisted row embeddings (one row per post) and the embedder they were built with
+INDEX_DIR = './cleaned_data/retrieval_index'
+EMBEDDINGS_FILE = 'embeddings.npy'
+IDS_FILE = 'ids.parquet'
+META_FILE = 'meta.json'
+
+SOURCE_COLUMNS = [
+    'id_original', 'title_original', 'selftext_original', 'subreddit_original', 'author_original',
+    'domain_original', 'created_utc_original'
+]
+
+# Columns sent to the LLM for each retrieved row
+CONTEXT_COLUMNS = [
+    'id_original', 'title_original', 'selftext_original', 'subreddit_original', 'author_original',
+    'domain_original', 'created_utc_original', 'score_original', 'num_comments_original',
+    'num_crossposts_original', 'is_unreliable_domain', 'title_sentiment'
+]
+
+# Selftext is cut to this many characters, both for embedding and in the prompt
+MAX_TEXT_CHARS = 1000
+
+SENTENCE_TRANSFORMER_MODEL = 'all-MiniLM-L6-v2'
+
+
+class HashingEmbedder:
+    """
+    Offline embedder: signed feature hashing of unigrams and bigrams, L2-normalized.
+
+    Needs no model download, so it always works; retrieval quality is lexical.
+    """
+
+    def __init__(self, dim=1024, bigrams=True):
+        self.dim = dim
+        self.bigrams = bigrams
+        self.name = f'hashing-{dim}'
+
+    def _features(self, text):
+        tokens = tokenize(text)
+        return tokens + [a + ' ' + b for a, b in zip(tokens, tokens[1:])] if self.bigrams else tokens
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode('utf-8'))
+                vectors[i, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        # Sublinear term weighting, then unit length so dot products are cosines
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class SentenceTransformerEmbedder:
+    """
+    Dense embedder backed by sentence-transformers (downloads the model on first use).
+    """
+
+    def __init__(self, model_name=SENTENCE_TRANSFORMER_MODEL):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.name = f'sentence-transformers/{model_name}'
+
+    def embed(self, texts):
+        return self.model.encode(
+            list(texts), batch_size=64, normalize_embeddings=True, convert_to_numpy=True
+        ).astype(np.float32)
+
+
+def get_embedder(name='auto'):
+    """
+    Returns an embedder by name.
+
+    Parameters:
+    - name (str): 'hashing', 'hashing-<dim>', 'sentence-transformers[/<model>]' or 'auto'
+      (sentence-transformers when it is installed and the model loads, else hashing).
+
+    Returns:
+    - object: An embedder with a `name` and an `embed(texts)` method returning unit-length rows.
+    """
+    if name == 'auto':
+        try:
+            return SentenceTransformerEmbedder()
+        except Exception:
+            return HashingEmbedder()
+    if name.startswith('hashing'):
+        _, _, dim = name.partition('-')
+        return HashingEmbedder(int(dim)) if dim else HashingEmbedder()
+    if name.startswith('sentence-transformers'):
+        _, _, model_name = name.partition('/')
+        return SentenceTransformerEmbedder(model_name or SENTENCE_TRANSFORMER_MODEL)
+    raise ValueError(f"Unknown embedder: {name}")
+
+
+def row_documents(df):
+    """
+    Builds the text embedded for each row: title, selftext and metadata.
+    """
+    def text(column):
+        return df[column].astype('string').fillna('')
+
+    return (
+        text('title_original') + '\n' + text('selftext_original').str.slice(0, MAX_TEXT_CHARS)
+        + '\nsubreddit: ' + text('subreddit_original') + ' | author: ' + text('author_original')
+        + ' | domain: ' + text('domain_original') + ' | date: ' + text('created_utc_original').str.slice(0, 10)
+    ).tolist()
+
+
+class RetrievalIndex:
+    """
+    Unit-length row embeddings with exact top-k cosine search.
+    """
+
+    def __init__(self, embedder, ids=None, embeddings=None):
+        self.embedder = embedder
+        self.ids = np.asarray(ids if ids is not None else [], dtype=object)
+        self.embeddings = embeddings if embeddings is not None else np.zeros((0, 0), dtype=np.float32)
+
+    def add_documents(self, df):
+        """
+        Embeds posts that are not indexed yet (one entry per post).
+
+        Returns:
+        - int: Number of newly indexed posts.
+        """
+        df = df.drop_duplicates('id_original')
+        df = df[~df['id_original'].astype('object').isin(set(self.ids.tolist()))]
+        if df.empty:
+            return 0
+        vectors = self.embedder.embed(row_documents(df))
+        self.embeddings = vectors if len(self.ids) == 0 else np.vstack([self.embeddings, vectors])
+        self.ids = np.concatenate([self.ids, df['id_original'].astype('object').to_numpy()])
+        return len(df)
+
+    def query(self, question, k=20):
+        """
+        Returns the ids and similarities of the k rows closest to the question.
+        """
+        if len(self.ids) == 0:
+            return pd.DataFrame({'id_original': [], 'similarity': []})
+        scores = self.embeddings @ self.embedder.embed([question])[0]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return pd.DataFrame({'id_original': self.ids[top], 'similarity': scores[top]})
+
+    def save(self, index_dir=INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, EMBEDDINGS_FILE), self.embeddings)
+        pd.DataFrame({'id_original': self.ids}).to_parquet(os.path.join(index_dir, IDS_FILE), index=False)
+        with open(os.path.join(index_dir, META_FILE), 'w', encoding="utf-8") as f:
+            json.dump({'embedder': self.embedder.name, 'count': len(self.ids)}, f)
+
+    @classmethod
+    def load(cls, index_dir=INDEX_DIR):
+        with open(os.path.join(index_dir, META_FILE), 'r', encoding="utf-8") as f:
+            meta = json.load(f)
+        embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE))
+        ids = pd.read_parquet(os.path.join(index_dir, IDS_FILE))['id_original'].astype('object').to_numpy()
+        return cls(get_embedder(meta['embedder']), ids, embeddings)
+
+
+def build_index(store_path=STORE_PATH, index_dir=INDEX_DIR, embedder='auto'):
+    """
+    Embeds every post of the feature store, replacing any existing index.
+    """
+    index = RetrievalIndex(get_embedder(embedder))
+    index.add_documents(read_dataset(SOURCE_COLUMNS, store_path=store_path))
+    index.save(index_dir)
+    return index
+
+
+def update_index(batch_df, index_dir=INDEX_DIR):
+    """
+    Embeds new posts into the persisted index (no-op if no index was built yet).
+    """
+    if not os.path.exists(os.path.join(index_dir, META_FILE)):
+        return None
+    index = RetrievalIndex.load(index_dir)
+    if index.add_documents(batch_df):
+        index.save(index_dir)
+    return index
+
+
+@st.cache_resource
+def _load_index_cached(index_dir, mtime):
+    metrics.cache_miss('retrieval_index')
+    return RetrievalIndex.load(index_dir)
+
+
+def load_retrieval_index(index_dir=INDEX_DIR):
+    """
+    Loads the index for the app; reloaded when it is rewritten.
+
+    The index is never built here, since embedding the store (and possibly downloading
+    the sentence-transformers model) would block a page request: build it ahead of time
+    with `python -m analysis.retrieval`.
+
+    Returns:
+    - RetrievalIndex: The index, or None if it has not been built.
+    """
+    meta_path = os.path.join(index_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    metrics.cache_request('retrieval_index')
+    return _load_index_cached(index_dir, os.path.getmtime(meta_path))
+
+
+def context_rows(rows):
+    """
+    Formats retrieved rows as compact CSV for the prompt.
+
+    Returns:
+    - str: CSV text with CONTEXT_COLUMNS and truncated selftext.
+    """
+    columns = [column for column in CONTEXT_COLUMNS if column in rows.columns]
+    context = rows[columns].copy()
+    context['selftext_original'] = context['selftext_original'].astype('string').str.slice(0, MAX_TEXT_CHARS)
+    return context.to_csv(index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the chatbot retrieval index.")
+    parser.add_argument('question', nargs='?', help="Question to retrieve rows for instead of building the index")
+    parser.add_argument('--store', default=STORE_PATH, help="Feature store directory")
+    parser.add_argument('--index', default=INDEX_DIR, help="Index directory")
+    parser.add_argument('--embedder', default='auto', help="'auto', 'hashing[-<dim>]' or 'sentence-transformers[/<model>]'")
+    parser.add_argument('-k', type=int, default=10, help="Rows to retrieve")
+    args = parser.parse_args()
+    if args.question:
+        print(RetrievalIndex.load(args.index).query(args.question, args.k).to_string(index=False))
+    else:
+        index = build_index(args.store, args.index, args.embedder)
+        print(f"Embedded {len(index.ids)} posts with {index.embedder.name}")
@@ -0,0 +1,355 @@
+import re
+import argparse
+import numpy as np
+import pandas as pd
+from analysis.cube import WEEKDAYS
+
+# Grouping dimensions: phrase pattern -> (label, column or time bucket)
+DIMENSIONS = [
+    (r'day of (?:the )?week|weekdays?', ('weekday', 'day_of_week_original')),
+    (r'subreddits?|communit(?:y|ies)', ('subreddit', 'subreddit_original')),
+    (r'authors?|users?|posters?', ('author', 'author_original')),
+    (r'domains?|sources?|websites?|sites?', ('domain', 'domain_original')),
+    (r'hours?|hourly|time of day', ('hour', 'hour_original')),
+    (r'months?|monthly', ('month', 'month')),
+    (r'weeks?|weekly', ('week', 'week')),
+    (r'days?|daily|dates?', ('day', 'day')),
+]
+
+# Measures: phrase pattern -> (label, column, default aggregate when none is named)
+MEASURES = [
+    (r'upvote ratios?', ('upvote ratio', 'upvote_ratio_original', 'mean')),
+    (r'selftext sentiment', ('selftext sentiment', 'selftext_sentiment', 'mean')),
+    (r'(?:title )?sentiment', ('title sentiment', 'title_sentiment', 'mean')),
+    (r'upvotes?|ups\b', ('upvotes', 'ups_original', 'sum')),
+    (r'scores?', ('score', 'score_original', 'sum')),
+    (r'comments?', ('comments', 'num_comments_original', 'sum')),
+    (r'crossposts?', ('crossposts', 'num_crossposts_original', 'sum')),
+    (r'awards?', ('awards', 'total_awards_received_original', 'sum')),
+    (r'subscribers?', ('subscribers', 'subreddit_subscribers_original', 'mean')),
+    (r'title length', ('title length', 'title_length', 'mean')),
+    (r'time lag', ('time lag (hours)', 'time_lag_hours', 'mean')),
+]
+
+# Aggregate keywords, checked in order
+AGGREGATES = [
+    (r'\b(?:average|avg|mean)\b', 'mean'),
+    (r'\bmedian\b', 'median'),
+    (r'\b(?:total|sum)\b', 'sum'),
+    (r'\b(?:max|maximum|highest)\b', 'max'),
+    (r'\b(?:min|minimum|lowest)\b', 'min'),
+    (r'\b(?:how many|number of|count|posts? per|most posts|fewest posts)\b', 'count'),
+]
+
+# Distinct counts: "how many unique authors", "number of subreddits", "distinct domains"
+DISTINCT = re.compile(
+    r'\b(?:(?:how many|number of|count(?: of)?) (?:unique |distinct |different )?|(?:unique|distinct) )'
+    r'(subreddits?|communit(?:y|ies)|authors?|users?|posters?|domains?|sources?|websites?|sites?)\b'
+)
+
+# Boolean feature flags: phrase pattern -> (column, value when matched); a "not", "not from"
+# or "non" prefix negates the value. "unreliable" is matched before "reliable".
+SOURCE_NOUNS = r'(?: (?:domains?|sources?|sites?|websites?|links?|outlets?))?'
+FLAGS = [
+    (r'is_breaking_news|breaking(?: news)?', ('is_breaking_news', True)),
+    (r'is_unreliable_domain|unreliable' + SOURCE_NOUNS, ('is_unreliable_domain', True)),
+    (r'reliable' + SOURCE_NOUNS, ('is_unreliable_domain', False)),
+    (r'is_video|videos?', ('is_video_original', True)),
+    (r'is_self|self[- ]?posts?|text posts?', ('is_self_original', True)),
+    (r'has_unverified_flair|unverified flairs?', ('has_unverified_flair', True)),
+    (r'is_different_subreddit|cross-subreddit', ('is_different_subreddit', True)),
+]
+
+# Words that can never be a subreddit or author name, even after r/ or u/ or in quotes
+NOT_NAMES = {'by', 'with', 'has', 'have', 'had', 'is', 'was', 'and', 'or', 'the', 'for', 'of', 'in', 'per', 'that',
+             'which', 'where', 'when', 'whose', 'posted', 'posts', 'subreddits', 'authors', 'users'}
+
+# Explicit names: "r/politics", "u/someone", or a quoted name after the dimension word
+# ("subreddit 'politics'"); a bare word after "subreddit" is never taken as a name
+NAME_FILTERS = [
+    (r"r/([a-z0-9_-]+)|(?:subreddit|community) [\"']([a-z0-9_-]+)[\"']", ('subreddit_original', 'subreddit')),
+    (r"u/([a-z0-9_-]+)|(?:author|user) [\"']([a-z0-9_-]+)[\"']", ('author_original', 'author')),
+]
+
+# Words that may be left over once a question is compiled; any other word means the
+# plan would ignore part of the question, so it goes to the LLM instead
+FILLER_WORDS = {
+    'a', 'an', 'the', 'what', 'which', 'who', 'are', 'is', 'was', 'were', 'there', 'have', 'has', 'had', 'do',
+    'does', 'did', 'be', 'been', 'of', 'by', 'per', 'for', 'with', 'in', 'on', 'at', 'to', 'from', 'and', 'across',
+    'each', 'every', 'all', 'overall', 'post', 'posts', 'posted', 'made', 'submitted', 'shared', 'me', 'show',
+    'give', 'list', 'get', 'got', 'please', 'value', 'values', 'number', 'dataset', 'data', 'reddit', 'that',
+    'i', 'we', 'you', 'can', 'it', 'they', 'received', 'receive', 'where',
+}
+
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october',
+          'november', 'december']
+
+# Questions with these words need reasoning over text and always go to the LLM
+OPEN_ENDED = re.compile(r'\b(?:why|explain|summari[sz]e|summary|describe|opinions?|think|feel|discuss|compare|tell me about)\b')
+
+# Columns the plans may read; nothing else is ever touched
+PLAN_COLUMNS = sorted(
+    {column for _, (_, column) in DIMENSIONS if column.endswith(('_original',))}
+    | {column for _, (_, column, _) in MEASURES}
+    | {column for _, (column, _) in FLAGS}
+    | {'id_original', 'subreddit_original', 'author_original', 'domain_original', 'created_utc_original', 'date_original'}
+)
+
+MAX_ROWS = 50
+
+AGGREGATE_LABELS = {
+    'mean': 'average', 'median': 'median', 'sum': 'total', 'max': 'highest', 'min': 'lowest', 'nunique': 'distinct'
+}
+
+
+class QueryPlan:
+    """
+    A restricted aggregate query: literal filters, an optional group-by, one aggregate
+    (a post count, a distinct count of a dimension or a statistic of a measure) and an
+    optional top-k. Plans only reference PLAN_COLUMNS and never evaluate code.
+    """
+
+    def __init__(self, aggregate, measure=None, group_by=None, filters=None, top_k=None, ascending=False):
+        self.aggregate = aggregate
+        self.measure = measure
+        self.group_by = group_by
+        self.filters = filters or []
+        self.top_k = top_k
+        self.ascending = ascending
+
+    def __repr__(self):
+        return (f'QueryPlan(aggregate={self.aggregate!r}, measure={self.measure!r}, group_by={self.group_by!r}, '
+                f'filters={self.filters!r}, top_k={self.top_k!r}, ascending={self.ascending!r})')
+
+    def _value_label(self):
+        if self.aggregate == 'count':
+            return 'posts'
+        if self.aggregate == 'nunique':
+            return f'distinct {self.measure[0]}s'
+        return f'{AGGREGATE_LABELS[self.aggregate]} {self.measure[0]}'
+
+    def describe(self):
+        """
+        Returns a one-line, human-readable description of the plan.
+        """
+        what = f'number of {self._value_label()}' if self.aggregate in ('count', 'nunique') else self._value_label()
+        text = what
+        if self.group_by:
+            text = f"{'bottom' if self.ascending else 'top'} {self.top_k} {self.group_by[0]}s by {what}" \
+                if self.top_k else f'{what} per {self.group_by[0]}'
+        if self.filters:
+            text += ' where ' + ' and '.join(label for _, _, _, label in self.filters if label)
+        return text[0].upper() + text[1:]
+
+    def _mask(self, posts):
+        mask = np.ones(len(posts), dtype=bool)
+        for column, op, value, _ in self.filters:
+            series = posts[column]
+            if op == 'is':
+                mask &= (series.fillna(False).astype(bool) == value).to_numpy()
+            elif op == 'equals':
+                mask &= (series.astype('string').str.lower() == value).fillna(False).to_numpy()
+            elif op == 'month':
+                mask &= (series.dt.month == value).fillna(False).to_numpy()
+            elif op == 'year':
+                mask &= (series.dt.year == value).fillna(False).to_numpy()
+            elif op == 'after':
+                mask &= (series >= value).fillna(False).to_numpy()
+            elif op == 'before':
+                mask &= (series < value).fillna(False).to_numpy()
+            else:
+                raise ValueError(f"Unsupported filter: {op}")
+        return mask
+
+    def _group_keys(self, rows):
+        label, column = self.group_by
+        created = rows['created_utc_original']
+        if column == 'day':
+            return created.dt.normalize().rename('day')
+        if column == 'week':
+            return created.dt.to_period('W').dt.start_time.rename('week')
+        if column == 'month':
+            return created.dt.to_period('M').astype('string').rename('month')
+        if column == 'day_of_week_original':
+            return pd.Series(pd.Categorical(created.dt.day_name(), categories=WEEKDAYS), index=rows.index, name='weekday')
+        return rows[column].rename(label)
+
+    def execute(self, posts):
+        """
+        Runs the plan on one row per post.
+
+        Parameters:
+        - posts (pd.DataFrame): One row per post with PLAN_COLUMNS.
+
+        Returns:
+        - pd.DataFrame: The result table (a single row when there is no group-by).
+        """
+        rows = posts[self._mask(posts)]
+        value_label = self._value_label()
+        if self.aggregate == 'count':
+            values = pd.Series(1, index=rows.index)
+        elif self.aggregate == 'nunique':
+            values = rows[self.measure[1]]
+        else:
+            values = pd.to_numeric(rows[self.measure[1]], errors='coerce').astype('float64')
+
+        if self.group_by is None:
+            result = len(rows) if self.aggregate == 'count' else values.agg(self.aggregate)
+            return pd.DataFrame({value_label: [result]})
+
+        keys = self._group_keys(rows)
+        grouped = values.groupby(keys, observed=True, sort=True)
+        result = (grouped.size() if self.aggregate == 'count' else grouped.agg(self.aggregate)).rename(value_label)
+        result = result.reset_index()
+        if self.top_k or self.group_by[1] not in ('day', 'week', 'month', 'hour_original', 'day_of_week_original'):
+            result = result.sort_values(value_label, ascending=self.ascending, kind='stable', na_position='last')
+        return result.head(self.top_k or MAX_ROWS).reset_index(drop=True)
+
+
+def _find_first(patterns, text):
+    # Earliest match among (pattern, value) pairs
+    best = None
+    for pattern, value in patterns:
+        match = re.search(r'\b(?:' + pattern + r')', text)
+        if match and (best is None or match.start() < best[0]):
+            best = (match.start(), match.end(), value)
+    return best
+
+
+def _parse_filters(q):
+    filters = []
+    for pattern, (column, flag_value) in FLAGS:
+        match = re.search(r'\b(not (?:from )?|non[- ]?)?(?:' + pattern + r')\b', q)
+        if match:
+            value = flag_value if match.group(1) is None else not flag_value
+            filters.append((column, 'is', value, f"{column} = {value}"))
+            q = q[:match.start()] + ' ' + q[match.end():]
+
+    for pattern, (column, label) in NAME_FILTERS:
+        match = re.search(r'(?<![a-z0-9_])(?:' + pattern + r')', q)
+        name = match and (match.group(1) or match.group(2))
+        if name and name not in NOT_NAMES and name not in FILLER_WORDS:
+            filters.append((column, 'equals', name, f"{label} = {name}"))
+            q = q[:match.start()] + ' ' + q[match.end():]
+    # "where domain is breitbart.com": the phrase naming the filter goes with the domain
+    match = re.search(r'(?:\b(?:domains?|sources?|sites?|websites?) (?:is |= ?|of )?)?'
+                      r'\b([a-z0-9-]+(?:\.[a-z0-9-]+)*\.(?:com|org|net|co|io|news|info|ca|uk|us))\b', q)
+    if match:
+        filters.append(('domain_original', 'equals', match.group(1), f"domain = {match.group(1)}"))
+        q = q[:match.start()] + ' ' + q[match.end():]
+
+    for op, pattern in (('after', r'(?:after|since|from) (\d{4}-\d{2}-\d{2})'), ('before', r'(?:before|until) (\d{4}-\d{2}-\d{2})')):
+        match = re.search(pattern, q)
+        if match:
+            filters.append(('created_utc_original', op, pd.Timestamp(match.group(1)), f"{op} {match.group(1)}"))
+            q = q[:match.start()] + ' ' + q[match.end():]
+    match = re.search(r'\bon (\d{4}-\d{2}-\d{2})', q)
+    if match:
+        day = pd.Timestamp(match.group(1))
+        filters.append(('created_utc_original', 'after', day, f"on {match.group(1)}"))
+        filters.append(('created_utc_original', 'before', day + pd.Timedelta(days=1), None))
+        q = q[:match.start()] + ' ' + q[match.end():]
+    match = re.search(r'\b(?:in|during) (' + '|'.join(MONTHS) + r')\b', q)
+    if match:
+        filters.append(('created_utc_original', 'month', MONTHS.index(match.group(1)) + 1, f"month = {match.group(1).title()}"))
+        q = q[:match.start()] + ' ' + q[match.end():]
+    match = re.search(r'\b(?:in|during) (20\d\d)\b', q)
+    if match:
+        filters.append(('created_utc_original', 'year', int(match.group(1)), f"year = {match.group(1)}"))
+        q = q[:match.start()] + ' ' + q[match.end():]
+    return filters, q
+
+
+def _cut(text, start, end):
+    return text[:start] + ' ' + text[end:]
+
+
+def route(question):
+    """
+    Compiles a structured aggregate question into a QueryPlan.
+
+    Recognizes aggregates (count, distinct count, average, median, total, max, min),
+    measures, a group-by dimension, top/bottom N, feature flags, subreddit/author/domain
+    and date filters. Open-ended questions, and anything that does not compile cleanly
+    (including any word the plan would ignore, such as a topic), return None so they
+    fall through to the LLM.
+
+    Parameters:
+    - question (str): The user's question.
+
+    Returns:
+    - QueryPlan: The plan, or None.
+    """
+    q = re.sub(r'\s+', ' ', question.lower()).strip(' ?!.')
+    if not q or OPEN_ENDED.search(q):
+        return None
+
+    filters, rest = _parse_filters(q)
+
+    top = re.search(r'\b(top|bottom|most|least|fewest)\s+(\d+)\b', rest)
+    top_k = int(top.group(2)) if top else None
+    ascending = bool(top) and top.group(1) in ('bottom', 'least', 'fewest')
+    if top:
+        rest = _cut(rest, top.start(), top.end())
+
+    # "how many unique authors" counts distinct values of a dimension
+    distinct = DISTINCT.search(rest)
+    if distinct:
+        counted = _find_first(DIMENSIONS, distinct.group(1))[2]
+        rest = _cut(rest, distinct.start(), distinct.end())
+
+    aggregate = None if distinct else _find_first(AGGREGATES, rest)
+    measure = None if distinct else _find_first(MEASURES, rest)
+    counts_posts = aggregate is not None and 'post' in rest[aggregate[0]:aggregate[1]]
+    # Cut the later phrase first so the position of the earlier one stays valid
+    for found in sorted(filter(None, [aggregate, measure]), key=lambda found: -found[0]):
+        rest = _cut(rest, found[0], found[1])
+    dimension = _find_first(DIMENSIONS, rest)
+    if dimension:
+        rest = _cut(rest, dimension[0], dimension[1])
+
+    if set(re.findall(r"[a-z0-9_'-]+", rest)) - FILLER_WORDS:
+        return None
+
+    if distinct:
+        aggregate, measure = 'nunique', counted
+    elif aggregate is not None:
+        # "how many comments ..." totals the measure instead of counting posts
+        aggregate = 'sum' if aggregate[2] == 'count' and measure and not counts_posts else aggregate[2]
+        measure = measure[2][:2] if measure and aggregate != 'count' else None
+    elif top_k and measure is None:
+        # "top 10 subreddits by unreliable posts"
+        aggregate = 'count'
+    elif measure is not None and (top_k or dimension):
+        aggregate, measure = measure[2][2], measure[2][:2]
+    else:
+        return None
+    if aggregate not in ('count', 'nunique') and measure is None:
+        return None
+    if top_k and dimension is None:
+        return None
+    if aggregate == 'nunique' and (measure[1] in ('day', 'week', 'month') or dimension and dimension[2] == measure):
+        return None
+
+    return QueryPlan(
+        aggregate,
+        measure=measure,
+        group_by=dimension[2] if dimension else None,
+        filters=filters,
+        top_k=top_k,
+        ascending=ascending
+    )
+
+
+if __name__ == "__main__":
+    from analysis.dataset import read_dataset
+    parser = argparse.ArgumentParser(description="Show how a question is routed and run its query plan.")
+    parser.add_argument('question', help="Question to route")
+    args = parser.parse_args()
+    plan = route(args.question)
+    if plan is None:
+        print("Not an aggregate question; it would go to the LLM.")
+    else:
+        print(plan.describe())
+        posts = read_dataset(PLAN_COLUMNS).drop_duplicates('id_original')
+        print(plan.execute(posts).to_string(index=False))
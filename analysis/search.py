@@ -0,0 +1,394 @@
+import os
+import re
+import glob
+import shlex
+import argparse
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+import streamlit as st
+from analysis.dataset import STORE_PATH, read_dataset
+from analysis import metrics
+
+# Persisted index: one pair of files per segment (postings .npz + documents .parquet)
+INDEX_DIR = './cleaned_data/search_index'
+
+SOURCE_COLUMNS = [
+    'id_original', 'title_original', 'selftext_original', 'subreddit_original', 'author_original',
+    'domain_original', 'is_unreliable_domain', 'created_utc_original'
+]
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Position gap between title and selftext so phrases never span both fields
+FIELD_GAP = 1000
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)*")
+
+# Query filter keyword -> documents column
+FIELD_FILTERS = {'subreddit': 'subreddit', 'author': 'author', 'domain': 'domain'}
+
+
+def tokenize(text):
+    """
+    Lowercases and splits text into word tokens.
+    """
+    return TOKEN_PATTERN.findall(text.lower()) if isinstance(text, str) else []
+
+
+def _documents_table(df):
+    # Filterable fields of each indexed post, matched case-insensitively
+    return pd.DataFrame({
+        'id': df['id_original'].astype('string').to_numpy(),
+        'subreddit': df['subreddit_original'].astype('string').str.lower().to_numpy(),
+        'author': df['author_original'].astype('string').str.lower().to_numpy(),
+        'domain': df['domain_original'].astype('string').str.lower().to_numpy(),
+        'is_unreliable_domain': df['is_unreliable_domain'].fillna(False).astype(bool).to_numpy(),
+        'created': pd.to_datetime(df['created_utc_original']).to_numpy(dtype='datetime64[ns]')
+    })
+
+
+class Segment:
+    """
+    An immutable block of the inverted index covering a contiguous range of documents.
+
+    Postings are stored CSR-style: for term i, postings[term_offsets[i]:term_offsets[i+1]]
+    hold the local document numbers and term frequencies, and each posting p has its
+    token positions in positions[pos_offsets[p]:pos_offsets[p+1]].
+    """
+
+    def __init__(self, terms, term_offsets, post_docs, post_tf, pos_offsets, positions, doc_len, docs):
+        self.terms = terms
+        self.term_offsets = term_offsets
+        self.post_docs = post_docs
+        self.post_tf = post_tf
+        self.pos_offsets = pos_offsets
+        self.positions = positions
+        self.doc_len = doc_len
+        self.docs = docs
+        self.term_index = {term: i for i, term in enumerate(terms.tolist())}
+        # Filter and result columns as arrays, converted once so queries only index them
+        self.ids = docs['id'].to_numpy(dtype=object)
+        self.fields = {column: docs[column].to_numpy(dtype=object) for column in FIELD_FILTERS.values()}
+        self.unreliable = docs['is_unreliable_domain'].to_numpy(dtype=bool)
+        self.created = docs['created'].to_numpy(dtype='datetime64[ns]')
+
+    @classmethod
+    def build(cls, df):
+        """
+        Indexes the title and selftext of the given posts.
+        """
+        postings = defaultdict(list)
+        doc_len = np.zeros(len(df), dtype=np.int32)
+        titles = df['title_original'].to_numpy(dtype=object)
+        selftexts = df['selftext_original'].to_numpy(dtype=object)
+        for doc, (title, selftext) in enumerate(zip(titles, selftexts)):
+            title_tokens = tokenize(title)
+            selftext_tokens = tokenize(selftext)
+            doc_len[doc] = len(title_tokens) + len(selftext_tokens)
+            term_positions = defaultdict(list)
+            for pos, token in enumerate(title_tokens):
+                term_positions[token].append(pos)
+            for pos, token in enumerate(selftext_tokens, start=len(title_tokens) + FIELD_GAP):
+                term_positions[token].append(pos)
+            for token, token_positions in term_positions.items():
+                postings[token].append((doc, token_positions))
+
+        terms = sorted(postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        post_docs, post_tf, pos_lengths, positions = [], [], [], []
+        for i, term in enumerate(terms):
+            for doc, token_positions in postings[term]:
+                post_docs.append(doc)
+                post_tf.append(len(token_positions))
+                pos_lengths.append(len(token_positions))
+                positions.extend(token_positions)
+            term_offsets[i + 1] = len(post_docs)
+        pos_offsets = np.zeros(len(post_docs) + 1, dtype=np.int64)
+        np.cumsum(pos_lengths, out=pos_offsets[1:])
+        return cls(
+            np.array(terms, dtype=str), term_offsets, np.array(post_docs, dtype=np.int32),
+            np.array(post_tf, dtype=np.int32), pos_offsets, np.array(positions, dtype=np.int32),
+            doc_len, _documents_table(df)
+        )
+
+    def save(self, prefix):
+        np.savez(
+            prefix + '.npz', terms=self.terms, term_offsets=self.term_offsets, post_docs=self.post_docs,
+            post_tf=self.post_tf, pos_offsets=self.pos_offsets, positions=self.positions, doc_len=self.doc_len
+        )
+        self.docs.to_parquet(prefix + '.docs.parquet', index=False)
+
+    @classmethod
+    def load(cls, prefix):
+        arrays = np.load(prefix + '.npz')
+        return cls(
+            arrays['terms'], arrays['term_offsets'], arrays['post_docs'], arrays['post_tf'],
+            arrays['pos_offsets'], arrays['positions'], arrays['doc_len'], pd.read_parquet(prefix + '.docs.parquet')
+        )
+
+    def postings(self, term):
+        """
+        Returns the (local docs, term frequencies, posting numbers) of a term.
+        """
+        i = self.term_index.get(term)
+        if i is None:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        start, end = self.term_offsets[i], self.term_offsets[i + 1]
+        return self.post_docs[start:end], self.post_tf[start:end], np.arange(start, end)
+
+    def phrase_docs(self, phrase_terms):
+        """
+        Returns the local documents containing the terms as consecutive tokens.
+        """
+        lists = [self.postings(term) for term in phrase_terms]
+        candidates = lists[0][0]
+        for docs, _, _ in lists[1:]:
+            candidates = np.intersect1d(candidates, docs, assume_unique=True)
+        matches = []
+        for doc in candidates:
+            starts = None
+            for offset, (docs, _, posting_ids) in enumerate(lists):
+                p = posting_ids[np.searchsorted(docs, doc)]
+                token_positions = set(self.positions[self.pos_offsets[p]:self.pos_offsets[p + 1]] - offset)
+                starts = token_positions if starts is None else starts & token_positions
+                if not starts:
+                    break
+            if starts:
+                matches.append(doc)
+        return np.array(matches, dtype=np.int64)
+
+    def filter_mask(self, docs, filters):
+        """
+        Evaluates field filters on the given local documents.
+        """
+        mask = np.ones(len(docs), dtype=bool)
+        for field, column in FIELD_FILTERS.items():
+            if filters.get(field):
+                values = {value.lower() for value in filters[field]}
+                mask &= np.isin(self.fields[column][docs], list(values))
+        if filters.get('reliability') is not None:
+            mask &= self.unreliable[docs] == filters['reliability']
+        if filters.get('after') is not None:
+            mask &= self.created[docs] >= np.datetime64(pd.Timestamp(filters['after']))
+        if filters.get('before') is not None:
+            mask &= self.created[docs] < np.datetime64(pd.Timestamp(filters['before']) + pd.Timedelta(days=1))
+        return mask
+
+
+def _is_date(value):
+    try:
+        return not pd.isna(pd.Timestamp(value))
+    except (ValueError, TypeError):
+        return False
+
+
+def parse_query(query):
+    """
+    Splits a query into free terms, quoted phrases and field filters.
+
+    Supported filters: subreddit:, author:, domain:, reliability:(reliable|unreliable),
+    after:YYYY-MM-DD and before:YYYY-MM-DD. A date filter whose value is not a date
+    is searched as plain text.
+
+    Returns:
+    - tuple(list, list, dict): Terms, phrases (lists of terms) and filters.
+    """
+    terms, phrases, filters = [], [], {}
+    try:
+        parts = shlex.split(query, posix=True)
+    except ValueError:
+        parts = query.replace('"', ' ').split()
+    quoted = set(re.findall(r'"([^"]+)"', query))
+    for part in parts:
+        field, sep, value = part.partition(':')
+        field = field.lower()
+        if sep and value and field in FIELD_FILTERS:
+            filters.setdefault(field, []).append(value)
+        elif sep and value and field == 'reliability':
+            filters['reliability'] = value.lower().startswith('unreliable')
+        elif sep and value and field in ('after', 'before') and _is_date(value):
+            filters[field] = value
+        elif part in quoted and len(tokenize(part)) > 1:
+            phrases.append(tokenize(part))
+        else:
+            terms.extend(tokenize(part))
+    return terms, phrases, filters
+
+
+class SearchIndex:
+    """
+    Segmented BM25 index over post titles and selftext.
+
+    New posts are added as new segments; corpus statistics are combined across
+    segments at query time, so appends never rewrite existing segments.
+    """
+
+    def __init__(self, segments=None):
+        self.segments = segments or []
+
+    @property
+    def num_docs(self):
+        return sum(len(segment.doc_len) for segment in self.segments)
+
+    def indexed_ids(self):
+        return set(pd.concat([segment.docs['id'] for segment in self.segments]).tolist()) if self.segments else set()
+
+    def add_documents(self, df):
+        """
+        Indexes posts not already in the index as a new segment.
+
+        Parameters:
+        - df (pd.DataFrame): Rows with SOURCE_COLUMNS; one entry per post is indexed.
+
+        Returns:
+        - Segment: The new segment, or None if there was nothing new.
+        """
+        df = df.drop_duplicates('id_original')
+        df = df[~df['id_original'].astype('string').isin(self.indexed_ids())]
+        if df.empty:
+            return None
+        segment = Segment.build(df)
+        self.segments.append(segment)
+        return segment
+
+    def search(self, query, filters=None, limit=50):
+        """
+        Ranks posts for a query with BM25.
+
+        Free terms are scored with BM25; quoted phrases must appear verbatim; field
+        filters (from the query or the filters argument) restrict the candidates.
+        A query with only filters returns the newest matching posts.
+
+        Parameters:
+        - query (str): The query string.
+        - filters (dict, optional): Extra filters with the same keys as parse_query().
+        - limit (int): Maximum number of results.
+
+        Returns:
+        - pd.DataFrame: Columns 'id_original' and 'score', best match first.
+        """
+        terms, phrases, query_filters = parse_query(query)
+        filters = {**query_filters, **{k: v for k, v in (filters or {}).items() if v not in (None, [], '')}}
+        scoring_terms = list(dict.fromkeys(terms + [term for phrase in phrases for term in phrase]))
+
+        # Corpus statistics across all segments
+        n_docs = self.num_docs
+        if n_docs == 0:
+            return pd.DataFrame({'id_original': [], 'score': []})
+        avgdl = max(1.0, sum(int(segment.doc_len.sum()) for segment in self.segments) / n_docs)
+        idf = {}
+        for term in scoring_terms:
+            df_t = sum(len(segment.postings(term)[0]) for segment in self.segments)
+            idf[term] = np.log(1 + (n_docs - df_t + 0.5) / (df_t + 0.5))
+
+        ids, scores = [], []
+        for segment in self.segments:
+            if scoring_terms:
+                doc_parts, score_parts = [], []
+                for term in scoring_terms:
+                    docs, tf, _ = segment.postings(term)
+                    if len(docs) == 0:
+                        continue
+                    norm = K1 * (1 - B + B * segment.doc_len[docs] / avgdl)
+                    doc_parts.append(docs)
+                    score_parts.append(idf[term] * tf * (K1 + 1) / (tf + norm))
+                if not doc_parts:
+                    continue
+                docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+                doc_scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+                for phrase in phrases:
+                    keep = np.isin(docs, segment.phrase_docs(phrase))
+                    docs, doc_scores = docs[keep], doc_scores[keep]
+            else:
+                # Filter-only query: newest first
+                docs = np.arange(len(segment.doc_len))
+                doc_scores = segment.created.view('int64').astype('float64')
+
+            mask = segment.filter_mask(docs, filters)
+            ids.append(segment.ids[docs[mask]])
+            scores.append(doc_scores[mask])
+
+        if not ids:
+            return pd.DataFrame({'id_original': [], 'score': []})
+        ids, scores = np.concatenate(ids), np.concatenate(scores)
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            ids, scores = ids[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return pd.DataFrame({'id_original': ids[order], 'score': scores[order]})
+
+    def save(self, index_dir=INDEX_DIR):
+        """
+        Writes segments that are not on disk yet.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        for i, segment in enumerate(self.segments):
+            prefix = os.path.join(index_dir, f'seg-{i:05d}')
+            if not os.path.exists(prefix + '.npz'):
+                segment.save(prefix)
+
+    @classmethod
+    def load(cls, index_dir=INDEX_DIR):
+        prefixes = sorted(path[:-len('.npz')] for path in glob.glob(os.path.join(index_dir, 'seg-*.npz')))
+        return cls([Segment.load(prefix) for prefix in prefixes])
+
+
+def build_index(store_path=STORE_PATH, index_dir=INDEX_DIR):
+    """
+    Builds the index from the whole feature store, replacing any existing index.
+    """
+    for path in glob.glob(os.path.join(index_dir, 'seg-*')):
+        os.remove(path)
+    index = SearchIndex()
+    index.add_documents(read_dataset(SOURCE_COLUMNS, store_path=store_path))
+    index.save(index_dir)
+    return index
+
+
+def update_index(batch_df, index_dir=INDEX_DIR):
+    """
+    Adds new posts to the persisted index as a new segment (no-op if no index was built yet).
+    """
+    if not glob.glob(os.path.join(index_dir, 'seg-*.npz')):
+        return None
+    index = SearchIndex.load(index_dir)
+    if index.add_documents(batch_df) is not None:
+        index.save(index_dir)
+    return index
+
+
+@st.cache_resource
+def _load_index_cached(index_dir, segment_files):
+    metrics.cache_miss('search_index')
+    return SearchIndex.load(index_dir)
+
+
+def load_search_index(index_dir=INDEX_DIR):
+    """
+    Loads the index for the app, building it on first use.
+
+    The cache is keyed on the segment files, so appended segments are picked up on
+    the next rerun.
+    """
+    segment_files = tuple(sorted(glob.glob(os.path.join(index_dir, 'seg-*.npz'))))
+    if not segment_files:
+        build_index(index_dir=index_dir)
+        segment_files = tuple(sorted(glob.glob(os.path.join(index_dir, 'seg-*.npz'))))
+    metrics.cache_request('search_index')
+    return _load_index_cached(index_dir, segment_files)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the post search index.")
+    parser.add_argument('query', nargs='?', help="Query to run against the index instead of building it")
+    parser.add_argument('--store', default=STORE_PATH, help="Feature store directory")
+    parser.add_argument('--index', default=INDEX_DIR, help="Index directory")
+    args = parser.parse_args()
+    if args.query:
+        print(SearchIndex.load(args.index).search(args.query).to_string(index=False))
+    else:
+        print(f"Indexed {build_index(args.store, args.index).num_docs} posts")
@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+# Persistent content-hash -> VADER compound score cache
+CACHE_PATH = './cleaned_data/sentiment_cache.sqlite'
+
+# Texts scored per worker task; inputs smaller than one batch are scored in-process
+BATCH_SIZE = 2000
+
+# One analyzer per process, created on first use
+_analyzer = None
+
+
+def _score_batch(texts):
+    global _analyzer
+    if _analyzer is None:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        _analyzer = SentimentIntensityAnalyzer()
+    return [_analyzer.polarity_scores(text)['compound'] for text in texts]
+
+
+def text_hash(text):
+    """
+    Returns the cache key of a text (SHA-1 of its UTF-8 bytes).
+    """
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _open_cache(cache_path):
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(cache_path)
+    conn.execute('CREATE TABLE IF NOT EXISTS scores (hash TEXT PRIMARY KEY, score REAL NOT NULL)')
+    return conn
+
+
+def _cached_scores(conn, hashes):
+    found = {}
+    hashes = list(hashes)
+    for start in range(0, len(hashes), 900):
+        chunk = hashes[start:start + 900]
+        placeholders = ','.join('?' * len(chunk))
+        found.update(conn.execute(f'SELECT hash, score FROM scores WHERE hash IN ({placeholders})', chunk))
+    return found
+
+
+def score_texts(texts, cache_path=CACHE_PATH, workers=None, batch_size=BATCH_SIZE):
+    """
+    Scores texts with VADER, scoring each distinct unseen text exactly once.
+
+    Texts are deduplicated, looked up in the persistent cache by content hash, and
+    only the misses are scored in batches across a process pool. Missing and empty
+    texts score 0, as in the notebook.
+
+    Parameters:
+    - texts (pd.Series): Texts to score.
+    - cache_path (str): SQLite cache file; None disables caching.
+    - workers (int, optional): Pool size; defaults to the number of CPUs.
+    - batch_size (int): Texts per worker task.
+
+    Returns:
+    - pd.Series: Compound scores aligned with texts.
+    """
+    texts = texts.astype('object').where(texts.notna(), '')
+    unique_texts = [text for text in pd.unique(texts) if text.strip()]
+    hashes = {text: text_hash(text) for text in unique_texts}
+
+    conn = _open_cache(cache_path) if cache_path else None
+    known = _cached_scores(conn, set(hashes.values())) if conn else {}
+    missing = [text for text in unique_texts if hashes[text] not in known]
+
+    if missing:
+        batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+        if len(batches) == 1 or workers == 1:
+            results = list(map(_score_batch, batches))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_score_batch, batches))
+        new_scores = {}
+        for batch, scores in zip(batches, results):
+            new_scores.update((hashes[text], score) for text, score in zip(batch, scores))
+        known.update(new_scores)
+        if conn:
+            conn.executemany('INSERT OR REPLACE INTO scores (hash, score) VALUES (?, ?)', new_scores.items())
+            conn.commit()
+    if conn:
+        conn.close()
+
+    score_by_text = {text: known[hashes[text]] for text in unique_texts}
+    return texts.map(score_by_text).fillna(0.0).astype('float64')
+
+
+def add_sentiment(combined_df, cache_path=CACHE_PATH, workers=None):
+    """
+    Adds title_sentiment and selftext_sentiment (VADER compound scores).
+
+    Titles and selftexts are scored together, so text shared between a post and its
+    crossposts (or repeated across runs) is only scored once.
+
+    Parameters:
+    - combined_df (pd.DataFrame): Rows with title_original and selftext_original.
+    - cache_path (str): SQLite cache file; None disables caching.
+    - workers (int, optional): Process pool size.
+
+    Returns:
+    - pd.DataFrame: combined_df with the two sentiment columns.
+    """
+    n = len(combined_df)
+    texts = pd.concat([combined_df['title_original'], combined_df['selftext_original']], ignore_index=True)
+    scores = score_texts(texts, cache_path, workers).to_numpy()
+    combined_df['title_sentiment'] = scores[:n]
+    combined_df['selftext_sentiment'] = scores[n:]
+    return combined_df
+
+
+if __name__ == "__main__":
+    from analysis.dataset import STORE_PATH, read_dataset
+
+    parser = argparse.ArgumentParser(description="Warm the sentiment cache from the feature store.")
+    parser.add_argument('--store', default=STORE_PATH, help="Feature store directory")
+    parser.add_argument('--cache', default=CACHE_PATH, help="SQLite sentiment cache")
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size")
+    args = parser.parse_args()
+    df = read_dataset(['title_original', 'selftext_original'], store_path=args.store)
+    add_sentiment(df, args.cache, args.workers)
+    print(f"Scored {len(df)} rows")
@@ -0,0 +1,193 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+import streamlit as st
+from analysis.dataset import STORE_PATH, read_dataset
+from analysis.search import tokenize
+from analysis import metrics
+
+# Per-(day, subreddit, reliability) heavy-hitter term sketches of post titles
+TERMS_PATH = './cleaned_data/term_sketches.parquet'
+
+# Counters kept per cell: memory is at most cells x CAPACITY counters however many titles
+# are ingested, and the number of cells grows with the distinct (day, subreddit) pairs
+CAPACITY = 100
+
+CELL_KEYS = ['day', 'subreddit', 'is_unreliable_domain']
+
+SOURCE_COLUMNS = ['id_original', 'created_utc_original', 'subreddit_original', 'is_unreliable_domain', 'title_original']
+
+# Common English words left out of the counts (the word clouds' default stopwords, condensed)
+STOPWORDS = set("""
+a about above after again against all am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just let me more most my myself no nor not now of off on once only or
+other our ours ourselves out over own same she should so some such than that the their theirs them themselves then
+there these they this those through to too under until up very was we were what when where which while who whom why
+will with would you your yours yourself yourselves also get got like one says said new via re s t don amp
+""".split())
+
+
+def title_terms(titles):
+    """
+    Tokenizes titles into counted terms (lowercase words of 2+ characters, stopwords removed).
+    """
+    return [[token for token in tokenize(title) if len(token) > 1 and token not in STOPWORDS] for title in titles]
+
+
+def _truncate(sketch, capacity):
+    # Keep the `capacity` heaviest terms of every cell (ties broken by term for determinism)
+    sketch = sketch.sort_values(CELL_KEYS + ['count', 'term'], ascending=[True, True, True, False, True], kind='stable')
+    rank = sketch.groupby(CELL_KEYS, observed=True, sort=False).cumcount()
+    return sketch[rank < capacity].reset_index(drop=True)
+
+
+def build_sketches(df, capacity=CAPACITY):
+    """
+    Counts the title terms of a batch of posts per (day, subreddit, reliability) cell.
+
+    Each cell is a SpaceSaving summary of at most `capacity` counters, each with a
+    count and an error: the term's true count lies in [count - error, count]. A batch
+    is counted exactly, so its kept counters have no error; terms that did not fit are
+    dropped, and none of them can be more frequent than the smallest kept count.
+
+    Parameters:
+    - df (pd.DataFrame): Feature rows with SOURCE_COLUMNS (one entry per post is counted).
+    - capacity (int): Counters per cell.
+
+    Returns:
+    - pd.DataFrame: Columns day, subreddit, is_unreliable_domain, term, count, error.
+    """
+    posts = df.drop_duplicates('id_original')
+    posts = posts[posts['title_original'].notna() & posts['created_utc_original'].notna()]
+    terms = pd.Series(title_terms(posts['title_original'].astype('object')), index=posts.index, name='term')
+    exploded = pd.DataFrame({
+        'day': pd.to_datetime(posts['created_utc_original']).dt.normalize(),
+        'subreddit': posts['subreddit_original'].astype('string'),
+        'is_unreliable_domain': posts['is_unreliable_domain'].fillna(False).astype(bool),
+    }).join(terms).explode('term').dropna(subset=['term', 'subreddit'])
+    sketch = exploded.groupby(CELL_KEYS + ['term'], observed=True, sort=False).size().rename('count').reset_index()
+    sketch['error'] = 0
+    return _typed(_truncate(sketch, capacity))
+
+
+def _typed(sketch):
+    sketch['day'] = sketch['day'].astype('datetime64[ns]')
+    sketch['subreddit'] = sketch['subreddit'].astype('string').astype('category')
+    sketch['term'] = sketch['term'].astype('string')
+    sketch['count'] = sketch['count'].astype('int64')
+    # Sketches built before error counters were kept are exact up to their truncation
+    sketch['error'] = sketch['error'].astype('int64') if 'error' in sketch else np.int64(0)
+    return sketch
+
+
+def _floors(sketch, capacity):
+    # Upper bound on the count of any term a cell does not hold: its smallest count once
+    # the cell is full, 0 while it still has free counters
+    cells = sketch.groupby(CELL_KEYS, observed=True, sort=False)['count'].agg(['min', 'size'])
+    return cells['min'].where(cells['size'] >= capacity, 0).rename('floor').reset_index()
+
+
+def merge_sketches(sketch, other, capacity=CAPACITY):
+    """
+    Merges two sketch tables cell by cell, as mergeable SpaceSaving summaries.
+
+    A term missing from one side gets that cell's floor (its smallest count when full)
+    added to both its count and its error; the `capacity` heaviest counters are kept.
+    """
+    sides = []
+    for side in (_typed(sketch.copy()), _typed(other.copy())):
+        side = side.astype({'subreddit': 'string'})
+        sides.append((side, _floors(side, capacity)))
+    (left, left_floors), (right, right_floors) = sides
+
+    merged = left.merge(right, on=CELL_KEYS + ['term'], how='outer', suffixes=('_left', '_right'))
+    merged = merged.merge(left_floors.rename(columns={'floor': 'floor_left'}), on=CELL_KEYS, how='left')
+    merged = merged.merge(right_floors.rename(columns={'floor': 'floor_right'}), on=CELL_KEYS, how='left')
+    for name in ('left', 'right'):
+        floor = merged[f'floor_{name}'].fillna(0)
+        merged[f'count_{name}'] = merged[f'count_{name}'].fillna(floor)
+        merged[f'error_{name}'] = merged[f'error_{name}'].fillna(floor)
+    merged['count'] = merged['count_left'] + merged['count_right']
+    merged['error'] = merged['error_left'] + merged['error_right']
+    return _typed(_truncate(merged[CELL_KEYS + ['term', 'count', 'error']], capacity))
+
+
+def build_term_sketches(store_path=STORE_PATH, terms_path=TERMS_PATH):
+    """
+    Builds the sketches from the whole feature store.
+    """
+    sketch = build_sketches(read_dataset(SOURCE_COLUMNS, store_path=store_path))
+    os.makedirs(os.path.dirname(terms_path) or '.', exist_ok=True)
+    sketch.to_parquet(terms_path, index=False)
+    return sketch
+
+
+def update_term_sketches(batch_df, terms_path=TERMS_PATH):
+    """
+    Merges the title terms of newly appended rows into the stored sketches (no-op if
+    they were not built yet).
+    """
+    if not os.path.exists(terms_path):
+        return None
+    sketch = merge_sketches(pd.read_parquet(terms_path), build_sketches(batch_df))
+    sketch.to_parquet(terms_path, index=False)
+    return sketch
+
+
+@st.cache_resource
+def _load_sketches_cached(terms_path, mtime):
+    metrics.cache_miss('term_sketches')
+    return pd.read_parquet(terms_path)
+
+
+def load_term_sketches(terms_path=TERMS_PATH):
+    """
+    Loads the sketches for the app, building them on first use; reloaded after updates.
+    """
+    if not os.path.exists(terms_path):
+        build_term_sketches(terms_path=terms_path)
+    metrics.cache_request('term_sketches')
+    return _load_sketches_cached(terms_path, os.path.getmtime(terms_path))
+
+
+def top_terms(sketch, subreddits=None, start=None, end=None, reliability=None, k=100):
+    """
+    Merges the cells matching a filter selection and returns the heaviest terms.
+
+    Counts are the sums of the per-cell counts (upper bounds, see build_sketches());
+    a cell that dropped a term contributes nothing for it.
+
+    Parameters:
+    - sketch (pd.DataFrame): Sketch table from load_term_sketches().
+    - subreddits (list of str, optional): Subreddits to keep; empty or None keeps all.
+    - start, end (date, optional): Inclusive day range.
+    - reliability (bool, optional): True for unreliable domains only, False for reliable only.
+    - k (int): Number of terms.
+
+    Returns:
+    - pd.Series: Term -> merged count, most frequent first.
+    """
+    mask = np.ones(len(sketch), dtype=bool)
+    if subreddits:
+        mask &= sketch['subreddit'].isin(subreddits).to_numpy()
+    if start is not None:
+        mask &= (sketch['day'] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (sketch['day'] <= pd.Timestamp(end)).to_numpy()
+    if reliability is not None:
+        mask &= (sketch['is_unreliable_domain'] == reliability).to_numpy()
+    counts = sketch.loc[mask].groupby('term', observed=True, sort=False)['count'].sum()
+    return counts.nlargest(k)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the title term sketches and print the top terms.")
+    parser.add_argument('--store', default=STORE_PATH, help="Feature store directory")
+    parser.add_argument('--terms', default=TERMS_PATH, help="Output file")
+    args = parser.parse_args()
+    sketch = build_term_sketches(args.store, args.terms)
+    print(f"{len(sketch)} counters over {len(sketch.groupby(CELL_KEYS, observed=True))} cells")
+    for unreliable in (False, True):
+        print("Unreliable" if unreliable else "Reliable", top_terms(sketch, reliability=unreliable, k=10).to_dict())
@@ -0,0 +1 @@
+"""Benchmarks of the data pipeline and pages on seeded synthetic Reddit data."""
@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Modules imported when the app process starts and when the dashboard is first shown,
+# with their import-time budgets in seconds (best of --repeat fresh interpreters)
+SCENARIOS = {
+    'cold_start': ['main'],
+    'dashboard': ['main', 'pages.dashboard'],
+    'posts': ['main', 'pages.posts'],
+    'chat_bot': ['main', 'pages.chat_bot'],
+    'post_details': ['main', 'pages.post_details'],
+}
+BUDGETS = {'cold_start': 1.5, 'dashboard': 2.0}
+
+# Heavy libraries that only the chatbots (once asked a question) or optional features need;
+# no scenario may import them, so opening a chatbot page does not load LangChain before
+# a question is asked
+DEFERRED = [
+    'langchain', 'langchain_core', 'langchain_experimental', 'langchain_google_genai',
+    'sentence_transformers', 'torch', 'wordcloud',
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+seconds = time.perf_counter() - start
+deferred = sorted({{name.split('.')[0] for name in sys.modules}} & set({deferred!r}))
+print(json.dumps({{'seconds': seconds, 'modules': len(sys.modules), 'deferred': deferred}}))
+"""
+
+
+def measure_imports(modules, repeat=3):
+    """
+    Imports modules in fresh interpreters (from the repository root) and times them.
+
+    Parameters:
+    - modules (list of str): Modules imported in order.
+    - repeat (int): Number of interpreters; the fastest run is kept.
+
+    Returns:
+    - dict: seconds (best run), modules (number loaded) and deferred (heavy libraries
+      that ended up imported).
+    """
+    runs = []
+    for _ in range(repeat):
+        probe = _PROBE.format(modules=list(modules), deferred=DEFERRED)
+        output = subprocess.run(
+            [sys.executable, '-c', probe], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run['seconds'])
+
+
+def slowest_imports(modules, top=10):
+    """
+    Lists the slowest top-level imports under modules, from python -X importtime.
+
+    Returns:
+    - list of tuple(str, float): Module name and cumulative seconds, slowest first.
+    """
+    probe = '; '.join(f'import {name}' for name in modules)
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', probe], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stderr
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Only modules imported directly by the measured modules (one level of nesting)
+        if len(name) - len(name.lstrip()) <= 3:
+            timings.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(timings, key=lambda timing: -timing[1])[:top]
+
+
+def check_budgets(results, budgets=BUDGETS):
+    """
+    Returns one message per scenario over its budget (if it has one) or importing a
+    deferred library.
+    """
+    failures = []
+    for scenario, result in results.items():
+        budget = budgets.get(scenario)
+        if budget is not None and result['seconds'] > budget:
+            failures.append(f"{scenario}: imports took {result['seconds']:.2f}s (budget {budget:.2f}s)")
+        if result['deferred']:
+            failures.append(f"{scenario}: imports {', '.join(result['deferred'])}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure app import times and check them against budgets.")
+    parser.add_argument('--repeat', type=int, default=3, help="Fresh interpreters per scenario; the fastest is kept")
+    parser.add_argument('--top', type=int, default=0, help="Also list the slowest imports of each scenario")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiply the budgets (e.g. for slow CI machines)")
+    args = parser.parse_args()
+
+    print(f"Budget scale: {args.scale:g}")
+    results = {}
+    for scenario, modules in SCENARIOS.items():
+        results[scenario] = measure_imports(modules, args.repeat)
+        result = results[scenario]
+        budget = BUDGETS.get(scenario)
+        print(f"{scenario:<13} {result['seconds']:7.3f}s {result['modules']:6d} modules"
+              + (f"  (budget {budget * args.scale:.2f}s = {budget:.2f}s x {args.scale:g})" if budget else "")
+              + (f"  deferred: {', '.join(result['deferred'])}" if result['deferred'] else ""))
+        if args.top:
+            for name, seconds in slowest_imports(modules, args.top):
+                print(f"    {seconds:7.3f}s  {name}")
+
+    failures = check_budgets(results, {scenario: budget * args.scale for scenario, budget in BUDGETS.items()})
+    for message in failures:
+        print("OVER BUDGET", message)
+    if failures:
+        sys.exit(1)
+    print("All import budgets met")
@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import threading
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import SIZES, write_dump
+
+# A stage regresses when it is slower (or uses more memory) than the baseline by more
+# than the threshold and by more than the absolute slack, which absorbs timer noise
+THRESHOLD = 0.25
+MIN_SECONDS_DELTA = 0.05
+MIN_MEMORY_DELTA_MB = 5.0
+
+# Questions asked in the chatbot benchmark: routed aggregates and retrieval + LLM turns
+CHAT_QUESTIONS = [
+    "How many posts per subreddit?",
+    "What are the top 10 domains by average score?",
+    "What are people saying about the border?",
+    "Which posts discuss the supreme court ruling?",
+    "Summarize the debate coverage",
+]
+
+PAGE_SIZE = 25
+PAGES_RENDERED = 20
+SEARCH_QUERIES = ['election', 'supreme court', '"border crisis"', 'trump subreddit:politics', 'climate after:2024-10-01']
+
+
+def _rss_mb():
+    # Resident set size of this process (Linux /proc; None elsewhere)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+class MemorySampler(threading.Thread):
+    """
+    Samples the process RSS on a background thread and keeps the peak.
+    """
+
+    def __init__(self, interval=0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.start_mb = self.peak_mb = _rss_mb()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            rss = _rss_mb()
+            if rss is not None and rss > self.peak_mb:
+                self.peak_mb = rss
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        rss = _rss_mb()
+        if rss is not None:
+            self.peak_mb = max(self.peak_mb, rss)
+        return self.peak_mb - self.start_mb
+
+
+def measure(fn, memory=True):
+    """
+    Runs fn once and returns its result, wall time and peak memory growth.
+
+    Parameters:
+    - fn (callable): The step to run.
+    - memory (bool): Sample the process RSS while fn runs.
+
+    Returns:
+    - tuple(object, float, float): The result, seconds, and the peak RSS above the RSS
+      at the start in MB (None without sampling or off Linux).
+    """
+    sampler = MemorySampler() if memory and _rss_mb() is not None else None
+    if sampler:
+        sampler.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+        seconds = time.perf_counter() - start
+    finally:
+        growth = sampler.stop() if sampler else None
+    return result, seconds, growth
+
+
+def stage_ingest(context):
+    from analysis.ingest import ingest
+    stats = ingest(context['dump'], context['ingest_dir'])
+    return stats['posts']
+
+
+def stage_features(context):
+    from analysis.features import append_from_ingest
+    return append_from_ingest(context['ingest_dir'], context['store'])
+
+
+def stage_load(context):
+    # What load_posts() does on a cold cache, including publishing the memory-mapped snapshot
+    from analysis.dataset import attach_snapshot, publish_snapshot
+    from analysis.post_index import PostLookup, build_orderings
+    snapshot_path = publish_snapshot(context['store'], os.path.join(context['workdir'], 'snapshots'))
+    df = attach_snapshot(snapshot_path)
+    lookup = PostLookup(df)
+    context['posts'] = (df, lookup, build_orderings(df, lookup))
+    return len(df)
+
+
+def stage_posts_page(context):
+    from analysis.post_index import page_rows
+    from pages.posts import post_list_html
+    df, _, orderings = context['posts']
+    size = 0
+    for ordering in orderings.values():
+        for page in range(PAGES_RENDERED):
+            size += len(post_list_html(page_rows(df, ordering, page, PAGE_SIZE), page * PAGE_SIZE))
+    return size
+
+
+def stage_search(context):
+    from analysis.search import build_index
+    from analysis.post_index import rows_for_ids
+    from pages.posts import post_list_html, SEARCH_LIMIT
+    df, lookup, _ = context['posts']
+    index = build_index(store_path=context['store'], index_dir=os.path.join(context['workdir'], 'search_index'))
+    matches = 0
+    for query in SEARCH_QUERIES:
+        results = index.search(query, limit=SEARCH_LIMIT)
+        post_list_html(rows_for_ids(df, lookup, results['id_original']), 0)
+        matches += len(results)
+    return matches
+
+
+def stage_chat_turn(context):
+    from analysis.llm import AnswerCache, StubAgent, stream_answer
+    from analysis.llm_executor import LLMExecutor
+    from analysis.retrieval import build_index, context_rows
+    from analysis.post_index import rows_for_ids
+    from analysis.router import route, PLAN_COLUMNS
+    df, lookup, _ = context['posts']
+    index = build_index(store_path=context['store'], index_dir=os.path.join(context['workdir'], 'retrieval_index'), embedder='hashing')
+    executor = LLMExecutor(requests_per_minute=1e6, burst=1000)
+    cache = AnswerCache(path=os.path.join(context['workdir'], 'llm_cache.sqlite'))
+    agent = StubAgent(df)
+    posts = df[PLAN_COLUMNS].iloc[lookup.first_rows()]
+    answered = 0
+    for question in CHAT_QUESTIONS:
+        plan = route(question)
+        if plan is not None:
+            plan.execute(posts)
+        else:
+            hits = index.query(question, 20)
+            rows = rows_for_ids(df, lookup, hits['id_original'])
+            prompt = f"Dataset rows:\n{context_rows(rows)}\nQuestion: {question}"
+            if cache.get(question, 'bench') is None:
+                job = executor.submit(lambda: stream_answer(agent, prompt))
+                cache.put(question, 'bench', ''.join(job.iter_text()))
+        answered += 1
+    executor.close()
+    return answered
+
+
+# Stage name -> function; stages run in this order and share one context
+STAGES = {
+    'ingest': stage_ingest,
+    'features': stage_features,
+    'load': stage_load,
+    'posts_page': stage_posts_page,
+    'search': stage_search,
+    'chat_turn': stage_chat_turn,
+}
+
+
+def _commit():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_size(size, seed=0, memory=True, workdir=None, keep=False):
+    """
+    Generates a dataset of one size and runs every stage on it.
+
+    All artifacts (dump, ingested partitions, store, indexes, caches) are written
+    under a fresh working directory, which is removed afterwards unless keep is set.
+
+    Returns:
+    - list of dict: One result per stage with size, seconds, memory_mb (peak RSS growth)
+      and rows.
+    """
+    n_posts = SIZES.get(str(size).lower()) or int(size)
+    workdir = workdir or tempfile.mkdtemp(prefix=f'bench-{size}-')
+    os.makedirs(workdir, exist_ok=True)
+    previous_dir = os.getcwd()
+    results = []
+    try:
+        # The pipeline's default paths (./cleaned_data/...) resolve inside the working directory
+        os.chdir(workdir)
+        context = {
+            'workdir': workdir,
+            'dump': os.path.join(workdir, 'dump.jsonl'),
+            'ingest_dir': os.path.join(workdir, 'cleaned_data', 'raw'),
+            'store': os.path.join(workdir, 'cleaned_data', 'combined_df_after_fe'),
+        }
+        _, seconds, _ = measure(lambda: write_dump(context['dump'], n_posts, seed), memory=False)
+        print(f"[{size}] generated {n_posts} posts in {seconds:.1f}s", file=sys.stderr)
+        for name, stage in STAGES.items():
+            rows, seconds, memory = measure(lambda: stage(context), memory=memory)
+            results.append({
+                'stage': name, 'size': str(size), 'posts': n_posts, 'seconds': round(seconds, 4),
+                'memory_mb': round(memory, 1) if memory is not None else None, 'rows': int(rows),
+            })
+            print(f"[{size}] {name:<12} {seconds:9.3f}s" + (f" {memory:9.1f} MB" if memory is not None else ""), file=sys.stderr)
+    finally:
+        os.chdir(previous_dir)
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def best_of(runs):
+    """
+    Merges repeated runs of the same stages, keeping the lowest time of each. Memory
+    comes from the first run, since freed memory is kept by the process afterwards.
+    """
+    best = {}
+    for result in (result for run in runs for result in run):
+        key = (result['stage'], result['size'])
+        if key not in best:
+            best[key] = dict(result, runs=0)
+        best[key]['runs'] += 1
+        best[key]['seconds'] = min(best[key]['seconds'], result['seconds'])
+    return list(best.values())
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    Compares results with a baseline run.
+
+    Returns:
+    - list of str: One message per regressed (stage, size) metric; empty if none regressed.
+    """
+    previous = {(r['stage'], r['size']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        base = previous.get((result['stage'], result['size']))
+        if base is None:
+            continue
+        for metric, slack in (('seconds', MIN_SECONDS_DELTA), ('memory_mb', MIN_MEMORY_DELTA_MB)):
+            new, old = result.get(metric), base.get(metric)
+            if new is None or old is None:
+                continue
+            if new > old * (1 + threshold) and new - old > slack:
+                regressions.append(f"{result['stage']} [{result['size']}] {metric}: {old} -> {new} (+{(new / old - 1) if old else float('inf'):.0%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline and page benchmarks on synthetic data.")
+    parser.add_argument('--sizes', nargs='+', default=['10k'], help=f"Dataset sizes: {', '.join(SIZES)} or numbers of posts")
+    parser.add_argument('--seed', type=int, default=0, help="Generator seed")
+    parser.add_argument('--output', default='benchmark_results.json', help="Results file (JSON)")
+    parser.add_argument('--baseline', default=None, help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="Allowed relative slowdown / memory growth")
+    parser.add_argument('--no-memory', action='store_true', help="Skip RSS sampling (timings only)")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per size; the best time and the first run's memory are kept")
+    parser.add_argument('--workdir', default=None, help="Working directory (default: a temporary directory)")
+    parser.add_argument('--keep', action='store_true', help="Keep the generated data and artifacts")
+    args = parser.parse_args()
+
+    os.environ.setdefault('LLM_PROVIDER', 'stub')
+    output = os.path.abspath(args.output)
+    runs = []
+    for size in args.sizes:
+        workdir = os.path.join(args.workdir, size) if args.workdir else None
+        for _ in range(args.repeat):
+            if workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+            runs.append(run_size(size, args.seed, memory=not args.no_memory, workdir=workdir, keep=args.keep))
+    results = best_of(runs)
+
+    report = {
+        'commit': _commit(), 'created': pd.Timestamp.now(tz='UTC').isoformat(), 'seed': args.seed, 'repeat': args.repeat,
+        'memory_sampled': not args.no_memory, 'python': platform.python_version(), 'pandas': pd.__version__,
+        'numpy': np.__version__, 'machine': platform.machine(), 'results': results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for message in regressions:
+            print("REGRESSION", message)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}")
@@ -0,0 +1,179 @@
+import json
+import zlib
+import argparse
+import numpy as np
+
+# Named dataset sizes (number of posts)
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+# Records generated and written per batch
+BATCH_SIZE = 50_000
+
+# Head of the subreddit distribution; the tail is filled with generated names
+SUBREDDITS = [
+    'politics', 'news', 'worldnews', 'Conservative', 'Anarchism', 'Liberal', 'socialism', 'neoliberal',
+    'PoliticalDiscussion', 'democrats', 'Republican', 'Libertarian', 'moderatepolitics', 'Economics',
+    'europe', 'ukraine', 'geopolitics', 'law', 'environment', 'technology'
+]
+
+# Head of the link domain distribution (self posts use self.<subreddit>)
+DOMAINS = [
+    'i.redd.it', 'youtube.com', 'youtu.be', 'nytimes.com', 'washingtonpost.com', 'reuters.com', 'apnews.com',
+    'theguardian.com', 'cnn.com', 'foxnews.com', 'breitbart.com', 'newsmax.com', 'thehill.com', 'politico.com',
+    'bbc.co.uk', 'npr.org', 'huffpost.com', 'infowars.com', 'thegrayzone.com', 'v.redd.it', 'twitter.com',
+    'm.youtube.com', 'www.breitbart.com', 'redstate.com', 'bloomberg.com'
+]
+
+WORDS = """
+trump biden harris election vote voters ballot senate house congress court supreme ruling law bill
+policy tax economy inflation jobs war ukraine russia israel gaza china border immigration police protest
+climate energy oil gas health care abortion rights gun shooting campaign poll debate president governor
+state federal government report says new breaking video watch live update first after over against
+media news press freedom speech censorship workers union strike wage rent housing crisis market stocks
+democrats republicans party leader speaker justice department investigation trial indictment charges
+""".split()
+
+FLAIR_TYPES = ['text', 'richtext']
+POST_HINTS = ['link', 'image', 'hosted:video', 'rich:video', 'self']
+IMAGE_EXTENSIONS = ['jpg', 'png', 'gif']
+
+
+def _zipf_weights(n, exponent):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+class RedditGenerator:
+    """
+    Seeded generator of Reddit-shaped post records (listing items with a nested
+    crosspost_parent_list), with Zipf-skewed subreddits, authors, domains and words.
+
+    The same seed and size always produce the same records.
+    """
+
+    def __init__(self, n_posts, seed=0):
+        self.n_posts = n_posts
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        n_subreddits = max(len(SUBREDDITS), int(n_posts ** 0.5) // 4)
+        self.subreddits = np.array(SUBREDDITS + [f'sub_{i}' for i in range(n_subreddits - len(SUBREDDITS))])
+        self.subreddit_weights = _zipf_weights(len(self.subreddits), 1.1)
+        self.subscribers = (5_000_000 * self.subreddit_weights / self.subreddit_weights[0]).astype(np.int64) + 100
+        n_authors = max(100, n_posts // 8)
+        self.authors = np.array([f'user_{i:x}' for i in range(n_authors)])
+        self.author_weights = _zipf_weights(n_authors, 1.05)
+        self.domain_weights = _zipf_weights(len(DOMAINS), 0.9)
+        self.word_weights = _zipf_weights(len(WORDS), 1.0)
+        self.start = 1719792000  # 2024-07-01
+        self.span = 220 * 86400
+
+    def _titles(self, n):
+        lengths = self.rng.integers(5, 18, size=n)
+        words = self.rng.choice(len(WORDS), size=lengths.sum(), p=self.word_weights)
+        titles = np.split(words, np.cumsum(lengths)[:-1])
+        return [' '.join(WORDS[w] for w in title).capitalize() for title in titles]
+
+    def _timestamps(self, n):
+        # Uniform days with a diurnal peak around 16:00 UTC
+        days = self.rng.integers(0, self.span // 86400, size=n)
+        hours = np.clip(self.rng.normal(16, 5, size=n), 0, 23.99)
+        return self.start + days * 86400 + (hours * 3600).astype(np.int64)
+
+    def _base_record(self, post_id, subreddit, subscribers, author, created, title, domain, ups, comments):
+        is_self = domain.startswith('self.')
+        record = {
+            'subreddit': subreddit, 'title': title, 'author': author, 'created_utc': float(created), 'id': post_id,
+            'subreddit_id': f't5_{zlib.crc32(subreddit.encode()) % 10 ** 6:x}', 'subreddit_subscribers': int(subscribers),
+            'permalink': f'/r/{subreddit}/comments/{post_id}/', 'ups': int(ups), 'downs': 0, 'score': int(ups),
+            'upvote_ratio': round(float(self.rng.uniform(0.5, 1.0)), 2), 'num_comments': int(comments),
+            'total_awards_received': int(self.rng.random() < 0.02), 'is_self': is_self,
+            'is_video': domain == 'v.redd.it', 'domain': domain, 'author_fullname': f't2_{author}',
+            'author_flair_type': FLAIR_TYPES[int(self.rng.random() < 0.1)], 'author_premium': bool(self.rng.random() < 0.05),
+            'author_patreon_flair': False, 'author_flair_richtext': [], 'pwls': 6, 'wls': 6,
+            'selftext': title.lower() * int(self.rng.integers(1, 5)) if is_self else '',
+            'thumbnail_width': 140, 'thumbnail_height': 78, 'link_flair_css_class': None,
+            'media_embed': {}, 'secure_media_embed': {},
+        }
+        if is_self:
+            record['url'] = f'https://www.reddit.com{record["permalink"]}'
+            record['post_hint'] = 'self'
+        else:
+            if domain in ('youtube.com', 'youtu.be', 'm.youtube.com'):
+                video = ''.join(self.rng.choice(list('abcdefghijklmnopqrstuvwxyzABCDEFGHIJ0123456789_-'), 11))
+                url = f'https://youtu.be/{video}' if domain == 'youtu.be' else f'https://{domain}/watch?v={video}'
+            elif domain == 'i.redd.it':
+                url = f'https://i.redd.it/{post_id}.{IMAGE_EXTENSIONS[int(self.rng.integers(0, 3))]}'
+            else:
+                url = f'https://{domain}/{created % 9973}/{title.lower().replace(" ", "-")[:60]}'
+            record['url'] = record['url_overridden_by_dest'] = url
+            record['post_hint'] = POST_HINTS[int(self.rng.integers(0, 4))]
+            record['preview'] = {'enabled': True, 'images': [{'source': {'url': url, 'width': 640, 'height': 360}, 'resolutions': []}]}
+        return record
+
+    def batches(self, batch_size=BATCH_SIZE):
+        """
+        Yields lists of listing items ({"kind": "t3", "data": {...}}) covering all posts.
+        """
+        rng = self.rng
+        for start in range(0, self.n_posts, batch_size):
+            n = min(batch_size, self.n_posts - start)
+            subreddit_idx = rng.choice(len(self.subreddits), size=n, p=self.subreddit_weights)
+            authors = self.authors[rng.choice(len(self.authors), size=n, p=self.author_weights)]
+            created = self._timestamps(n)
+            titles = self._titles(n)
+            domain_idx = rng.choice(len(DOMAINS), size=n, p=self.domain_weights)
+            is_self = rng.random(n) < 0.3
+            ups = rng.pareto(1.2, size=n) * 10
+            comments = rng.pareto(1.4, size=n) * 5
+            n_crossposts = np.where(rng.random(n) < 0.15, rng.integers(1, 4, size=n), 0)
+
+            items = []
+            for i in range(n):
+                post_id = f'{start + i:07x}'
+                subreddit = self.subreddits[subreddit_idx[i]]
+                domain = f'self.{subreddit}' if is_self[i] else DOMAINS[domain_idx[i]]
+                title = titles[i]
+                # A small share of titles are reposts of an earlier title (coordinated posting)
+                if i > 10 and rng.random() < 0.02:
+                    title = titles[int(rng.integers(0, i))]
+                record = self._base_record(
+                    post_id, subreddit, self.subscribers[subreddit_idx[i]], authors[i], created[i], title, domain,
+                    ups[i], comments[i]
+                )
+                record['num_crossposts'] = int(n_crossposts[i])
+                crossposts = []
+                for j in range(n_crossposts[i]):
+                    target = self.subreddits[rng.choice(len(self.subreddits), p=self.subreddit_weights)]
+                    crossposts.append(self._base_record(
+                        f'{start + i:07x}x{j}', target, self.subscribers[0] // 10, self.authors[rng.integers(0, len(self.authors))],
+                        created[i] + int(rng.integers(60, 86400)), title, domain, ups[i] // 3, comments[i] // 3
+                    ))
+                record['crosspost_parent_list'] = crossposts
+                if crossposts:
+                    record['crosspost_parent'] = f't3_{crossposts[0]["id"]}'
+                items.append({'kind': 't3', 'data': record})
+            yield items
+
+
+def write_dump(path, n_posts, seed=0):
+    """
+    Writes a synthetic dump as JSON Lines, one listing item per line.
+
+    Returns:
+    - int: Number of posts written.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for items in RedditGenerator(n_posts, seed).batches():
+            f.write('\n'.join(json.dumps(item) for item in items))
+            f.write('\n')
+    return n_posts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic Reddit dump (JSON Lines).")
+    parser.add_argument('output', help="Output file")
+    parser.add_argument('--size', default='10k', help=f"One of {', '.join(SIZES)} or a number of posts")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    n_posts = SIZES.get(args.size.lower()) or int(args.size)
+    print(f"Wrote {write_dump(args.output, n_posts, args.seed)} posts to {args.output}")
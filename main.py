@@ -1,25 +1,83 @@
+import os
+import importlib
+import threading
 import streamlit as st
-import pages.posts as posts
-import pages.dashboard as dashboard
-import pages.chat_bot as chat_bot
+from analysis import metrics
 
-def main():            
+# Sidebar label -> module of the page. A page's module, and the heavy libraries it
+# needs, are imported the first time the page is shown, not when the app starts.
+PAGES = {
+    "Dashboard": "pages.dashboard",
+    "Posts": "pages.posts",
+    "CSV Chat bot": "pages.chat_bot",
+}
+DETAILS_PAGE = "pages.post_details"
+
+# Imported on a background thread once the first page has been drawn, so later page
+# visits and the first chatbot question do not wait for them (APP_PREWARM=0 disables)
+PREWARM = os.getenv('APP_PREWARM', '1').lower() not in ('0', 'false', 'no')
+PREWARM_MODULES = list(PAGES.values()) + [
+    DETAILS_PAGE, 'langchain.prompts', 'langchain.agents', 'langchain_experimental.agents', 'langchain_google_genai'
+]
+
+
+def _prewarm_imports():
+    for name in PREWARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+@st.cache_resource
+def prewarm():
+    """
+    Starts importing the remaining pages and LLM libraries in the background, once per process.
+    """
+    thread = threading.Thread(target=_prewarm_imports, name='prewarm', daemon=True)
+    thread.start()
+    return thread
+
+
+def show_page(label, module_name):
+    with metrics.rerun(label):
+        with metrics.stage('import'):
+            page = importlib.import_module(module_name)
+        page.main()
+
+
+def home():
+    st.sidebar.title("Navigation")
+    selection = st.sidebar.radio("Page", list(PAGES), label_visibility="collapsed")
+    show_page(selection, PAGES[selection])
+
+
+def post_details():
+    show_page("Post details", DETAILS_PAGE)
+
+
+def main():
     # Set page title and layout
     st.set_page_config(
-        page_title="Reddit Analysis Dashboard", 
+        page_title="Reddit Analysis Dashboard",
         page_icon=":bar_chart:",
         layout="wide"
     )
-    
-    st.sidebar.title("Navigation")
-    selection = st.sidebar.radio("", ["Dashboard", "Posts", "CSV Chat bot"])
 
-    if selection == "Dashboard":
-        dashboard.main()
-    elif selection == "Posts":
-        posts.main()
-    else:
-        chat_bot.main()
+    # Prometheus exporter (once per process) when APP_METRICS and APP_METRICS_PORT are set
+    metrics.start_exporter()
+
+    # Explicit routes replace the automatic discovery of the pages/ directory: the home
+    # page switches between the sidebar pages, and post links open /post_details?id=...
+    page = st.navigation([
+        st.Page(home, title="Reddit Analysis Dashboard", default=True),
+        st.Page(post_details, title="Post Details", url_path="post_details"),
+    ], position="hidden")
+    page.run()
+
+    metrics.admin_panel()
+    if PREWARM:
+        prewarm()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,41 +1,66 @@
-import pandas as pd
-import os
 import streamlit as st
-from langchain.agents import AgentType
-from langchain_experimental.agents import create_pandas_dataframe_agent
-from langchain_google_genai import ChatGoogleGenerativeAI 
-from langchain.prompts import ChatPromptTemplate  # Import the prompt template
+from analysis.dataset import dataset_version
+from analysis.post_index import load_posts, rows_for_ids
+from analysis.retrieval import load_retrieval_index, context_rows
+from analysis.llm import api_key_missing, get_agent
+from analysis.llm_executor import render_answer
+from analysis.router import route, PLAN_COLUMNS
+from analysis.metrics import stage
 
-def main():
-        
-    GOOGLE_API_KEY = os.getenv('GEMINI_API_KEY')
-    if not GOOGLE_API_KEY:
-        raise ValueError("Please set the GEMINI_API_KEY environment variable.")
+# Rows retrieved per question by default
+DEFAULT_TOP_K = 20
+
+# Shown when the retrieval index was not built ahead of time; open-ended questions need it
+RETRIEVAL_INDEX_MISSING = ("The retrieval index has not been built, so only aggregate questions can be answered. "
+                           "Build it with `python -m analysis.retrieval`.")
+
+
+def retrieve_rows(index, df, lookup, question, k):
+    """
+    Selects the k dataset rows most relevant to a question.
 
-    # Load CSV data from a static file path using caching to avoid reloading
-    @st.cache_data
-    def load_data():
-        return pd.read_csv('./cleaned_data/combined_df_after_fe_copy.csv')
+    Parameters:
+    - index (RetrievalIndex): Index from load_retrieval_index().
+    - df (pd.DataFrame): Dataset rows.
+    - lookup (PostLookup): Post id -> row positions over df.
+    - question (str): The user's question.
+    - k (int): Number of posts to retrieve.
 
+    Returns:
+    - pd.DataFrame: One row per retrieved post, most similar first.
+    """
+    hits = index.query(question, k)
+    return rows_for_ids(df, lookup, hits['id_original'])
+
+
+def main():
+        
     # Streamlit page title
     st.title("🤖 Chatbot for Reddit CSV")
-    st.markdown("<h6> ⚠️ Due to Gemini API rate limits, CSV data has been truncated..</h6>", unsafe_allow_html=True)
+    st.markdown("<h6> ℹ️ Each question is answered from the posts most relevant to it, retrieved from the whole dataset.</h6>", unsafe_allow_html=True)
+    top_k = st.sidebar.slider("Posts retrieved per question", min_value=5, max_value=50, value=DEFAULT_TOP_K, step=5)
 
     # Initialize chat history in streamlit session state
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
 
-    # Load the dataframe and store in session state if not already loaded
-    if "df" not in st.session_state:
-        st.session_state.df = load_data()
+    # Load the dataset and its post lookup (shared cache)
+    with stage('load'):
+        df, lookup, _ = load_posts()
+        index = load_retrieval_index()
+    if index is None:
+        st.info(RETRIEVAL_INDEX_MISSING)
 
     st.write("CSV Preview:")
-    st.dataframe(st.session_state.df.head())
+    st.dataframe(df.head())
 
     # Display chat history
-    for message in st.session_state.chat_history:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+    with stage('render'):
+        for message in st.session_state.chat_history:
+            with st.chat_message(message["role"]):
+                st.markdown(message["content"])
+                if message.get("table") is not None:
+                    st.dataframe(message["table"], hide_index=True)
 
     # Input field for user's message
     user_prompt = st.chat_input("Ask anything...")
@@ -44,8 +69,32 @@ def main():
         # Add user's message to chat history and display it
         st.chat_message("user").markdown(user_prompt)
         st.session_state.chat_history.append({"role": "user", "content": user_prompt})
-        
-        # Define the prompt template using ChatPromptTemplate
+
+        # Structured aggregate questions are answered locally from a restricted query plan
+        with stage('filter'):
+            plan = route(user_prompt)
+            # The plan reads a copy of its columns (one row per post); the shared frame is never modified
+            result = plan.execute(df[PLAN_COLUMNS].iloc[lookup.first_rows()]) if plan is not None else None
+        if plan is not None:
+            assistant_response = f"**{plan.describe()}**"
+            st.session_state.chat_history.append({"role": "assistant", "content": assistant_response, "table": result})
+            with st.chat_message("assistant"):
+                st.markdown(assistant_response)
+                st.dataframe(result, hide_index=True)
+                st.caption("Computed directly from the dataset")
+            return
+
+        # Open-ended questions go to the LLM
+        if api_key_missing():
+            raise ValueError("Please set the GEMINI_API_KEY environment variable.")
+        if index is None:
+            st.session_state.chat_history.append({"role": "assistant", "content": RETRIEVAL_INDEX_MISSING})
+            st.chat_message("assistant").markdown(RETRIEVAL_INDEX_MISSING)
+            return
+
+        # Define the prompt template using ChatPromptTemplate (langchain is only imported
+        # once an open-ended question is asked)
+        from langchain.prompts import ChatPromptTemplate
         qa_prompt = ChatPromptTemplate.from_template(
             """You are an expert data assistant tasked with answering questions about a specific dataset. Your role is to provide accurate, concise, and helpful responses based solely on the dataset rows provided below. You will be given:
             - One or more rows from the dataset, each containing fields such as Title, Content, Author, and Date.
@@ -69,30 +118,23 @@ def main():
             """
         )
 
-        # Retrieve the rows of the dataset as CSV text
-        retrieved_rows = st.session_state.df.head(1500).to_csv(index=False)
+        # Retrieve only the rows relevant to the question, as compact CSV text
+        with stage('filter'):
+            relevant_df = retrieve_rows(index, df, lookup, user_prompt, top_k)
+            retrieved_rows = context_rows(relevant_df)
         
         # Format the prompt with the retrieved rows and the user query
         formatted_prompt = qa_prompt.format(retrieved_rows=retrieved_rows, user_query=user_prompt)
         
-        # # Loading the Gemini LLM (Gemini 1.5 Flash)
-        llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0, google_api_key=GOOGLE_API_KEY)
-        
-        # llm = ChatOllama(model="llama2:latest", temperature=0)
-        
-        pandas_df_agent = create_pandas_dataframe_agent(
-            llm,
-            st.session_state.df,
-            verbose=True,
-            agent_type=AgentType.OPENAI_FUNCTIONS,
-            allow_dangerous_code=True
-        )
-        
-        # Invoke the agent using the formatted prompt
-        response = pandas_df_agent.invoke(formatted_prompt)
-        assistant_response = response["output"]
-        
-        # Append and display the assistant response
-        st.session_state.chat_history.append({"role": "assistant", "content": assistant_response})
-        with st.chat_message("assistant"):
-            st.markdown(assistant_response)
+        # One agent over the whole dataset per dataset version, reused across turns; it works
+        # on its own copy of the rows, built once with the agent
+        version = dataset_version()
+        pandas_df_agent = get_agent(f"csv:{version}", df)
+
+        # Stream the answer (cached answers depend on the dataset version and how many rows are retrieved)
+        with st.chat_message("assistant"), stage('llm'):
+            assistant_response = render_answer(
+                pandas_df_agent, formatted_prompt, user_prompt, scope=f"csv:{version}:k={top_k}"
+            )
+        if assistant_response is not None:
+            st.session_state.chat_history.append({"role": "assistant", "content": assistant_response})
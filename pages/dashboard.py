@@ -1,39 +1,157 @@
+import numpy as np
+import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-import streamlit.components.v1 as components
-import os
-import json
+from analysis.cube import load_cube, filter_cube, rollup, auto_resolution
+from analysis.plots import show_figure
+from analysis.graph import load_graph, spring_layout
+from analysis.terms import load_term_sketches, top_terms
+from analysis.duplicates import load_duplicate_index, WINDOW_HOURS
+from analysis.metrics import stage
 
-def main():
 
-    # Section navigation
-    st.sidebar.markdown("## Dashboard Sections")
-    sections = {
-        'Description': "#description",
-        'Time Patterns': "#time-patterns",
-        'Community Spread': "#community-spread",
-        'User Engagement': "#user-engagement",
-        'Author Behavior': "#author-behavior",
-        'Content Analysis': "#content-analysis"
-    }
-
-    for section, link in sections.items():
-        st.sidebar.markdown(f"[{section}]({link})", unsafe_allow_html=True)
-
-    # JavaScript for smooth scrolling
-    scroll_script = """
-    <script>
-        function scrollToSection(id) {
-            document.getElementById(id).scrollIntoView({ behavior: 'smooth' });
-        }
-    </script>
+def cube_filters(cube):
     """
-    st.markdown(scroll_script, unsafe_allow_html=True)
-
-    # Header and Introduction
-    st.title("Reddit Analysis Dashboard 🔎")
-
+    Renders the sidebar filters and returns the selected cube cells and time resolution.
+    """
+    st.sidebar.markdown("## Filters")
+    subreddits = st.sidebar.multiselect("Subreddits", sorted(cube['subreddit'].cat.categories))
+    first_day, last_day = cube['day'].min().date(), cube['day'].max().date()
+    date_range = st.sidebar.date_input("Date range", (first_day, last_day), min_value=first_day, max_value=last_day)
+    reliability = st.sidebar.radio("Domain reliability", ["All", "Reliable", "Unreliable"], horizontal=True)
+    resolution = st.sidebar.selectbox("Time resolution", ["Auto", "Day", "Week", "Month"])
+
+    # The date input returns a single date while the user is still picking the range
+    start, end = (date_range[0], date_range[-1]) if isinstance(date_range, (list, tuple)) else (date_range, date_range)
+    cells = filter_cube(
+        cube,
+        subreddits=subreddits,
+        start=start,
+        end=end,
+        reliability=None if reliability == "All" else reliability == "Unreliable"
+    )
+    resolution = auto_resolution(start, end) if resolution == "Auto" else resolution.lower()
+    return cells, resolution
+
+
+def daily_posting_trends_chart(cells, resolution):
+    trends = rollup(cells, ['period', 'is_unreliable_domain'], resolution)
+    fig = px.line(
+        trends, x='period', y='posts', color='is_unreliable_domain',
+        title=f'Posting Trends by Domain Reliability (per {resolution})',
+        labels={'period': 'Date', 'posts': 'Number of Posts', 'is_unreliable_domain': 'Unreliable Domain'}
+    )
+    fig.update_traces(mode='lines+markers')
+    return fig
+
+
+def posting_heatmap_chart(cells):
+    heatmap_data = rollup(cells, ['weekday', 'hour']).pivot_table(
+        index='weekday', columns='hour', values='posts', fill_value=0, observed=False
+    )
+    return px.imshow(
+        heatmap_data,
+        labels=dict(x='Hour of Day', y='Day of Week', color='Post Count'),
+        title='Heatmap of Posting Frequency by Hour and Day'
+    )
+
+
+def subreddit_frequency_chart(cells):
+    subreddit_counts = rollup(cells, ['subreddit']).sort_values('posts', ascending=False)
+    fig = px.bar(
+        subreddit_counts, x='subreddit', y='posts', title='Subreddit Frequency', color='subreddit',
+        labels={'subreddit': 'Subreddit', 'posts': 'Number of Posts'},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+    fig.update_layout(xaxis_tickangle=-45, showlegend=False)
+    fig.update_traces(hovertemplate='<b>%{x}</b><br>Posts: %{y}<extra></extra>')
+    return fig
+
+
+def top_unreliable_subs_chart(cells):
+    by_reliability = rollup(cells, ['subreddit', 'is_unreliable_domain'])
+    totals = by_reliability.groupby('subreddit', observed=True)['posts'].sum()
+    unreliable = by_reliability[by_reliability['is_unreliable_domain']].groupby('subreddit', observed=True)['posts'].sum()
+    proportion = (unreliable.reindex(totals.index, fill_value=0) / totals).sort_values(ascending=False).head(10)
+    unreliable_subs = proportion.rename('is_unreliable_domain').reset_index()
+    return px.bar(
+        unreliable_subs, x='subreddit', y='is_unreliable_domain',
+        title='Top Subreddits by Proportion of Unreliable Domains',
+        labels={'subreddit': 'Subreddit', 'is_unreliable_domain': 'Proportion Unreliable'},
+        color='is_unreliable_domain', color_continuous_scale='Reds'
+    )
+
+
+def engagement_rate_chart(cells, resolution):
+    engagement = rollup(cells, ['period', 'subreddit'], resolution)
+    engagement['engagement_rate'] = (engagement['ups_per_subscriber'] + engagement['comments_per_subscriber']) / engagement['posts']
+    return px.line(
+        engagement, x='period', y='engagement_rate', color='subreddit',
+        title=f'Engagement Rate by Subreddit (per {resolution})',
+        labels={'period': 'Date', 'engagement_rate': 'Engagement Rate', 'subreddit': 'Subreddit'}
+    )
+
+
+def avg_title_sentiment_chart(cells, resolution):
+    sentiment_trend = rollup(cells, ['period'], resolution)
+    sentiment_trend['avg_sentiment'] = sentiment_trend['title_sentiment'] / sentiment_trend['posts']
+    fig = px.line(
+        sentiment_trend, x='period', y='avg_sentiment',
+        title=f'Average Title Sentiment Over Time (per {resolution})',
+        labels={'period': 'Date', 'avg_sentiment': 'Average Sentiment'}
+    )
+    fig.update_traces(mode='lines+markers')
+    return fig
+
+
+def crosspost_network_chart(graph, node_ids, kind):
+    # Only the sampled nodes and the edges among them are laid out and sent to the browser
+    edges = graph.subgraph_edges(node_ids)
+    local = pd.Index(node_ids)
+    src, dst = local.get_indexer(edges['source_id']), local.get_indexer(edges['target_id'])
+    pos = spring_layout(len(node_ids), src, dst)
+
+    fig = go.Figure()
+    for unreliable, color, name in ((False, 'blue', 'Reliable'), (True, 'red', 'Unreliable')):
+        keep = (edges['unreliable'].to_numpy() > 0) == unreliable
+        edge_x = np.column_stack([pos[src[keep], 0], pos[dst[keep], 0], np.full(keep.sum(), np.nan)]).ravel()
+        edge_y = np.column_stack([pos[src[keep], 1], pos[dst[keep], 1], np.full(keep.sum(), np.nan)]).ravel()
+        fig.add_trace(go.Scatter(x=edge_x, y=edge_y, mode='lines', line=dict(width=1, color=color), hoverinfo='none', name=name))
+
+    degree = graph.out_degree[node_ids] + graph.in_degree[node_ids]
+    label = 'User' if kind == 'author' else 'Subreddit'
+    fig.add_trace(go.Scatter(
+        x=pos[:, 0], y=pos[:, 1], mode='markers', hoverinfo='text', showlegend=False,
+        marker=dict(size=6 + 24 * np.sqrt(degree / max(degree.max(), 1)), color=graph.pagerank[node_ids],
+                    colorscale='Viridis', line_width=1, colorbar=dict(title='PageRank')),
+        text=[f'{label}: {name}<br>Connections: {d}<br>PageRank: {pr:.4f}'
+              for name, d, pr in zip(graph.names[node_ids], degree, graph.pagerank[node_ids])]
+    ))
+    fig.update_layout(
+        title=f'Crosspost Connection Network ({len(node_ids)} of {len(graph)} nodes)',
+        xaxis=dict(visible=False), yaxis=dict(visible=False), height=600
+    )
+    return fig
+
+
+@st.cache_data(max_entries=32)
+def word_cloud_image(frequencies):
+    # Rendered from merged sketch counts, so it never re-reads titles
+    from wordcloud import WordCloud
+    return WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(dict(frequencies)).to_array()
+
+
+def top_terms_chart(terms, title):
+    fig = px.bar(
+        terms.head(25).iloc[::-1].rename_axis('term').reset_index(name='count'), x='count', y='term', orientation='h',
+        title=title, labels={'term': 'Term', 'count': 'Occurrences'}
+    )
+    fig.update_layout(height=600)
+    return fig
+
+
+def description_section():
     st.header("Description", anchor="description")
     st.markdown("""
     This dashboard examines Reddit posts across various communities. The analysis tracks posting patterns and content characteristics to provide insights into user behavior and discussion trends.
@@ -48,7 +166,8 @@ def main():
     - **Author Behavior**: Characteristics of users sharing unreliable content
     """, unsafe_allow_html=True)
 
-    # Section 1: Time Patterns
+
+def time_patterns_section(cells, resolution):
     st.header("Time Patterns", anchor="time-patterns")
 
     st.write("### Daily Posting Trends by Reliability")
@@ -58,19 +177,18 @@ def main():
         st.markdown("""Spikes in posting activity, particularly from unreliable sources, can indicate significant events to spread content.
                     For example, a surge in unreliable posts might align with a news cycle or coordinated campaign.""")
 
-    with open("plots/info_spread/daily_posting_trends.html", 'r', encoding="utf-8") as f:
-        components.html(f.read(), height=600, width=2000, scrolling=True)
-        
+    st.plotly_chart(daily_posting_trends_chart(cells, resolution), use_container_width=True)
+
     st.write("### Hourly Posting Heatmap")
     st.write("This heatmap visualizes posting frequency across days of the week and hours of the day, with darker shades representing higher activity.")
 
     with st.expander("📈 What does this data reveal?"):
         st.markdown("""Patterns such as increased posting during specific hours (e.g., 3-7 PM) could suggest activity or contributions from users in different time zones, hinting at coordinated behavior.""")
 
-    with open("plots/info_spread/posting_heatmap.html", 'r', encoding="utf-8") as f:
-        components.html(f.read(), height=600, width=2000, scrolling=True)    
+    st.plotly_chart(posting_heatmap_chart(cells), use_container_width=True)
+
 
-    # Section 2: Community Spread
+def community_spread_section(cells):
     st.header("Community Spread", anchor="community-spread")
     st.write("### Subreddit Frequency Distribution")
     st.write("This bar chart displays the number of posts across ten politically-focused subreddits.")
@@ -78,32 +196,26 @@ def main():
     with st.expander("📈 What does this data reveal?"):
             st.markdown("""Several major subreddits (neoliberal, politics, worldpolitics, socialism) show similar high post volumes of approximately 1,000 posts each, indicating these are primary hubs for political discourse. """)
 
-    with open("plots/subreddit/subreddit_frequency.html", 'r', encoding="utf-8") as f:
-        components.html(f.read(), height=600, width=2000, scrolling=True)
-        
-        
+    st.plotly_chart(subreddit_frequency_chart(cells), use_container_width=True)
+
     st.write("### Top Subreddits for Unreliable Content")
     st.write("This bar chart ranks the top 10 subreddits with the highest proportion of posts from unreliable domains.")
 
     with st.expander("📈 What does this data reveal?"):
             st.markdown("""Communities with taller bars (Republican, Conservative) are hotspots for unreliable content, making them prime candidates for monitoring or intervention. """)
 
-    with open("plots/subreddit/top_unreliable_subs.html", 'r', encoding="utf-8") as f:
-        components.html(f.read(), height=600, width=2000, scrolling=True)
-        
-        
+    st.plotly_chart(top_unreliable_subs_chart(cells), use_container_width=True)
+
     st.write("### Domain Frequency Analysis")
     st.write("This comprehensive three-panel visualization provides a detailed breakdown of content sources shared across political subreddits, comparing reliable and unreliable domains.")
 
     with st.expander("📈 What does this data reveal?"):
             st.markdown("""The dominance of "self." domains suggests Reddit users engage more with platform-native content rather than external sources, potentially indicating greater trust in community-generated content over traditional media.""")
 
-    with open("plots/engagement_analysis/top_domains_analysis.html", 'r', encoding="utf-8") as f:
-        components.html(f.read(), height=600, width=2000, scrolling=True)
-        
+    show_figure("engagement_analysis/top_domains_analysis")
 
 
-    # Section 3: User Engagement
+def user_engagement_section(cells, resolution):
     st.header("User Engagement", anchor="user-engagement")
     st.write("### Engagement rate of post by Subreddit")
     st.write("This multi-line chart tracks engagement rates across ten political subreddits over approximately seven months, with each community represented by a uniquely colored line.")
@@ -111,8 +223,7 @@ def main():
     with st.expander("📈 What does this data reveal?"):
             st.markdown("""While most communities maintained relatively stable engagement rates through 2024, nearly all experienced significant increases beginning in January 2025, with Liberal (blue), Republican (light blue), and neoliberal showing the most dramatic growth.""")
 
-    with open("plots/engagement_analysis/engagement_rate.html", 'r', encoding="utf-8") as f:
-        components.html(f.read(), height=600, width=2000, scrolling=True)
+    st.plotly_chart(engagement_rate_chart(cells, resolution), use_container_width=True)
 
     st.write("### Engagement Distribution")
     st.write('This violin plot displays the distribution of upvotes for posts from reliable domains (blue, labeled "false") and unreliable domains (orange, labeled "true"), with the width of each "violin" representing the frequency density at different upvote levels.')
@@ -120,9 +231,7 @@ def main():
     with st.expander("📈 What does this data reveal?"):
             st.markdown("""reliable domains achieve the highest absolute upvote counts (approximately 50,000), unreliable domains also demonstrate the capacity to reach substantial engagement peaks exceeding 30,000 upvotes. This suggests that while misleading content may not typically outperform reliable content, it can occasionally achieve viral popularity comparable to legitimate sources.""")
 
-    with open("plots/engagement_analysis/upvote_distribution.html", 'r', encoding="utf-8") as f:
-        components.html(f.read(), height=600, width=2000, scrolling=True)
-
+    show_figure("engagement_analysis/upvote_distribution")
 
     st.write("### Sentiment-Engagement Patterns")
     st.write("This scatter plot positions each post according to its title's sentiment score (x-axis, ranging from -1 for negative to +1 for positive) and the number of upvotes received (y-axis, ranging from 0 to approximately 50,000), with partial transparency to reveal density patterns where points overlap.")
@@ -130,12 +239,10 @@ def main():
     with st.expander("📈 What does this data reveal?"):
             st.markdown("""The visualization reveals that the highest-upvoted content (exceeding 40,000 upvotes) comes exclusively from reliable sources, with only one unreliable source post reaching approximately 35,000 upvotes. This suggests that while unreliable content can achieve significant engagement, the most viral content on the platform predominantly comes from trusted sources.""")
 
-    with open("plots/engagement_analysis/upvotes_vs_sentiment.html", 'r', encoding="utf-8") as f:
-        components.html(f.read(), height=600, width=2000, scrolling=True)
-
+    show_figure("engagement_analysis/upvotes_vs_sentiment")
 
 
-    # Section 4: Author Behavior
+def author_behavior_section():
     st.header("Author Behavior", anchor="author-behavior")
     st.write("### Crosspost Connection Network")
     st.write("This directed network graph represents Reddit users as nodes (circles) with size proportional to their connectivity degree (number of connections), represents the crosspost between different users")
@@ -143,9 +250,37 @@ def main():
     with st.expander("📈 What does this data reveal?"):
             st.markdown("""Several prominent users (represented by larger circles) dominate the network structure, particularly the largest node function as a primary content propagation center. We can clearly observe that there are very few instances of unreliable content being crossposted.""")
 
-    with open("plots/author_behavior/crosspost_network.html", 'r', encoding="utf-8") as f:
-        components.html(f.read(), height=600, width=2000, scrolling=True)
-
+    # The graph and its centralities are precomputed; the browser only gets a bounded sample
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col1:
+        kind = st.radio("Nodes", ["author", "subreddit"], format_func=str.title, horizontal=True)
+    with col2:
+        view = st.radio("View", ["Most central", "Ego network"], horizontal=True)
+    with col3:
+        max_nodes = st.slider("Max nodes", min_value=20, max_value=200, value=75, step=5)
+    graph = load_graph(kind)
+    if len(graph) == 0:
+        st.info("No crossposts in the dataset yet.")
+    else:
+        nodes = graph.nodes()
+        if view == "Ego network":
+            candidates = graph.top_nodes(200)
+            center = st.selectbox("Center", candidates, format_func=lambda node: graph.names[node])
+            radius = st.radio("Hops", [1, 2], horizontal=True)
+            node_ids = graph.ego(center, radius=radius, max_nodes=max_nodes)
+        else:
+            node_ids = graph.top_nodes(max_nodes)
+        st.plotly_chart(crosspost_network_chart(graph, node_ids, kind), use_container_width=True)
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Nodes", len(graph))
+        col2.metric("Edges", len(graph.edges))
+        col3.metric("Components", nodes['component'].nunique())
+        col4.metric("Largest component", f"{(nodes['component'] == 0).mean():.0%}")
+        st.dataframe(
+            nodes.nlargest(10, 'pagerank')[['name', 'degree', 'crossposts', 'pagerank', 'component']],
+            hide_index=True, use_container_width=True
+        )
 
     st.write("### User Contribution for unreliable content")
     st.write("This vertical bar chart ranks the top 10 authors by number of posts from unreliable domains")
@@ -153,14 +288,45 @@ def main():
     with st.expander("📈 What does this data reveal?"):
             st.markdown(""" The visualization reveals extreme concentration of unreliable content posting, with user "M_i_c_K" responsible for approximately 100 posts – roughly 5 times more than the second-highest contributor. """)
 
-    with open("plots/author_behavior/top_authors_posting_unreliable_domains.html", 'r', encoding="utf-8") as f:
-        components.html(f.read(), height=600, width=2000, scrolling=True)
-        
-        
-        
-        
-
-    # Section 5: Content Analysis
+    show_figure("author_behavior/top_authors_posting_unreliable_domains")
+
+
+def coordinated_posting_section():
+    st.header("Coordinated Posting", anchor="coordinated-posting")
+    st.write("### Near-duplicate post clusters")
+    st.write("This table lists the largest groups of posts with near-identical titles or the same link, found with MinHash signatures, together with the authors and subreddits involved and how far apart in time they were posted")
+
+    with st.expander("📈 How are clusters found?"):
+            st.markdown(f"""Each post is reduced to the word pairs of its title plus its normalized link. Posts whose sets overlap by about half or more are grouped together. A cluster is flagged as coordinated when several authors or subreddits posted it within {WINDOW_HOURS} hours.""")
+
+    index = load_duplicate_index()
+    clusters = index.clusters()
+    col1, col2 = st.columns(2)
+    with col1:
+        coordinated_only = st.checkbox("Coordinated clusters only", value=False)
+    with col2:
+        min_posts = st.slider("Minimum posts per cluster", min_value=2, max_value=20, value=2)
+    clusters = clusters[clusters['posts'] >= min_posts]
+    if coordinated_only:
+        clusters = clusters[clusters['coordinated']]
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Clusters", len(clusters))
+    col2.metric("Posts in clusters", int(clusters['posts'].sum()))
+    col3.metric("Coordinated", int(clusters['coordinated'].sum()))
+    if clusters.empty:
+        st.info("No near-duplicate clusters match the current settings.")
+        return
+    top = clusters.head(50)
+    st.dataframe(
+        top[['posts', 'authors', 'subreddits', 'spread_hours', 'first', 'title', 'top_subreddits', 'top_authors', 'coordinated']],
+        hide_index=True, use_container_width=True
+    )
+    cluster = st.selectbox("Show posts of cluster", top['cluster'], format_func=lambda label: top.set_index('cluster').at[label, 'title'])
+    st.dataframe(index.members(cluster), hide_index=True, use_container_width=True)
+
+
+def content_analysis_section(cells, resolution):
     st.header("Content Analysis", anchor="content-analysis")
     st.write("### Average title sentiment over time")
     st.write("This line chart plots average daily sentiment scores of post titles over time, the sentiment scale ranges from -1 (negative) to +1 (positive), with 0 representing neutral sentiment.")
@@ -168,9 +334,7 @@ def main():
     with st.expander("📈 What does this data reveal?"):
             st.markdown("""The most dramatic sentiment spikes occur in November 2024, potentially coinciding with the U.S. presidential election period, where sentiment rapidly oscillates between strongly positive and negative values within days.""")
 
-    with open("plots/text_and_sentiment/avg_title_sentiment_over_time.html", 'r', encoding="utf-8") as f:
-        components.html(f.read(), height=600, width=2000, scrolling=True)
-
+    st.plotly_chart(avg_title_sentiment_chart(cells, resolution), use_container_width=True)
 
     st.write("### Sentiment Distribution Patterns")
     st.write('This box plot displays the distribution of title sentiment scores for posts from reliable domains (blue, labeled "false") and unreliable domains (orange, labeled "true") on a scale from -1 (negative) to +1 (positive).')
@@ -178,12 +342,7 @@ def main():
     with st.expander("📈 What does this data reveal?"):
             st.markdown("""Both distributions show similar median values indicating similar sentiment bias across political content regardless of source reliability. This suggests that emotional tone analysis, would be insufficient as a standalone approach for identifying potential misinformation.""")
 
-    with open("plots/text_and_sentiment/title_sentiment.html", 'r', encoding="utf-8") as f:
-        components.html(f.read(), height=600, width=2000, scrolling=True)
-
-
-
-
+    show_figure("text_and_sentiment/title_sentiment")
 
     st.write("### Terminology Patterns")
     st.write(" This word cloud positions terms by frequency with size proportional to usage count.")
@@ -192,11 +351,57 @@ def main():
         with st.expander("📈 What does this data reveal?"):
             st.markdown(""""Trump" appears as one of the most dominant terms, significantly larger than "Biden," indicating disproportionate focus on the former president in political discussions from reliable sources. This asymmetric attention suggests that Trump continued to be a central figure in political discourse.""")
 
-        col1, col2= st.columns(2)
-        with col1:
-            st.write("#### Reliable domain wordcloud")
-            st.image("plots/text_and_sentiment/reliable_titles.png", use_container_width=True)
-        with col2:
-            st.write("#### Unreliable domain wordcloud")
-            st.image("plots/text_and_sentiment/unreliable_tiles.png", use_container_width=True)
-            
\ No newline at end of file
+        # Term counts are merged on demand from per-(day, subreddit, reliability) sketches,
+        # following the sidebar filters; only the reliabilities left by the filters are drawn
+        if cells.empty:
+            st.info("No titles match the current filters.")
+            return
+        view = st.radio("Show as", ["Word cloud", "Top terms"], horizontal=True)
+        sketch = load_term_sketches()
+        selection = dict(subreddits=list(cells['subreddit'].unique()), start=cells['day'].min(), end=cells['day'].max())
+        shown = [(unreliable, name) for unreliable, name in ((False, "Reliable"), (True, "Unreliable"))
+                 if (cells['is_unreliable_domain'] == unreliable).any()]
+        for col, (unreliable, name) in zip(st.columns(len(shown)), shown):
+            with col:
+                st.write(f"#### {name} domain wordcloud")
+                terms = top_terms(sketch, reliability=unreliable, k=150, **selection)
+                if terms.empty:
+                    st.info("No titles match the current filters.")
+                elif view == "Word cloud":
+                    st.image(word_cloud_image(tuple(terms.items())), use_container_width=True)
+                else:
+                    st.plotly_chart(top_terms_chart(terms, f"Top Terms in {name} Domain Titles"), use_container_width=True)
+
+
+# Section name -> renderer taking the filtered cube cells and time resolution
+SECTIONS = {
+    'Description': lambda cells, resolution: description_section(),
+    'Time Patterns': time_patterns_section,
+    'Community Spread': lambda cells, resolution: community_spread_section(cells),
+    'User Engagement': user_engagement_section,
+    'Author Behavior': lambda cells, resolution: author_behavior_section(),
+    'Coordinated Posting': lambda cells, resolution: coordinated_posting_section(),
+    'Content Analysis': content_analysis_section
+}
+
+
+def main():
+
+    # Section navigation: only the selected section is built and sent to the browser,
+    # unless "All sections" is chosen
+    st.sidebar.markdown("## Dashboard Sections")
+    selection = st.sidebar.radio("Section", ["All sections"] + list(SECTIONS), index=2, label_visibility="collapsed")
+    selected = list(SECTIONS) if selection == "All sections" else ['Description', selection]
+
+    # Live charts are computed from the pre-aggregated cube, never from raw rows
+    with stage('load'):
+        cube = load_cube()
+    with stage('filter'):
+        cells, resolution = cube_filters(cube)
+
+    # Header and Introduction
+    st.title("Reddit Analysis Dashboard 🔎")
+
+    with stage('render'):
+        for name in dict.fromkeys(selected):
+            SECTIONS[name](cells, resolution)
@@ -1,127 +1,13 @@
 import streamlit as st
 import pandas as pd
-from langchain.agents import AgentType
-from langchain_experimental.agents import create_pandas_dataframe_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate
-import os
-import urllib.parse
-
-# Get the post ID from query parameters
-query_params = st.query_params
-post_id = query_params.get("id")
-
-# Check if an ID was provided
-if not post_id:
-    st.error("No post ID provided.")
-    st.stop()
-
-# Cache the data loading for performance
-@st.cache_data
-def load_data():
-    return pd.read_csv('./cleaned_data/combined_df_after_fe_copy.csv')
-
-# Load the dataset
-df = load_data()
-
-# Filter to get the specific row based on id_original
-specific_row = df[df['id_original'] == post_id]
-
-# Check if the post exists
-if specific_row.empty:
-    st.error("Post not found.")
-    st.stop()
-
-# Extract the post as a single row (Series)
-post = specific_row.iloc[0]
-
-# Display post details
-st.title("📝 Post Details")
-st.write("---")
-st.markdown(f"### [{post['title_original']}](https://reddit.com/{post['permalink_original']})")
-
-# Check and display media from 'url_overridden_by_dest_original'
-url = post['url_overridden_by_dest_original']
-if pd.notna(url):
-    # Ensure the URL has a scheme (e.g., https://)
-    if not urllib.parse.urlparse(url).scheme:
-        url = 'https://' + url
-    parsed_url = urllib.parse.urlparse(url)
-    domain = parsed_url.netloc.lower()
-    path = parsed_url.path
-    extension = os.path.splitext(path)[1].lower()
-    
-    # List of common image extensions
-    image_extensions = ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.svg']
-    
-    # Check if the URL is an image
-    if extension in image_extensions:
-        st.markdown(
-            f'<img src="{url}" alt="Attached Image" style="max-width:400px; height:auto;">',
-            unsafe_allow_html=True
-        )
-    
-    # Check if the URL is a YouTube video
-    elif 'youtube.com' in domain or 'youtu.be' in domain:
-        video_id = None
-        if 'youtube.com' in domain and 'watch' in path:
-            query_params = urllib.parse.parse_qs(parsed_url.query)
-            video_id = query_params.get('v', [None])[0]
-        elif 'youtu.be' in domain:
-            video_id = path.strip('/').split('?')[0]
-        if video_id:
-            embed_url = f"https://www.youtube.com/embed/{video_id}"
-            st.video(embed_url)
-        else:
-            st.write(f"Unable to parse YouTube video ID. View externally: [Click here]({url})")
-    
-    # For all other URLs, provide a clickable link
-    else:
-        st.write(f"Attached media: [View here]({url})")
-
-# Display selftext if it exists and is not empty
-if pd.notna(post['selftext_original']) and post['selftext_original'].strip() != '':
-    st.write(post['selftext_original'])
-
-st.write("")
-st.write(f"**Author:** [{post['author_original']}](https://reddit.com/user/{post['author_original']})")
-st.write(f"**Date:** {post['created_utc_original']}")
-st.write("")
-# Display the engagement matrix in a single row with emojis
-cols = st.columns(4)
-with cols[0]:
-    st.markdown(f"👍 **Upvotes:** \n{post['ups_original']}")
-with cols[1]:
-    st.markdown(f"⭐ **Post Score:**\n{post['score_original']}")
-with cols[2]:
-    st.markdown(f"💬 **Comments:**\n{post['num_comments_original']}")
-with cols[3]:
-    st.markdown(f"🔁 **Crossposts:**\n{post['num_crossposts_original']}")
-
-st.write("---")
-
-# Create a single-row dataframe for the chatbot
-single_row_df = specific_row
-
-# Initialize the LLM with Google API key
-GOOGLE_API_KEY = os.getenv('GEMINI_API_KEY')
-if not GOOGLE_API_KEY:
-    st.error("GEMINI_API_KEY not set. Please set it in your environment variables.")
-    st.stop()
-
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0, google_api_key=GOOGLE_API_KEY)
-
-# Create the pandas dataframe agent with the single-row dataframe
-pandas_df_agent = create_pandas_dataframe_agent(
-    llm,
-    single_row_df,
-    verbose=True,
-    agent_type=AgentType.OPENAI_FUNCTIONS,
-    allow_dangerous_code=True
-)
-
-# Define the prompt template for the chatbot
-qa_prompt = ChatPromptTemplate.from_template(
+from analysis.dataset import dataset_version
+from analysis.post_index import load_posts, get_post
+from analysis.llm import api_key_missing, get_agent
+from analysis.llm_executor import render_answer
+from analysis import metrics
+
+# Prompt template for the per-post chatbot (langchain is only imported once a question is asked)
+QA_TEMPLATE = (
     """You are an expert data assistant tasked with answering questions about a specific dataset row. Your role is to provide accurate, concise, and helpful responses based solely on the dataset row provided below. You will be given:
     - One row from the dataset, containing fields such as Title, Content, Author, and Date.
     - The user's question about this row.
@@ -143,35 +29,138 @@ qa_prompt = ChatPromptTemplate.from_template(
     """
 )
 
-# Chat interface
-st.write("### 💬 Chat with the Bot")
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
-
-# Display chat history
-for message in st.session_state.chat_history:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
-
-# Input field for user's question
-user_prompt = st.chat_input("Ask a question about this post...")
-
-if user_prompt:
-    # Add user's message to chat history
-    st.chat_message("user").markdown(user_prompt)
-    st.session_state.chat_history.append({"role": "user", "content": user_prompt})
-    
-    # Convert the single row to CSV for the prompt
-    retrieved_row = single_row_df.to_csv(index=False)
-    
-    # Format the prompt with the row data and user query
-    formatted_prompt = qa_prompt.format(retrieved_row=retrieved_row, user_query=user_prompt)
-    
-    # Get the response from the agent
-    response = pandas_df_agent.invoke(formatted_prompt)
-    assistant_response = response["output"]
-    
-    # Add and display the assistant's response
-    st.session_state.chat_history.append({"role": "assistant", "content": assistant_response})
-    with st.chat_message("assistant"):
-        st.markdown(assistant_response)
\ No newline at end of file
+
+def main():
+    # Get the post ID from query parameters
+    query_params = st.query_params
+    post_id = query_params.get("id")
+
+    # Check if an ID was provided
+    if not post_id:
+        st.error("No post ID provided.")
+        st.stop()
+
+    # Load the dataset and its id -> rows lookup (shared cache)
+    with metrics.stage('load'):
+        df, lookup, _ = load_posts()
+
+    # Fetch the post's rows (and its crossposts) through the lookup instead of scanning
+    with metrics.stage('filter'):
+        specific_row, crossposts = get_post(df, lookup, post_id)
+
+    # Check if the post exists
+    if specific_row is None:
+        st.error("Post not found.")
+        st.stop()
+
+    # Extract the post as a single row (Series)
+    post = specific_row.iloc[0]
+
+    # Display post details
+    st.title("📝 Post Details")
+    st.write("---")
+    st.markdown(f"### [{post['title_original']}](https://reddit.com/{post['permalink_original']})")
+
+    # Display media from 'url_overridden_by_dest_original', using the media type and
+    # YouTube id parsed when the features were built
+    url = post['url_overridden_by_dest_original']
+    if pd.notna(url):
+        # Ensure the URL has a scheme (e.g., https://)
+        if '://' not in url:
+            url = 'https://' + url
+        media_type = post.get('media_type')
+
+        # Check if the URL is an image
+        if media_type == 'image':
+            st.markdown(
+                f'<img src="{url}" alt="Attached Image" style="max-width:400px; height:auto;">',
+                unsafe_allow_html=True
+            )
+
+        # Check if the URL is a YouTube video (links whose video id could not be parsed
+        # fall through to the plain link below)
+        elif media_type == 'youtube' and pd.notna(post.get('youtube_id')):
+            st.video(f"https://www.youtube.com/embed/{post['youtube_id']}")
+
+        # Direct video files
+        elif media_type == 'video':
+            st.video(url)
+
+        # For all other URLs, provide a clickable link
+        else:
+            st.write(f"Attached media: [View here]({url})")
+
+    # Display selftext if it exists and is not empty
+    if pd.notna(post['selftext_original']) and post['selftext_original'].strip() != '':
+        st.write(post['selftext_original'])
+
+    st.write("")
+    st.write(f"**Author:** [{post['author_original']}](https://reddit.com/user/{post['author_original']})")
+    st.write(f"**Date:** {post['created_utc_original']}")
+    st.write("")
+    # Display the engagement matrix in a single row with emojis
+    cols = st.columns(4)
+    with cols[0]:
+        st.markdown(f"👍 **Upvotes:** \n{post['ups_original']}")
+    with cols[1]:
+        st.markdown(f"⭐ **Post Score:**\n{post['score_original']}")
+    with cols[2]:
+        st.markdown(f"💬 **Comments:**\n{post['num_comments_original']}")
+    with cols[3]:
+        st.markdown(f"🔁 **Crossposts:**\n{post['num_crossposts_original']}")
+
+    # List the crossposts grouped under this post
+    if not crossposts.empty:
+        st.write("#### 🔁 Crossposted to")
+        for crosspost in crossposts.itertuples(index=False):
+            st.markdown(f"- r/{crosspost.subreddit_crosspost}: [{crosspost.title_crosspost}](https://reddit.com/{crosspost.permalink_crosspost})")
+
+    st.write("---")
+
+    # Create a single-row dataframe for the chatbot
+    single_row_df = specific_row
+
+    # Chat interface
+    st.write("### 💬 Chat with the Bot")
+    # Each post keeps its own history, separate from the CSV chat bot
+    history_key = f"post_chat_history_{post_id}"
+    if history_key not in st.session_state:
+        st.session_state[history_key] = []
+    chat_history = st.session_state[history_key]
+
+    # Display chat history
+    for message in chat_history:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+    # Input field for user's question
+    user_prompt = st.chat_input("Ask a question about this post...")
+
+    if user_prompt:
+        # Add user's message to chat history
+        st.chat_message("user").markdown(user_prompt)
+        chat_history.append({"role": "user", "content": user_prompt})
+
+        # The agent is only built once a question is actually asked, then reused for this post
+        if api_key_missing():
+            st.error("GEMINI_API_KEY not set. Please set it in your environment variables.")
+            st.stop()
+        scope = f"post:{dataset_version()}:{post_id}"
+        pandas_df_agent = get_agent(scope, single_row_df)
+
+        # Convert the single row to CSV for the prompt
+        retrieved_row = single_row_df.to_csv(index=False)
+
+        # Format the prompt with the row data and user query
+        from langchain.prompts import ChatPromptTemplate
+        formatted_prompt = ChatPromptTemplate.from_template(QA_TEMPLATE).format(retrieved_row=retrieved_row, user_query=user_prompt)
+
+        # Stream the response from the cache, or from the shared rate-limited executor on a miss
+        with st.chat_message("assistant"), metrics.stage('llm'):
+            assistant_response = render_answer(pandas_df_agent, formatted_prompt, user_prompt, scope)
+        if assistant_response is not None:
+            chat_history.append({"role": "assistant", "content": assistant_response})
+
+
+if __name__ == "__main__":
+    main()
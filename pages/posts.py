@@ -1,48 +1,121 @@
+import html
+import math
 import streamlit as st
-import pandas as pd
+from analysis.post_index import load_posts, page_rows, rows_for_ids, SORT_COLUMNS
+from analysis.search import load_search_index
+from analysis.metrics import stage
 
-def main():
-    # Cache the data loading for performance
-    @st.cache_data
-    def load_data():
-        return pd.read_csv('./cleaned_data/combined_df_after_fe_copy.csv')
+PAGE_SIZES = [25, 50, 100]
+SEARCH_LIMIT = 100
+
+# Columns shown in the list (the rows come from the full shared dataset)
+LIST_COLUMNS = ['id_original', 'title_original', 'selftext_original']
+
+
+def post_list_html(rows, start):
+    """
+    Builds the markup for one page of posts.
+
+    Parameters:
+    - rows (pd.DataFrame): The rows of the page.
+    - start (int): Zero-based rank of the first row, used for numbering.
+
+    Returns:
+    - str: HTML for all posts of the page.
+    """
+    items = []
+    for rank, row in enumerate(rows[LIST_COLUMNS].itertuples(index=False), start=start + 1):
+        # Create a URL to the dashboard page with the post's id_original
+        url = f"/post_details?id={html.escape(str(row.id_original))}"
+        selftext = row.selftext_original if isinstance(row.selftext_original, str) else ""
+
+        # Title with smaller font size, then a preview of the selftext (first 200 characters)
+        items.append(
+            f'<h5>{rank}. <a href="{url}" target="_self"> {html.escape(str(row.title_original))}</a></h5>'
+            f'<p style="font-size: 5px; color: gray;">{html.escape(selftext[:200])}...</p>'
+        )
+    return "\n".join(items)
+
+
+def _change_page(delta):
+    st.session_state['posts_page'] += delta
 
-    # Load the dataset
-    df = load_data()
 
-    # Initialize session state for pagination
-    if 'rows_to_show' not in st.session_state:
-        st.session_state['rows_to_show'] = 1000
+def search_results(df, lookup, query):
+    """
+    Renders the best matches of a search query instead of the paged post list.
+    """
+    with st.expander("Filters"):
+        col1, col2 = st.columns(2)
+        with col1:
+            reliability = st.radio("Domain reliability", ["All", "Reliable", "Unreliable"], horizontal=True)
+        with col2:
+            dates = st.date_input("Posted between", value=[])
+    filters = {'reliability': None if reliability == "All" else reliability == "Unreliable"}
+    if len(dates) == 2:
+        filters['after'], filters['before'] = dates
+
+    with stage('load'):
+        index = load_search_index()
+    with stage('filter'):
+        results = index.search(query, filters=filters, limit=SEARCH_LIMIT)
+        rows = rows_for_ids(df, lookup, results['id_original'])
+    with stage('render'):
+        st.write(f"{len(rows)} matching posts" + (f" (showing the best {SEARCH_LIMIT})" if len(rows) == SEARCH_LIMIT else ""))
+        st.write("---")
+        st.markdown(post_list_html(rows, 0), unsafe_allow_html=True)
+
+
+def main():
+    # Load the dataset, its post lookup and the precomputed orderings (shared cache)
+    with stage('load'):
+        df, lookup, orderings = load_posts()
+    n_posts = len(lookup)
 
     # Page title
     st.title("📋 Reddit Post Overview")
+
+    # Full-text search replaces the paged list while a query is entered
+    query = st.text_input(
+        "Search posts",
+        placeholder='e.g. election "mail-in ballots" subreddit:politics after:2024-10-01'
+    )
+    if query.strip():
+        search_results(df, lookup, query)
+        st.markdown('<p style="font-size: 14px;">🔗 <em>Click on the post title to view full details.</em></p>', unsafe_allow_html=True)
+        return
+
+    # Sorting and page size
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        sort_by = st.selectbox("Sort by", list(SORT_COLUMNS))
+    with col2:
+        direction = st.radio("Order", ["Descending", "Ascending"], horizontal=True)
+    with col3:
+        page_size = st.selectbox("Posts per page", PAGE_SIZES)
     st.write("---")
 
-    # Display posts up to the current number of rows to show
-    for index, row in df.head(st.session_state['rows_to_show']).iterrows():
-        with st.container():
-            # Create a URL to the dashboard page with the post's id_original
-            url = f"/post_details?id={row['id_original']}"
-            
-            # Use smaller font size for the title
-            st.markdown(
-                f'<h5>{index+1}. <a href="{url}" target="_self"> {row["title_original"]}</a></h5>',
-                unsafe_allow_html=True
-            )
-            
-            # Show a preview of the selftext (first 200 characters) with smaller font
-            st.markdown(
-                f'<p style="font-size: 5px; color: gray;">{str(row.get("selftext", ""))[:200]}...</p>',
-                unsafe_allow_html=True
-            )
-
-    # Button to load more posts if there are more rows to display
-    if st.session_state['rows_to_show'] < len(df):
-        if st.button("Load more"):
-            st.session_state['rows_to_show'] += 1000
-            if st.session_state['rows_to_show'] > len(df):
-                st.session_state['rows_to_show'] = len(df)
-            # No explicit rerun needed; Streamlit automatically reruns on widget interaction.
+    # Initialize and clamp the current page
+    n_pages = max(1, math.ceil(n_posts / page_size))
+    if 'posts_page' not in st.session_state:
+        st.session_state['posts_page'] = 1
+    st.session_state['posts_page'] = min(max(1, st.session_state['posts_page']), n_pages)
+    page = st.session_state['posts_page'] - 1
+
+    # Only the rows of the current page are materialized and sent to the browser
+    with stage('filter'):
+        rows = page_rows(df, orderings[sort_by], page, page_size, descending=direction == "Descending")
+    with stage('render'):
+        st.markdown(post_list_html(rows, page * page_size), unsafe_allow_html=True)
+
+    # Page navigation
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀ Previous", on_click=_change_page, args=(-1,), disabled=page == 0)
+    with col2:
+        st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, key='posts_page')
+    with col3:
+        st.button("Next ▶", on_click=_change_page, args=(1,), disabled=page >= n_pages - 1)
 
     # Instructions for the user
     st.markdown('<p style="font-size: 14px;">🔗 <em>Click on the post title to view full details.</em></p>', unsafe_allow_html=True)
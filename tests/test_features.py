@@ -0,0 +1,39 @@
+import pandas as pd
+from analysis.dataset import read_dataset
+from analysis.features import append_batch, load_state
+from analysis.ingest import ingest, read_partitions
+from benchmarks.synthetic import write_dump
+
+
+def _sorted_rows(store_path):
+    df = read_dataset(store_path=store_path)
+    df = df.sort_values(['id_original', 'id_crosspost'], ignore_index=True)
+    # Categories depend on the batches a column was written in; compare the values
+    return df.astype({column: 'object' for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)})
+
+
+def test_late_crosspost_matches_full_recompute(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_dump('dump.jsonl', 300, seed=3)
+    ingest('dump.jsonl', 'raw')
+    posts = read_partitions('raw', 'posts').drop(columns=['date'], errors='ignore')
+    crossposts = read_partitions('raw', 'crossposts').drop(columns=['date'], errors='ignore')
+
+    # Every crosspost of one parent arrives late (its first crosspost), and one more
+    # crosspost of a parent that already has another
+    per_parent = crossposts['parent_id'].value_counts()
+    first_only = per_parent.index[0]
+    additional = per_parent[per_parent > 1].index.difference([first_only])[0]
+    late = (crossposts['parent_id'] == first_only) | crossposts.index.isin(
+        crossposts.index[crossposts['parent_id'] == additional][1:]
+    )
+
+    append_batch(posts, crossposts, store_path='full', cube_path='full_cube.parquet')
+    append_batch(posts, crossposts[~late], store_path='incremental', cube_path='incremental_cube.parquet')
+    assert append_batch(posts.iloc[:0], crossposts[late], store_path='incremental', cube_path='incremental_cube.parquet') == late.sum()
+
+    full, incremental = _sorted_rows('full'), _sorted_rows('incremental')
+    assert not ((incremental['id_original'] == first_only) & (incremental['id_crosspost'] == 'no_crosspost')).any()
+    pd.testing.assert_frame_equal(incremental, full)
+    counts = load_state('incremental')['author_counts']
+    assert counts.sort_index().equals(load_state('full')['author_counts'].sort_index())
@@ -0,0 +1,37 @@
+import pytest
+from analysis.router import route
+
+
+def _filters(plan):
+    return {(column, value) for column, _, value, _ in plan.filters}
+
+
+def test_dimension_word_is_not_taken_as_a_name():
+    plan = route("count posts by subreddit where domain is breitbart.com")
+    assert plan.aggregate == 'count'
+    assert plan.group_by == ('subreddit', 'subreddit_original')
+    assert _filters(plan) == {('domain_original', 'breitbart.com')}
+
+
+def test_filler_after_dimension_is_not_a_name():
+    plan = route("average score for subreddit where unreliable")
+    assert plan.aggregate == 'mean'
+    assert plan.group_by == ('subreddit', 'subreddit_original')
+    assert _filters(plan) == {('is_unreliable_domain', True)}
+
+
+@pytest.mark.parametrize('question, expected', [
+    ("how many posts by u/someone", ('author_original', 'someone')),
+    ("average score for subreddit 'politics'", ('subreddit_original', 'politics')),
+    ('total comments for user "bob"', ('author_original', 'bob')),
+])
+def test_explicit_names(question, expected):
+    assert expected in _filters(route(question))
+
+
+@pytest.mark.parametrize('question', [
+    "posts from subreddit politics",
+    "posts by r/where",
+])
+def test_bare_or_stopword_names_go_to_the_llm(question):
+    assert route(question) is None